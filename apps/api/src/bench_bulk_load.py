@@ -0,0 +1,100 @@
+"""
+Ingredient load throughput: BulkLoader vs one execute per CSV row.
+
+Writes a synthetic ingredients CSV in the layout of data/ingredients.csv,
+then loads it twice into freshly migrated databases: once with the
+row-at-a-time loop populate_ingredients used to run, once with
+BulkLoader. The old loop stores values as the strings it read ('' for a
+missing quantity), BulkLoader pays for coercing them to REAL/INTEGER/NULL.
+
+usage (from apps/api):
+    python src/bench_bulk_load.py --rows 1000000
+"""
+import argparse
+import csv
+import logging
+import os
+import random
+import tempfile
+import time
+from bulk_load import BulkLoader, Column, INTEGER, REAL
+from database import ConnectionPool
+from migrations import migrate
+
+NAMES = ["Spaghetti", "Large Egg", "Parmesan Cheese", "Bacon", "Salt",
+         "Black Pepper", "Olive Oil", "Garlic", "Onion", "Butter"]
+UNITS = ["oz", "", "cup", "slices", "tsp", "tbsp", "cloves", "g"]
+
+COLUMNS = [
+    Column("name", "Name"),
+    Column("quantity", convert=REAL),
+    Column("measurement_unit", "unit"),
+    Column("recipe_id", convert=INTEGER),
+]
+
+
+def write_csv(path: str, rows: int):
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["name", "Name", "quantity", "unit", "recipe_id"])
+        for i in range(rows):
+            name = random.choice(NAMES)
+            writer.writerow([name, name, round(random.uniform(0.25, 8), 2),
+                             random.choice(UNITS), i // 10 + 1])
+
+
+def fresh_pool(directory: str, name: str) -> ConnectionPool:
+    pool = ConnectionPool(db_path=os.path.join(directory, name))
+    migrate(pool)
+    return pool
+
+
+def row_at_a_time(pool: ConnectionPool, path: str) -> float:
+    """The loop populate_ingredients used before BulkLoader, in seconds"""
+    started = time.perf_counter()
+    with open(path, newline="") as csvfile, pool.writer() as conn:
+        data = csv.reader(csvfile)
+        next(data)
+        for row in data:
+            conn.execute(
+                """
+                INSERT INTO Ingredient (
+                    name, quantity, measurement_unit, recipe_id
+                ) VALUES (?, ? ,?, ?);
+                """,
+                [row[1], row[2], row[3], row[4]],
+            )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ingredients.csv")
+        write_csv(path, args.rows)
+
+        pool = fresh_pool(tmp, "baseline.db")
+        baseline = row_at_a_time(pool, path)
+        pool.close()
+
+        pool = fresh_pool(tmp, "bulk.db")
+        stats = BulkLoader(pool, batch_size=args.batch_size).load_csv(
+            path, "Ingredient", COLUMNS
+        )
+        pool.close()
+
+    print(f"{'loader':<14} {'rows':>10} {'seconds':>9} {'rows/s':>11}")
+    print(f"{'row-at-a-time':<14} {args.rows:>10} {baseline:>9.2f} "
+          f"{args.rows / baseline:>11,.0f}")
+    print(f"{'BulkLoader':<14} {stats.rows:>10} {stats.seconds:>9.2f} "
+          f"{stats.rows_per_second:>11,.0f}")
+    print(f"speedup: {baseline / stats.seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Read throughput on the receipt endpoints while receipts are being written.
+
+Runs the same workload against a rollback-journal database and a WAL
+database: reader threads loop over get_receipt_history while, in the
+second phase, one thread keeps inserting receipts through add_new_receipt.
+
+usage (from apps/api):
+    python src/bench_wal.py --seconds 5 --readers 8
+"""
+import argparse
+import contextlib
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from database import ConnectionPool
+from pipelines.receipt_pipeline import (
+    ReceiptPipeline, ReceiptDetail, ReceiptItemDetail
+)
+
+USERS = 200
+RECEIPTS_PER_USER = 20
+ITEMS_PER_RECEIPT = 8
+
+
+def seed(pool: ConnectionPool):
+    with pool.writer() as conn:
+        conn.execute(
+            """
+            CREATE TABLE GroceryReceipt (
+                receipt_id TEXT,
+                name TEXT NOT NULL,
+                price FLOAT NOT NULL,
+                add_date DATE NOT NULL,
+                user_id INTEGER NOT NULL
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO GroceryReceipt VALUES (?, ?, ?, ?, ?)",
+            (
+                (f"{user}-{receipt}", f"item {item}", 1.99,
+                 f"2024-{receipt % 12 + 1:02d}-01", user)
+                for user in range(1, USERS + 1)
+                for receipt in range(RECEIPTS_PER_USER)
+                for item in range(ITEMS_PER_RECEIPT)
+            ),
+        )
+
+
+def run_phase(pipeline: ReceiptPipeline, readers: int, seconds: float,
+              with_writer: bool):
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+
+    def reader(slot: int):
+        while not stop.is_set():
+            result = pipeline.get_receipt_history(random.randint(1, USERS))
+            if isinstance(result, list):
+                reads[slot] += 1
+
+    def writer():
+        items = [ReceiptItemDetail(f"item {i}", 2.49)
+                 for i in range(ITEMS_PER_RECEIPT)]
+        while not stop.is_set():
+            pipeline.add_new_receipt(ReceiptDetail(
+                ingredients=items,
+                user_id=random.randint(1, USERS),
+                date="2024-06-15",
+            ))
+            writes[0] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    if with_writer:
+        threads.append(threading.Thread(target=writer))
+    # add_new_receipt prints every item, keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return sum(reads) / seconds, writes[0] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'journal':<8} {'reads/s idle':>14} {'reads/s writing':>16} "
+          f"{'receipts/s':>11} {'read ratio':>11}")
+    for journal_mode in ("DELETE", "WAL"):
+        with tempfile.TemporaryDirectory() as tmp:
+            pool = ConnectionPool(
+                db_path=os.path.join(tmp, "bench.db"),
+                size=args.readers,
+                pragmas={"journal_mode": journal_mode},
+            )
+            seed(pool)
+            pipeline = ReceiptPipeline(pool=pool)
+            idle, _ = run_phase(pipeline, args.readers, args.seconds, False)
+            busy, writes = run_phase(pipeline, args.readers, args.seconds, True)
+            pool.close()
+        print(f"{journal_mode:<8} {idle:>14.0f} {busy:>16.0f} "
+              f"{writes:>11.0f} {busy / idle:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import csv
+import sys
+import sqlite3
+import time
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+from database import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10_000
+
+# Food.com rows carry whole step lists in one field, well past csv's 128KB
+csv.field_size_limit(sys.maxsize)
+
+
+def _optional(convert: Callable[[str], Any]) -> Callable[[str], Any]:
+    def wrapped(value: Optional[str]):
+        if not value or value.isspace():
+            return None
+        return convert(value)
+    return wrapped
+
+
+TEXT = str
+REAL = _optional(float)
+INTEGER = _optional(lambda value: int(float(value)))
+
+
+@dataclass
+class Column:
+    """Maps a CSV header to a table column and the type it is stored as"""
+
+    name: str
+    source: Optional[str] = None  # CSV header, defaults to name
+    convert: Callable[[str], Any] = TEXT
+
+    @property
+    def header(self) -> str:
+        return self.source or self.name
+
+
+@dataclass
+class LoadStats:
+    table: str
+    rows: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class BulkLoader:
+    """
+    Streams rows into a table with batched executemany, all inside one
+    write transaction: either the whole file lands or none of it does.
+
+    Loading into an empty table drops its non-unique secondary indexes
+    first and rebuilds them at the end of the transaction; one sort per
+    index is much cheaper than updating every index on every insert.
+    """
+
+    def __init__(self, pool: Optional[ConnectionPool] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.pool = pool or get_pool()
+        self.batch_size = batch_size
+
+    def load_rows(self, table: str, columns: Sequence[str],
+                  rows: Iterable[Sequence[Any]], on_conflict: str = "",
+                  stats: Optional[LoadStats] = None,
+                  defer_indexes: bool = True,
+                  conn: Optional[sqlite3.Connection] = None) -> LoadStats:
+        """
+        Insert already converted tuples. on_conflict is e.g. "OR IGNORE".
+        Pass the connection of an open pool.writer() transaction to load as
+        part of it, instead of in a transaction of its own.
+        """
+        stats = stats or LoadStats(table=table)
+        sql = (
+            f"INSERT {on_conflict} INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})"
+        )
+        started = time.perf_counter()
+        rows = iter(rows)
+        with nullcontext(conn) if conn is not None else self.pool.writer() as conn:
+            indexes = []
+            if defer_indexes and not conn.execute(
+                f"SELECT 1 FROM {table} LIMIT 1"
+            ).fetchone():
+                indexes = self._drop_indexes(conn, table)
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                conn.executemany(sql, batch)
+                stats.rows += len(batch)
+            for index_sql in indexes:
+                conn.execute(index_sql)
+        stats.seconds = time.perf_counter() - started
+        logger.info(
+            f"Loaded {stats.rows} rows into {table} in {stats.seconds:.2f}s "
+            f"({stats.rows_per_second:,.0f} rows/s)"
+        )
+        return stats
+
+    @staticmethod
+    def _drop_indexes(conn, table: str) -> List[str]:
+        """
+        Drop the table's non-unique explicit indexes, returning their CREATE
+        statements. Unique indexes stay: without them an "OR IGNORE" load
+        would keep duplicates, and rebuilding the index would then fail.
+        """
+        names = [
+            index["name"] for index in conn.execute(f"PRAGMA index_list({table})")
+            if not index["unique"] and index["origin"] == "c"
+        ]
+        statements = []
+        for name in names:
+            statements.append(conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+                (name,),
+            ).fetchone()["sql"])
+            conn.execute(f"DROP INDEX {name}")
+        return statements
+
+    def load_csv(self, path: str, table: str, columns: Sequence[Column],
+                 on_conflict: str = "", defer_indexes: bool = True) -> LoadStats:
+        """Stream a CSV with a header row into table"""
+        with open(path, newline="", encoding="utf-8") as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader)
+            missing = [c.header for c in columns if c.header not in header]
+            if missing:
+                raise ValueError(f"{path} has no column(s) {missing}")
+            indexes = [header.index(c.header) for c in columns]
+            converters = [c.convert for c in columns]
+            stats = LoadStats(table=table)
+            self.load_rows(
+                table,
+                [c.name for c in columns],
+                self._convert(reader, indexes, converters, stats),
+                on_conflict,
+                stats,
+                defer_indexes,
+            )
+        if stats.skipped:
+            logger.warning(
+                f"Skipped {stats.skipped} malformed rows in {path}, "
+                f"first: {stats.errors[0]}"
+            )
+        return stats
+
+    @staticmethod
+    def _convert(reader: Iterator[List[str]], indexes: List[int],
+                 converters: List[Callable[[str], Any]],
+                 stats: LoadStats) -> Iterator[List[Any]]:
+        pick = itemgetter(*indexes)
+        single = len(indexes) == 1
+        # TEXT columns go through as read, only typed columns need a call
+        typed = [
+            (position, convert) for position, convert in enumerate(converters)
+            if convert is not TEXT
+        ]
+        for row in reader:
+            try:
+                values = [pick(row)] if single else list(pick(row))
+                for position, convert in typed:
+                    values[position] = convert(values[position])
+            except (ValueError, IndexError) as e:
+                stats.skipped += 1
+                if len(stats.errors) < 10:
+                    stats.errors.append(f"line {reader.line_num}: {e}")
+                continue
+            yield values
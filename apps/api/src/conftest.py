@@ -0,0 +1,54 @@
+# src/conftest.py
+"""
+Shared fixtures. `pool` is a migrated database in tmp_path, closed after
+the test. A module that needs rows in it overrides `seed` with the SQL to
+run first:
+
+    @pytest.fixture
+    def seed():
+        return "INSERT INTO Recipe (recipe_id, name) VALUES (1, 'Pancakes');"
+
+make_pool opens further pools: with their own options, or a second pool
+on the same file standing in for another worker process.
+"""
+import pytest
+from database import ConnectionPool
+from migrations import migrate, statements
+
+
+def open_pool(path, seed: str = "", migrated: bool = True, **options) -> ConnectionPool:
+    """A pool on path, migrated unless told otherwise, with seed run in one write"""
+    pool = ConnectionPool(db_path=str(path), **options)
+    if migrated:
+        migrate(pool)
+    if seed:
+        with pool.writer() as conn:
+            for statement in statements(seed):
+                conn.execute(statement)
+    return pool
+
+
+@pytest.fixture
+def make_pool(tmp_path):
+    """open_pool on tmp_path / name; every pool made is closed after the test"""
+    pools = []
+
+    def make(name: str = "test.db", seed: str = "", migrated: bool = True,
+             **options) -> ConnectionPool:
+        pool = open_pool(tmp_path / name, seed, migrated, **options)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+@pytest.fixture
+def seed() -> str:
+    return ""
+
+
+@pytest.fixture
+def pool(make_pool, seed):
+    return make_pool(seed=seed)
@@ -0,0 +1,168 @@
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from errors import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("SMARTSHELF_DB_PATH", "smartshelf.db")
+DEFAULT_POOL_SIZE = int(os.getenv("SMARTSHELF_DB_POOL_SIZE", "8"))
+
+# Applied to every connection the pool opens. WAL lets readers keep going
+# while the single writer commits; NORMAL sync is durable across app crashes
+# in WAL mode and only risks the last commits on power loss.
+DEFAULT_PRAGMAS: Dict[str, object] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -32000,  # negative = KiB, so ~32MB per connection
+}
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections shared by the pipelines
+
+    Reads borrow any pooled connection and run in parallel. Writes go
+    through writer(), a single dedicated connection serialized by a lock,
+    so writers queue in-process instead of fighting over SQLITE_BUSY.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_DB_PATH,
+        size: int = DEFAULT_POOL_SIZE,
+        pragmas: Optional[Dict[str, object]] = None,
+        timeout: float = 30.0,
+    ):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.timeout = timeout
+        # LIFO so the most recently used (warmest page cache) connection is reused first
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        try:
+            conn = sqlite3.connect(
+                self.db_path, timeout=self.timeout, check_same_thread=False, **kwargs
+            )
+            conn.row_factory = sqlite3.Row
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            return conn
+        except sqlite3.Error as e:
+            logger.error(f"Database connection error: {e}")
+            raise DatabaseError(f"Failed to connect to database: {str(e)}")
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one while under the size cap"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except DatabaseError:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise DatabaseError("Timed out waiting for a database connection")
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding any unfinished transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.error(f"Discarding broken pooled connection: {e}")
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Serialized write transaction. Commits on exit, rolls back on error.
+        BEGIN IMMEDIATE takes the database write lock up front so other
+        processes wait on busy_timeout rather than failing mid-transaction.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                # Autocommit mode: transactions are managed explicitly below
+                self._writer = self._connect(isolation_level=None)
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def close(self):
+        """Close every idle connection and the writer"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str = DEFAULT_DB_PATH) -> ConnectionPool:
+    """Process-wide pool for a database file, created on first use"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path=db_path)
+            _pools[db_path] = pool
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
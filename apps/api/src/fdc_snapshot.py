@@ -0,0 +1,127 @@
+"""
+Loads a USDA FoodData Central bulk export into FdcFood, so NutritionPipeline
+can resolve ingredients locally instead of calling api.nal.usda.gov.
+
+Accepts the Foundation and SR Legacy downloads from
+https://fdc.nal.usda.gov/download-datasets, either format:
+    - a CSV directory containing food.csv and food_nutrient.csv
+    - a JSON file (FoundationFoods / SRLegacyFoods)
+
+usage (from apps/api):
+    python src/fdc_snapshot.py FoodData_Central_foundation_food_csv_2024-04-18 \\
+        FoodData_Central_sr_legacy_food_json_2018-04.json
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
+from bulk_load import BulkLoader
+from database import ConnectionPool, get_pool
+from migrations import migrate
+
+logger = logging.getLogger(__name__)
+
+PROTEIN, FAT, CARBS = 1003, 1004, 1005
+# Foundation foods often report energy only as Atwater factors
+ENERGY = (1008, 2047, 2048)
+NUTRIENTS = {PROTEIN, FAT, CARBS, *ENERGY}
+
+DATA_TYPES = {
+    "foundation_food": "Foundation",
+    "sr_legacy_food": "SR Legacy",
+    "Foundation": "Foundation",
+    "SR Legacy": "SR Legacy",
+}
+
+COLUMNS = ["fdc_id", "data_type", "description", "calories", "protein",
+           "fat", "carbs"]
+FoodRow = Tuple[int, str, str, float, float, float, float]
+
+
+def _row(fdc_id: int, data_type: str, description: str,
+         amounts: Dict[int, float]) -> FoodRow:
+    calories = next((amounts[n] for n in ENERGY if n in amounts), 0)
+    return (fdc_id, data_type, description, calories,
+            amounts.get(PROTEIN, 0), amounts.get(FAT, 0), amounts.get(CARBS, 0))
+
+
+def read_csv_export(directory: str) -> Iterator[FoodRow]:
+    """Streams food_nutrient.csv; only the kept foods' amounts stay in memory"""
+    foods: Dict[int, Tuple[str, str]] = {}
+    with open(os.path.join(directory, "food.csv"), newline="",
+              encoding="utf-8") as csvfile:
+        for row in csv.DictReader(csvfile):
+            data_type = DATA_TYPES.get(row["data_type"])
+            if data_type:
+                foods[int(row["fdc_id"])] = (data_type, row["description"])
+    amounts: Dict[int, Dict[int, float]] = {fdc_id: {} for fdc_id in foods}
+    with open(os.path.join(directory, "food_nutrient.csv"), newline="",
+              encoding="utf-8") as csvfile:
+        for row in csv.DictReader(csvfile):
+            nutrient_id = int(row["nutrient_id"])
+            if nutrient_id not in NUTRIENTS or not row["amount"]:
+                continue
+            food = amounts.get(int(row["fdc_id"]))
+            if food is not None:
+                food[nutrient_id] = float(row["amount"])
+    for fdc_id, (data_type, description) in foods.items():
+        yield _row(fdc_id, data_type, description, amounts[fdc_id])
+
+
+def read_json_export(path: str) -> Iterator[FoodRow]:
+    with open(path, encoding="utf-8") as jsonfile:
+        export = json.load(jsonfile)
+    for key in ("FoundationFoods", "SRLegacyFoods"):
+        for food in export.get(key, []):
+            data_type = DATA_TYPES.get(food.get("dataType"))
+            if not data_type:
+                continue
+            amounts = {
+                item["nutrient"]["id"]: item["amount"]
+                for item in food.get("foodNutrients", [])
+                if item.get("nutrient", {}).get("id") in NUTRIENTS
+                and item.get("amount") is not None
+            }
+            yield _row(food["fdcId"], data_type, food["description"], amounts)
+
+
+def read_export(path: str) -> Iterator[FoodRow]:
+    if os.path.isdir(path):
+        return read_csv_export(path)
+    return read_json_export(path)
+
+
+def load_snapshot(paths: List[str], pool: Optional[ConnectionPool] = None) -> int:
+    """
+    Replace FdcFood with the given exports and rebuild the search index,
+    in one transaction: a bad export leaves the previous snapshot in place
+    """
+    pool = pool or get_pool()
+    with pool.writer() as conn:
+        conn.execute("DELETE FROM FdcFood")
+        stats = BulkLoader(pool).load_rows(
+            "FdcFood", COLUMNS, chain.from_iterable(map(read_export, paths)),
+            on_conflict="OR REPLACE", conn=conn,
+        )
+        # FdcFoodSearch is an external content index, it does not follow FdcFood
+        conn.execute("INSERT INTO FdcFoodSearch (FdcFoodSearch) VALUES ('rebuild')")
+    logger.info(f"FoodData Central snapshot: {stats.rows} foods")
+    return stats.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(levelname)s:\t  %(message)s", level=logging.INFO)
+
+    pool = get_pool()
+    migrate(pool)
+    print(f"{load_snapshot(args.paths, pool)} foods loaded")
+
+
+if __name__ == "__main__":
+    main()
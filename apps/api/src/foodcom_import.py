@@ -0,0 +1,273 @@
+"""
+Streaming importer for Food.com recipe dumps (foodRecipes2.csv,
+foodRecipes3.csv, data/test.csv, or the full RAW_recipes.csv).
+
+Rows are read one at a time and written in batches, each batch in its own
+short write transaction, so memory stays flat however large the file is
+and the API keeps getting the writer between batches. Recipes are keyed on
+the Food.com id (Recipe.source_id): importing the same file twice updates
+rows instead of duplicating them.
+
+usage (from apps/api):
+    python src/foodcom_import.py src/foodRecipes2.csv src/foodRecipes3.csv
+"""
+import argparse
+import ast
+import csv
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterator, List, Optional
+from bulk_load import INTEGER  # importing bulk_load also lifts csv.field_size_limit
+from database import ConnectionPool, get_pool
+from migrations import migrate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+# First matching tag wins, so specific tags come before general ones
+COURSE_TAGS = [
+    ("main-dish", "Main Dish"),
+    ("desserts", "Dessert"),
+    ("appetizers", "Appetizer"),
+    ("breakfast", "Breakfast"),
+    ("soups-stews", "Soup"),
+    ("side-dishes", "Side Dish"),
+    ("salads", "Salad"),
+    ("snacks", "Snack"),
+    ("breads", "Bread"),
+    ("beverages", "Beverage"),
+    ("condiments-etc", "Condiment"),
+]
+CUISINE_TAGS = [
+    ("mexican", "Mexican"),
+    ("italian", "Italian"),
+    ("french", "French"),
+    ("spanish", "Spanish"),
+    ("greek", "Greek"),
+    ("german", "German"),
+    ("english", "British"),
+    ("russian", "Russian"),
+    ("chinese", "Chinese"),
+    ("japanese", "Japanese"),
+    ("korean", "Korean"),
+    ("thai", "Thai"),
+    ("vietnamese", "Vietnamese"),
+    ("indonesian", "Indonesian"),
+    ("indian", "Indian"),
+    ("middle-eastern", "Middle Eastern"),
+    ("caribbean", "Caribbean"),
+    ("cajun", "Cajun"),
+    ("southern-united-states", "American"),
+    ("american", "American"),
+    ("north-american", "American"),
+    ("asian", "Asian"),
+    ("european", "European"),
+]
+
+
+@dataclass
+class FoodComRecipe:
+    source_id: int
+    name: str
+    category: Optional[str]
+    cuisine_type: Optional[str]
+    cooking_time: Optional[int]
+    difficulty_level: str
+    ingredients: List[str]
+
+
+@dataclass
+class ImportStats:
+    recipes: int = 0
+    ingredients: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def recipes_per_second(self) -> float:
+        return self.recipes / self.seconds if self.seconds else 0.0
+
+
+# A list of plain quoted strings, which is almost every tags/ingredients
+# cell. These are split directly; anything else (escapes, numbers) goes
+# through ast.literal_eval, which is several times slower
+_STRING = r"'[^'\\]*'|\"[^\"\\]*\""
+_STRING_LIST = re.compile(rf"\[(?:(?:{_STRING})(?:, (?:{_STRING}))*)?\]\Z")
+_STRINGS = re.compile(_STRING)
+
+
+def parse_list(value: str) -> list:
+    """Decode a Python-literal list column, literals only, never code"""
+    if not value:
+        return []
+    if _STRING_LIST.match(value):
+        return [item[1:-1] for item in _STRINGS.findall(value)]
+    parsed = ast.literal_eval(value)
+    if not isinstance(parsed, list):
+        raise ValueError(f"expected a list, got {type(parsed).__name__}")
+    return parsed
+
+
+def _first_tag(tags: set, mapping) -> Optional[str]:
+    return next((label for tag, label in mapping if tag in tags), None)
+
+
+def difficulty(tags: set, steps: Optional[int], minutes: Optional[int]) -> str:
+    if "easy" in tags or "beginner-cook" in tags:
+        return "Easy"
+    steps = steps or 0
+    minutes = minutes or 0
+    if steps > 12 or minutes > 120:
+        return "Hard"
+    if steps <= 6 and minutes <= 30:
+        return "Easy"
+    return "Medium"
+
+
+def to_recipe(row: dict) -> FoodComRecipe:
+    tags = set(parse_list(row.get("tags", "")))
+    minutes = INTEGER(row.get("minutes"))
+    steps = INTEGER(row.get("n_steps"))
+    # Names and ingredients are whitespace-padded in the dump
+    ingredients = []
+    for ingredient in parse_list(row.get("ingredients", "")):
+        ingredient = " ".join(str(ingredient).split())
+        if ingredient and ingredient not in ingredients:
+            ingredients.append(ingredient)
+    return FoodComRecipe(
+        source_id=int(row["id"]),
+        name=" ".join(row["name"].split()).title(),
+        category=_first_tag(tags, COURSE_TAGS),
+        cuisine_type=_first_tag(tags, CUISINE_TAGS),
+        cooking_time=minutes,
+        difficulty_level=difficulty(tags, steps, minutes),
+        ingredients=ingredients,
+    )
+
+
+def read_recipes(path: str, stats: ImportStats) -> Iterator[FoodComRecipe]:
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            try:
+                yield to_recipe(row)
+            except (ValueError, SyntaxError, KeyError, TypeError) as e:
+                stats.skipped += 1
+                if len(stats.errors) < 10:
+                    stats.errors.append(f"{path} line {reader.line_num}: {e}")
+
+
+class FoodComImporter:
+    def __init__(self, pool: Optional[ConnectionPool] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.pool = pool or get_pool()
+        self.batch_size = batch_size
+
+    def import_files(self, paths: List[str]) -> ImportStats:
+        stats = ImportStats()
+        started = time.perf_counter()
+        for path in paths:
+            recipes = read_recipes(path, stats)
+            while True:
+                batch = list(islice(recipes, self.batch_size))
+                if not batch:
+                    break
+                stats.ingredients += self._write_batch(batch)
+                stats.recipes += len(batch)
+            logger.info(f"Imported {path}: {stats.recipes} recipes so far")
+        stats.seconds = time.perf_counter() - started
+        if stats.skipped:
+            logger.warning(
+                f"Skipped {stats.skipped} malformed rows, first: {stats.errors[0]}"
+            )
+        logger.info(
+            f"Imported {stats.recipes} recipes, {stats.ingredients} ingredients "
+            f"in {stats.seconds:.2f}s ({stats.recipes_per_second:,.0f} recipes/s)"
+        )
+        return stats
+
+    def _write_batch(self, batch: List[FoodComRecipe]) -> int:
+        """Upsert one batch of recipes and their ingredient lists"""
+        with self.pool.writer() as conn:
+            conn.executemany(
+                """
+                INSERT INTO Recipe (source_id, name, category, cuisine_type,
+                                    cooking_time, difficulty_level)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source_id) DO UPDATE SET
+                    name = excluded.name,
+                    category = excluded.category,
+                    cuisine_type = excluded.cuisine_type,
+                    cooking_time = excluded.cooking_time,
+                    difficulty_level = excluded.difficulty_level
+                """,
+                [
+                    (r.source_id, r.name, r.category, r.cuisine_type,
+                     r.cooking_time, r.difficulty_level)
+                    for r in batch
+                ],
+            )
+            recipe_ids = dict(conn.execute(
+                """
+                SELECT source_id, recipe_id FROM Recipe
+                WHERE source_id IN (SELECT value FROM json_each(?))
+                """,
+                (json.dumps([r.source_id for r in batch]),),
+            ).fetchall())
+            # Drop ingredients a re-import no longer lists, unless a
+            # GroceryItem already links them to a product
+            conn.executemany(
+                """
+                DELETE FROM Ingredient
+                WHERE recipe_id = ?
+                AND name NOT IN (SELECT value FROM json_each(?))
+                AND NOT EXISTS (
+                    SELECT 1 FROM GroceryItem gi
+                    WHERE gi.ingredient_id = Ingredient.ingredient_id
+                )
+                """,
+                [
+                    (recipe_ids[r.source_id], json.dumps(r.ingredients))
+                    for r in batch
+                ],
+            )
+            rows = [
+                (name, recipe_ids[r.source_id], recipe_ids[r.source_id], name)
+                for r in batch
+                for name in r.ingredients
+            ]
+            conn.executemany(
+                """
+                INSERT INTO Ingredient (name, recipe_id)
+                SELECT ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM Ingredient WHERE recipe_id = ? AND name = ?
+                )
+                """,
+                rows,
+            )
+        return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(format="%(levelname)s:\t  %(message)s", level=logging.INFO)
+
+    pool = get_pool()
+    migrate(pool)
+    stats = FoodComImporter(pool, args.batch_size).import_files(args.paths)
+    print(f"{stats.recipes} recipes, {stats.ingredients} ingredients, "
+          f"{stats.skipped} skipped in {stats.seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
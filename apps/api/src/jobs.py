@@ -0,0 +1,168 @@
+import time
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+import shortuuid
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (PENDING, RUNNING)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    A unit of background work and its progress. The job function reports
+    progress with step()/progress() and calls check_cancelled() wherever it
+    is safe to stop.
+    """
+
+    def __init__(self, name: str, total_steps: int = 0):
+        self.id = shortuuid.ShortUUID().random(length=12)
+        self.name = name
+        self.status = PENDING
+        self.total_steps = total_steps
+        self.completed_steps: List[str] = []
+        self.current_step: Optional[str] = None
+        self.detail: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    def step(self, name: str):
+        """Mark the current step done and start the next one"""
+        self.check_cancelled()
+        if self.current_step:
+            self.completed_steps.append(self.current_step)
+        self.current_step = name
+        self.detail = None
+        logger.info(f"Job {self.name} [{self.id}]: {name}")
+
+    def progress(self, detail: str):
+        self.detail = detail
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.name} cancelled")
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "total_steps": self.total_steps,
+            "completed_steps": list(self.completed_steps),
+            "current_step": self.current_step,
+            "detail": self.detail,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRunner:
+    """Runs jobs one at a time on a background thread"""
+
+    def __init__(self, max_history: int = 50):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.max_history = max_history
+
+    def submit(self, name: str, fn: Callable[[Job], None],
+               total_steps: int = 0) -> Job:
+        """Queue fn(job). Only one job per name may be pending or running"""
+        with self._lock:
+            running = self.latest(name)
+            if running and running.active:
+                raise ValueError(f"Job {name} is already {running.status}")
+            job = Job(name, total_steps)
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], None]):
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            fn(job)
+            if job.current_step:
+                job.completed_steps.append(job.current_step)
+                job.current_step = None
+            job.status = SUCCEEDED
+        except JobCancelled:
+            job.status = CANCELLED
+            logger.info(f"Job {job.name} [{job.id}] cancelled")
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error(f"Job {job.name} [{job.id}] failed: {e}\n"
+                         f"{traceback.format_exc()}")
+        finally:
+            job.finished_at = time.time()
+
+    def _trim(self):
+        finished = [job for job in self._jobs.values() if not job.active]
+        for job in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def latest(self, name: str) -> Optional[Job]:
+        jobs = [job for job in self._jobs.values() if job.name == name]
+        return max(jobs, key=lambda job: job.created_at) if jobs else None
+
+    def list(self) -> List[Job]:
+        return sorted(self._jobs.values(), key=lambda job: job.created_at,
+                      reverse=True)
+
+    def unfinished_steps(self, name: str, steps: Iterable[str]) -> List[str]:
+        """Which of steps the active job called name has still to finish"""
+        job = self.latest(name)
+        if job is None or not job.active:
+            return []
+        return [step for step in steps if step not in job.completed_steps]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.active:
+            job.cancel_event.set()
+        return job
+
+    def shutdown(self):
+        """Cancel everything so interpreter exit does not wait on a long job"""
+        for job in list(self._jobs.values()):
+            if job.active:
+                job.cancel_event.set()
+            if job.status == PENDING:
+                job.status = CANCELLED
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+runner = JobRunner()
+
+POPULATE_JOB = "populate"
+
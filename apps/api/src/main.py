@@ -1,15 +1,17 @@
 # main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from populate import Populate
 from dotenv import load_dotenv
-from routers import users, recipes, receipts, facts
+from database import get_pool
+from migrations import migrate
+from routers import users, recipes, receipts, facts, admin
 
 app = FastAPI()
 app.include_router(router=users.router)
 app.include_router(router=receipts.router)
 app.include_router(router=recipes.router)
 app.include_router(router=facts.router)
+app.include_router(router=admin.router)
 
 origins = [
     "http://localhost",
@@ -29,4 +31,12 @@ app.add_middleware(
 def init_db():
     """ Function to initialize the SQLite database and create tables """
     load_dotenv()
-    Populate()
+    # Schema only, so the server is up right away. Seeding and the
+    # USDA/Kroger lookups run as a background job, see /api/v1/admin/jobs
+    migrate(get_pool())
+    admin.start_populate_job()
+
+
+@app.on_event("shutdown")
+def stop_jobs():
+    admin.runner.shutdown()
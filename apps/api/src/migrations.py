@@ -0,0 +1,467 @@
+import sqlite3
+import logging
+from typing import Callable, List, Tuple, Union
+from database import ConnectionPool
+from rollups import rebuild
+
+logger = logging.getLogger(__name__)
+
+
+"""
+Schema migrations, applied in order and tracked with PRAGMA user_version.
+Append new steps to MIGRATIONS; never edit one that has shipped.
+A step is either a SQL script or a function taking the write connection.
+"""
+
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+BASELINE_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS User (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE,
+            password TEXT,
+            reg_date DATE,
+            admin INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS Recipe (
+            recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT,
+            cuisine_type TEXT,
+            cooking_time INTEGER,
+            difficulty_level TEXT
+        );
+        CREATE TABLE IF NOT EXISTS NutritionFact (
+            nutrition_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            guess TEXT,
+            calories REAL,
+            fat REAL,
+            carbs REAL,
+            protein REAL
+        );
+        CREATE TABLE IF NOT EXISTS KrogerProduct (
+            product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL,
+            brand TEXT,
+            category TEXT
+            );
+        CREATE TABLE IF NOT EXISTS Ingredient (
+            ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            quantity REAL,
+            measurement_unit TEXT,
+            recipe_id INTEGER,
+            FOREIGN KEY (recipe_id) REFERENCES Recipe(recipe_id)
+        );
+        CREATE TABLE IF NOT EXISTS GroceryItem (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            nutrition_id INTEGER,
+            ingredient_id INTEGER,
+            kroger_product INTEGER,
+            FOREIGN KEY (nutrition_id) REFERENCES NutritionFact(nutrition_id),
+            FOREIGN KEY (kroger_product) REFERENCES KrogerProduct(product_id),
+            FOREIGN KEY (ingredient_id) REFERENCES Ingrediet(ingredient_id)
+        );
+        CREATE TABLE IF NOT EXISTS GroceryReceipt (
+            receipt_id TEXT,
+            name TEXT NOT NULL,
+            price FLOAT NOT NULL,
+            add_date DATE NOT NULL,
+            user_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES User(user_id)
+        );
+        CREATE TABLE IF NOT EXISTS ShoppingList (
+            list_id TEXT,
+            user_id INTEGER,
+            grocery_id INTEGER,
+            created_date DATE,
+            FOREIGN KEY (user_id) REFERENCES User(user_id),
+            FOREIGN KEY (grocery_id) REFERENCES GroceryItem(item_id)
+        );
+"""
+
+# Covering / lookup indexes for the queries the pipelines run per request.
+# test_query_plans.py fails if any of those queries falls back to a table scan.
+PIPELINE_INDEXES = """
+        -- receipt_history groups by receipt_id; receipt lookups by (user, receipt)
+        CREATE INDEX IF NOT EXISTS idx_grocery_receipt_user_receipt
+            ON GroceryReceipt (user_id, receipt_id, add_date, price);
+        -- price_history and recommendations walk a user's receipts by date
+        CREATE INDEX IF NOT EXISTS idx_grocery_receipt_user_date
+            ON GroceryReceipt (user_id, add_date, name, price);
+        CREATE INDEX IF NOT EXISTS idx_ingredient_recipe
+            ON Ingredient (recipe_id);
+        CREATE INDEX IF NOT EXISTS idx_ingredient_name
+            ON Ingredient (name COLLATE NOCASE, recipe_id);
+        CREATE INDEX IF NOT EXISTS idx_grocery_item_ingredient
+            ON GroceryItem (ingredient_id, kroger_product, nutrition_id);
+        CREATE INDEX IF NOT EXISTS idx_grocery_item_product
+            ON GroceryItem (kroger_product);
+        CREATE INDEX IF NOT EXISTS idx_shopping_list_user
+            ON ShoppingList (user_id, grocery_id);
+        CREATE INDEX IF NOT EXISTS idx_kroger_product_name_brand
+            ON KrogerProduct (name, brand);
+        CREATE INDEX IF NOT EXISTS idx_recipe_cuisine
+            ON Recipe (cuisine_type);
+"""
+
+KROGER_SEARCH_CACHE = """
+        CREATE TABLE IF NOT EXISTS KrogerSearchCache (
+            term TEXT NOT NULL,
+            location_id TEXT NOT NULL,
+            result_limit INTEGER NOT NULL,
+            products TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (term, location_id, result_limit)
+        );
+        CREATE INDEX IF NOT EXISTS idx_kroger_search_cache_last_used
+            ON KrogerSearchCache (last_used);
+"""
+
+RATE_LIMIT_BUCKET = """
+        CREATE TABLE IF NOT EXISTS RateLimitBucket (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            refilled_at REAL NOT NULL,
+            day TEXT NOT NULL,
+            day_calls INTEGER NOT NULL
+        );
+"""
+
+FDC_SNAPSHOT = """
+        CREATE TABLE IF NOT EXISTS FdcFood (
+            fdc_id INTEGER PRIMARY KEY,
+            data_type TEXT NOT NULL,
+            description TEXT NOT NULL,
+            calories REAL,
+            protein REAL,
+            fat REAL,
+            carbs REAL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS FdcFoodSearch USING fts5 (
+            description,
+            content = 'FdcFood',
+            content_rowid = 'fdc_id',
+            tokenize = 'porter unicode61'
+        );
+"""
+
+RECEIPT_HISTORY_INDEX = """
+        -- receipt_history pages through a user's receipts newest first
+        CREATE INDEX IF NOT EXISTS idx_grocery_receipt_user_history
+            ON GroceryReceipt (user_id, add_date, receipt_id, price);
+"""
+
+RECEIPT_IDEMPOTENCY = """
+        -- A retried receipt upload finds the receipt its first attempt wrote
+        CREATE TABLE IF NOT EXISTS ReceiptIdempotencyKey (
+            user_id INTEGER NOT NULL,
+            idempotency_key TEXT NOT NULL,
+            receipt_id TEXT NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, idempotency_key)
+        ) WITHOUT ROWID;
+"""
+
+SIGNUP_MONTHLY = """
+        -- Signups per month for the admin dashboard, kept by triggers so
+        -- every writer of User (the API, populate.py) keeps it current
+        CREATE TABLE IF NOT EXISTS SignupMonthly (
+            year TEXT NOT NULL,
+            month TEXT NOT NULL,
+            signups INTEGER NOT NULL,
+            PRIMARY KEY (year, month)
+        ) WITHOUT ROWID;
+        INSERT OR REPLACE INTO SignupMonthly (year, month, signups)
+            SELECT strftime('%Y', reg_date) AS year, strftime('%m', reg_date) AS month,
+                COUNT(*)
+            FROM User WHERE year IS NOT NULL GROUP BY year, month;
+
+        CREATE TRIGGER IF NOT EXISTS signup_monthly_insert AFTER INSERT ON User
+        WHEN strftime('%Y', NEW.reg_date) IS NOT NULL
+        BEGIN
+            INSERT INTO SignupMonthly (year, month, signups)
+            VALUES (strftime('%Y', NEW.reg_date), strftime('%m', NEW.reg_date), 1)
+            ON CONFLICT (year, month) DO UPDATE SET signups = signups + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS signup_monthly_delete AFTER DELETE ON User
+        WHEN strftime('%Y', OLD.reg_date) IS NOT NULL
+        BEGIN
+            UPDATE SignupMonthly SET signups = signups - 1
+            WHERE year = strftime('%Y', OLD.reg_date)
+            AND month = strftime('%m', OLD.reg_date);
+            DELETE FROM SignupMonthly
+            WHERE year = strftime('%Y', OLD.reg_date)
+            AND month = strftime('%m', OLD.reg_date) AND signups <= 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS signup_monthly_move AFTER UPDATE OF reg_date ON User
+        WHEN OLD.reg_date IS NOT NEW.reg_date
+        BEGIN
+            UPDATE SignupMonthly SET signups = signups - 1
+            WHERE year = strftime('%Y', OLD.reg_date)
+            AND month = strftime('%m', OLD.reg_date);
+            DELETE FROM SignupMonthly
+            WHERE year = strftime('%Y', OLD.reg_date)
+            AND month = strftime('%m', OLD.reg_date) AND signups <= 0;
+            INSERT INTO SignupMonthly (year, month, signups)
+            SELECT strftime('%Y', NEW.reg_date), strftime('%m', NEW.reg_date), 1
+            WHERE strftime('%Y', NEW.reg_date) IS NOT NULL
+            ON CONFLICT (year, month) DO UPDATE SET signups = signups + 1;
+        END;
+"""
+
+def recipe_source_id(conn: sqlite3.Connection):
+    """Food.com recipe id, so re-importing a dump updates instead of duplicating"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(Recipe)")]
+    if "source_id" not in columns:
+        conn.execute("ALTER TABLE Recipe ADD COLUMN source_id INTEGER")
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_recipe_source_id
+            ON Recipe (source_id)
+        """
+    )
+
+
+def monthly_spend(conn: sqlite3.Connection):
+    """price_history reads a row per month instead of every receipt line"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS MonthlySpend (
+            user_id INTEGER NOT NULL,
+            year TEXT NOT NULL,
+            month TEXT NOT NULL,
+            total FLOAT NOT NULL,
+            item_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, year, month)
+        ) WITHOUT ROWID
+        """
+    )
+    rebuild(conn, ["MonthlySpend"])
+
+
+def receipt_summary(conn: sqlite3.Connection):
+    """
+    A header row per receipt, so receipt_history reads one row per receipt
+    instead of grouping its lines. Keyed the way history pages walk it
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ReceiptSummary (
+            user_id INTEGER NOT NULL,
+            add_date DATE NOT NULL,
+            receipt_id TEXT NOT NULL,
+            items INTEGER NOT NULL,
+            total FLOAT NOT NULL,
+            PRIMARY KEY (user_id, add_date, receipt_id)
+        ) WITHOUT ROWID
+        """
+    )
+    rebuild(conn, ["ReceiptSummary"])
+    # Only served the GroceryReceipt price_history, which MonthlySpend replaced
+    conn.execute("DROP INDEX IF EXISTS idx_grocery_receipt_user_date")
+
+
+def shopping_list_consolidation(conn: sqlite3.Connection):
+    """
+    Package sizes, so a consolidated list can count packages, and one
+    ShoppingList row per user and grocery item, so adding a recipe twice
+    does not list its items twice
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(KrogerProduct)")]
+    if "size" not in columns:
+        conn.execute("ALTER TABLE KrogerProduct ADD COLUMN size TEXT")
+    conn.execute(
+        """
+        DELETE FROM ShoppingList WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM ShoppingList GROUP BY user_id, grocery_id
+        )
+        """
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_shopping_list_user")
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_shopping_list_user_item
+            ON ShoppingList (user_id, grocery_id)
+        """
+    )
+
+
+def _recipe_cost_of(recipes: str) -> List[str]:
+    """
+    Statements recomputing RecipeCost for the recipe ids the recipes subquery
+    selects: the price of every product their ingredients are linked to,
+    what IngredientPipeline.process_recipe reports as total_cost
+    """
+    return [
+        f"DELETE FROM RecipeCost WHERE recipe_id IN ({recipes})",
+        f"""
+        INSERT INTO RecipeCost (recipe_id, total_cost, items)
+        SELECT i.recipe_id, TOTAL(kp.price), COUNT(*)
+        FROM Ingredient i
+        JOIN GroceryItem gi ON gi.ingredient_id = i.ingredient_id
+        JOIN KrogerProduct kp ON kp.product_id = gi.kroger_product
+        WHERE i.recipe_id IN ({recipes})
+        GROUP BY i.recipe_id
+        """,
+    ]
+
+
+def recipe_cost(conn: sqlite3.Connection):
+    """
+    Precomputed recipe costs for the cheapest / under $X listings. Triggers
+    recompute a recipe when a linked product's price changes or one of its
+    ingredients is linked to a product, so listings never join per request
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS RecipeCost (
+            recipe_id INTEGER PRIMARY KEY,
+            total_cost REAL NOT NULL,
+            items INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_recipe_cost_total ON RecipeCost (total_cost)"
+    )
+    linked_to_product = """
+        SELECT i.recipe_id FROM GroceryItem gi
+        JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
+        WHERE gi.kroger_product = NEW.product_id
+    """
+
+    def of_ingredients(*ingredient_ids: str) -> str:
+        return (
+            "SELECT recipe_id FROM Ingredient "
+            f"WHERE ingredient_id IN ({', '.join(ingredient_ids)})"
+        )
+
+    triggers = {
+        "recipe_cost_price": (
+            "AFTER UPDATE OF price ON KrogerProduct WHEN OLD.price IS NOT NEW.price",
+            linked_to_product,
+        ),
+        "recipe_cost_link": (
+            "AFTER INSERT ON GroceryItem",
+            of_ingredients("NEW.ingredient_id"),
+        ),
+        "recipe_cost_relink": (
+            "AFTER UPDATE OF ingredient_id, kroger_product ON GroceryItem",
+            of_ingredients("OLD.ingredient_id", "NEW.ingredient_id"),
+        ),
+        "recipe_cost_unlink": (
+            "AFTER DELETE ON GroceryItem",
+            of_ingredients("OLD.ingredient_id"),
+        ),
+    }
+    for name, (event, recipes) in triggers.items():
+        body = "".join(f"{statement};" for statement in _recipe_cost_of(recipes))
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    for statement in _recipe_cost_of("SELECT recipe_id FROM Ingredient"):
+        conn.execute(statement)
+
+
+def _track_versions(conn: sqlite3.Connection, tables: List[str]):
+    """
+    TableVersion counters for tables, bumped by triggers on UPDATE and
+    DELETE (see table_versions.py). Inserts show as a larger MAX(rowid),
+    so bulk loads pay nothing per row.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS TableVersion (
+            name TEXT PRIMARY KEY,
+            modified INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """
+    )
+    for table in tables:
+        conn.execute("INSERT OR IGNORE INTO TableVersion (name) VALUES (?)", (table,))
+        for event in ("UPDATE", "DELETE"):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table.lower()}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE TableVersion SET modified = modified + 1
+                    WHERE name = '{table}';
+                END
+                """
+            )
+
+
+def catalog_versions(conn: sqlite3.Connection):
+    """Change counters for the tables RecipeCatalog and the name indexes cache"""
+    _track_versions(conn, ["Recipe", "Ingredient", "GroceryItem", "NutritionFact"])
+
+
+def shopping_list_versions(conn: sqlite3.Connection):
+    """Change counters for the rest of what a consolidated shopping list reads"""
+    _track_versions(conn, ["KrogerProduct", "ShoppingList"])
+
+
+MIGRATIONS: List[Tuple[int, str, Step]] = [
+    (1, "baseline schema", BASELINE_SCHEMA),
+    (2, "pipeline query indexes", PIPELINE_INDEXES),
+    (3, "kroger search cache", KROGER_SEARCH_CACHE),
+    (4, "shared rate limit buckets", RATE_LIMIT_BUCKET),
+    (5, "recipe source ids for imports", recipe_source_id),
+    (6, "FoodData Central snapshot", FDC_SNAPSHOT),
+    (7, "receipt history index", RECEIPT_HISTORY_INDEX),
+    (8, "receipt idempotency keys", RECEIPT_IDEMPOTENCY),
+    (9, "monthly spend rollup", monthly_spend),
+    (10, "receipt summaries", receipt_summary),
+    (11, "monthly signup counters", SIGNUP_MONTHLY),
+    (12, "shopping list consolidation", shopping_list_consolidation),
+    (13, "recipe cost cache", recipe_cost),
+    (14, "table change counters", catalog_versions),
+    (15, "shopping list change counters", shopping_list_versions),
+]
+
+
+def statements(script: str) -> List[str]:
+    """
+    A SQL script as its statements. A ";" inside a string, a comment or a
+    trigger's BEGIN ... END body does not end a statement.
+    """
+    found, pending = [], ""
+    for piece in script.split(";"):
+        pending += piece + ";"
+        if sqlite3.complete_statement(pending):
+            if pending.strip(" \t\n;"):
+                found.append(pending.strip())
+            pending = ""
+    return found
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(pool: ConnectionPool) -> int:
+    """Bring the database up to the latest version, returns that version"""
+    with pool.writer() as conn:
+        current = schema_version(conn)
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            logger.info(f"Applying migration {version}: {description}")
+            if callable(step):
+                step(conn)
+            else:
+                # Not executescript, which commits first and would run the
+                # script outside the writer's transaction
+                for statement in statements(step):
+                    conn.execute(statement)
+            # PRAGMA does not take bound parameters
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            current = version
+        conn.execute("PRAGMA optimize")
+    return current
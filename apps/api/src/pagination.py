@@ -0,0 +1,121 @@
+"""
+Keyset pagination for list endpoints. A page ends with the sort key of its
+last row, handed to the client as an opaque cursor; the next page is read
+with WHERE key > cursor in index order, so every page costs the same no
+matter how deep into the list it is.
+
+Paging is opt-in: a request with neither limit nor cursor gets the whole
+list, as these endpoints returned before they were paged.
+"""
+import json
+import base64
+import binascii
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, TypeVar
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+T = TypeVar("T")
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T]
+    next_key: Optional[Sequence[Any]] = None
+
+
+def keyset_page(rows: List[Any], limit: Optional[int],
+                key: Callable[[Any], Sequence[Any]],
+                item: Callable[[Any], T] = lambda row: row) -> Page[T]:
+    """Turn up to limit + 1 fetched rows into a page and the next page's key"""
+    next_key = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_key = list(key(rows[-1]))
+    return Page([item(row) for row in rows], next_key)
+
+
+def limit_clause(limit: Optional[int]) -> str:
+    """One row past the page, so a next page is known to exist"""
+    return "" if limit is None else f"LIMIT {int(limit) + 1}"
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def _is_a(value: Any, kind: type) -> bool:
+    """JSON has one number type: a float key position takes an int too"""
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, (int, float) if kind is float else kind)
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """The key a cursor holds, one value of types[i] per position, or a 400"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        key = None
+    if (not isinstance(key, list) or len(key) != len(types)
+            or not all(_is_a(value, kind) for value, kind in zip(key, types))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+@dataclass
+class PageParams:
+    limit: Optional[int]
+    cursor: Optional[str]
+    fields: List[str] = field(default_factory=list)
+
+    def after(self, *types: type) -> Optional[List[Any]]:
+        """The cursor's key, typed like the page's sort key, e.g. after(str, str)"""
+        return decode_cursor(self.cursor, types) if self.cursor else None
+
+
+def page_params(
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE,
+        description=f"page size, {DEFAULT_PAGE_SIZE} when only a cursor is given",
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="comma separated, e.g. name,price"),
+) -> PageParams:
+    """Dependency for the limit / cursor / fields query parameters"""
+    selected = [name.strip() for name in fields.split(",") if name.strip()] if fields else []
+    if limit is None and cursor:
+        limit = DEFAULT_PAGE_SIZE
+    return PageParams(limit, cursor, selected)
+
+
+def page_response(request: Request, page: Page[Dict], params: PageParams,
+                  allowed: Sequence[str],
+                  response: Optional[Response] = None) -> JSONResponse:
+    """
+    The page as a JSON list, projected to params.fields. X-Next-Cursor and a
+    Link rel="next" header point at the next page when there is one.
+    Headers already set on response (e.g. an ETag) are carried over.
+    """
+    items = jsonable_encoder(page.items)
+    if params.fields:
+        unknown = [name for name in params.fields if name not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown field(s) {', '.join(unknown)}, "
+                       f"choose from {', '.join(allowed)}",
+            )
+        items = [{name: item.get(name) for name in params.fields} for item in items]
+    headers = dict(response.headers) if response is not None else {}
+    headers.pop("content-length", None)
+    if page.next_key is not None:
+        cursor = encode_cursor(page.next_key)
+        headers["X-Next-Cursor"] = cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=cursor)}>; rel="next"'
+        headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, Link"
+    return JSONResponse(content=items, headers=headers)
@@ -1,116 +1,211 @@
 import sqlite3
-from typing import List, Dict, Optional
+import asyncio
+import threading
+from typing import Awaitable, List, Dict, Optional, TypeVar, Union
 import logging
-from dataclasses import dataclass
 from datetime import datetime
-from pipelines.kroger_api_utils import KrogerAPI, KrogerProduct, KrogerAPIError
+from pipelines.kroger_api_utils import (
+    KrogerAPI, AsyncKrogerAPI, KrogerProduct, KrogerTokenManager,
+    get_token_manager,
+)
+from pipelines.kroger_cache import KrogerSearchCache
+from pipelines.name_index import get_name_index
+from pipelines.recipe_catalog import RecipeEntry
+from pipelines.recipe_repository import (  # noqa: F401 (re-exported)
+    RecipeRepository, IngredientDetail, IngredientPartial, RecipeDetail,
+    ShoppingListItem,
+)
+from database import DEFAULT_DB_PATH, ConnectionPool
 from errors import DatabaseError
-import shortuuid
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-@dataclass
-class IngredientDetail:
-    ingredient_id: int
-    name: str
-    quantity: float
-    measurement_unit: str
-    recipe_id: int
-    calories: int
-    protein: int
-    fat: int
-    carbs: int
 
+def _run_loop(loop: asyncio.AbstractEventLoop):
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        loop.close()
 
-@dataclass
-class IngredientPartial:
-    name: str
-    quantity: float
-    measurement_unit: str
 
+class IngredientPipeline(RecipeRepository):
+    """
+    Recipes + Ingredients, linked to Kroger products.
 
-@dataclass
-class RecipeDetail:
-    name: str
-    category: float
-    cuisine_type: str
-    cooking_time: int
-    difficulty_level: int
-    ingredients: List[IngredientPartial]
-
-
-@dataclass
-class ShoppingListItem:
-    ingredient_name: str
-    quantity: float
-    measurement_unit: str
-    product_name: str
-    brand: str
-    price: float
-    category: str
-    store_location: Optional[str] = None
-
-
-class IngredientPipeline:
-    """Recipes + Ingredients"""
+    Concurrent searches run on an event loop owned by the pipeline, started
+    on first use, with one AsyncKrogerAPI kept for the pipeline's lifetime,
+    so its connections stay alive from one recipe to the next. close()
+    shuts both down.
+    """
 
     def __init__(
         self,
         client_id: str,
         client_secret: str,
         location_id: str,
-        db_path: str = "smartshelf.db",
+        db_path: str = DEFAULT_DB_PATH,
+        pool: Optional[ConnectionPool] = None,
+        search_cache: Optional[KrogerSearchCache] = None,
+        token_manager: Optional[KrogerTokenManager] = None,
     ):
-        self.api = KrogerAPI(client_id, client_secret)
+        self.token_manager = token_manager or get_token_manager(
+            client_id, client_secret
+        )
+        self.api = KrogerAPI(
+            client_id, client_secret, token_manager=self.token_manager
+        )
+        self.client_id = client_id
+        self.client_secret = client_secret
         self.location_id = location_id
-        self.db_path = db_path
-        self.api.get_access_token()  # Ensure token is ready
+        super().__init__(db_path, pool)
+        self.search_cache = search_cache or KrogerSearchCache(self.pool)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._async_api: Optional[AsyncKrogerAPI] = None
+        # No token fetch here: it happens on the first search that misses
+        # the cache, so building a pipeline never touches the network
         logger.info(f"Initialized IngredientPipeline with location_id: {location_id}")
 
-    def _get_db_connection(self):
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            return conn
-        except sqlite3.Error as e:
-            logger.error(f"Database connection error: {e}")
-            raise DatabaseError(f"Failed to connect to database: {str(e)}")
-
     def find_kroger_product(
-        self, ingredient: IngredientDetail
+        self, ingredient: Union[IngredientDetail, IngredientPartial]
     ) -> Optional[KrogerProduct]:
         """Search for Kroger product matching ingredient"""
+        name = ingredient.name
+        cached = self._cached_search(name)
+        if cached is not None:
+            return cached[0] if cached else None
         try:
             products = self.api.search_products(
-                ingredient=ingredient.name, location_id=self.location_id, limit=1
+                ingredient=name, location_id=self.location_id, limit=1
             )
+            self.search_cache.put(name, self.location_id, 1, products)
             return products[0] if products else None
         except Exception as e:
-            logger.error(f"Error finding product for {ingredient.name}: {e}")
+            logger.error(f"Error finding product for {name}: {e}")
+            return None
+
+    def _cached_search(self, name: str) -> Optional[List[KrogerProduct]]:
+        """Cached search result; stale hits are served and refreshed behind"""
+        cached = self.search_cache.get(name, self.location_id, 1)
+        if cached is None:
             return None
+        if not cached.fresh:
+            self.search_cache.refresh_in_background(
+                name, self.location_id, 1,
+                lambda: self.api.search_products(
+                    ingredient=name, location_id=self.location_id, limit=1
+                ),
+            )
+        return cached.products
+
+    def _run(self, coro: Awaitable[T]) -> T:
+        """Run coro on the pipeline's event loop and wait for its result"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=_run_loop, args=(self._loop,),
+                    name="kroger-search", daemon=True,
+                ).start()
+            loop = self._loop
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def _search_all(
+        self, names: List[str]
+    ) -> List[Optional[List[KrogerProduct]]]:
+        # Only ever runs on self._loop, so creating it here cannot race
+        if self._async_api is None:
+            self._async_api = AsyncKrogerAPI(
+                self.client_id,
+                self.client_secret,
+                base_url=self.api.base_url,
+                token_manager=self.token_manager,
+            )
+        results = await self._async_api.search_many(
+            names, location_id=self.location_id, limit=1
+        )
+        found = []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error finding product for {name}: {result}")
+                found.append(None)
+            else:
+                found.append(result)
+        return found
+
+    def find_kroger_products(
+        self, ingredients: List[IngredientDetail]
+    ) -> List[Optional[KrogerProduct]]:
+        """
+        Search for every ingredient at once, results in input order.
+        Cached terms skip the network; each distinct miss is searched once.
+        """
+        searched: Dict[str, Optional[List[KrogerProduct]]] = {}
+        misses = []
+        for ingredient in ingredients:
+            key = self.search_cache.normalize(ingredient.name)
+            if key in searched:
+                continue
+            searched[key] = self._cached_search(ingredient.name)
+            if searched[key] is None:
+                misses.append(ingredient.name)
+        if misses:
+            for name, products in zip(misses, self._run(self._search_all(misses))):
+                if products is not None:
+                    self.search_cache.put(name, self.location_id, 1, products)
+                searched[self.search_cache.normalize(name)] = products
+        results = []
+        for ingredient in ingredients:
+            products = searched[self.search_cache.normalize(ingredient.name)]
+            results.append(products[0] if products else None)
+        return results
+
+    def close(self):
+        """Close the search client and stop the pipeline's event loop"""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._async_api is not None:
+            asyncio.run_coroutine_threadsafe(self._async_api.aclose(), loop).result()
+            self._async_api = None
+        loop.call_soon_threadsafe(loop.stop)
 
     def save_kroger_product(self, product: KrogerProduct) -> int:
         """Save Kroger product to database"""
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        try:
+        with self.pool.writer() as conn:
+            cursor = conn.cursor()
             # Check if product exists
             cursor.execute(
                 """
-                SELECT product_id FROM KrogerProduct
+                SELECT product_id, price, size FROM KrogerProduct
                 WHERE name = ? AND brand = ?
                 """,
                 (product.name, product.brand),
             )
             existing = cursor.fetchone()
             if existing:
+                if product.price and product.price != existing["price"]:
+                    # The recipe_cost_price trigger reprices linked recipes
+                    cursor.execute(
+                        "UPDATE KrogerProduct SET price = ? WHERE product_id = ?",
+                        (product.price, existing["product_id"]),
+                    )
+                if product.size and not existing["size"]:
+                    # Saved before sizes were kept
+                    cursor.execute(
+                        "UPDATE KrogerProduct SET size = ? WHERE product_id = ?",
+                        (product.size, existing["product_id"]),
+                    )
                 return existing["product_id"]
             # Insert new product
             cursor.execute(
                 """
-                INSERT INTO KrogerProduct (name, description, price, brand, category)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO KrogerProduct (name, description, price, brand, category, size)
+                VALUES (?, ?, ?, ?, ?, ?)
                 """,
                 (
                     product.name,
@@ -118,47 +213,51 @@ class IngredientPipeline:
                     product.price,
                     product.brand,
                     product.category,
+                    product.size,
                 ),
             )
             product_id = cursor.lastrowid
-            conn.commit()
             return product_id
-        finally:
-            conn.close()
 
     def link_ingredient_to_product(
         self, ingredient: IngredientDetail, kroger_product_id: int
     ) -> bool:
         """Create grocery item linking ingredient to Kroger product"""
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
         try:
-            # Check if link exists
-            cursor.execute(
-                """
-                SELECT item_id FROM GroceryItem
-                WHERE ingredient_id = ? AND kroger_product = ?
-                """,
-                (ingredient.ingredient_id, kroger_product_id),
-            )
-            if not cursor.fetchone():
-                # Create new link
+            # Nutrition facts are keyed by the names they were looked up
+            # with, which need not be spelled like this ingredient
+            fact = get_name_index(self.pool, "nutrition").best(ingredient.name)
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                # Check if link exists
                 cursor.execute(
                     """
-                    INSERT INTO GroceryItem (name, nutrition_id, ingredient_id, kroger_product)
-                    SELECT ?, nf.nutrition_id, ?, ? FROM NutritionFact nf
-                    WHERE nf.name = ?
+                    SELECT item_id FROM GroceryItem
+                    WHERE ingredient_id = ? AND kroger_product = ?
                     """,
-                    (ingredient.name, ingredient.ingredient_id,
-                     kroger_product_id, ingredient.name),
+                    (ingredient.ingredient_id, kroger_product_id),
                 )
-                conn.commit()
+                linked = False
+                if fact and not cursor.fetchone():
+                    # Create new link, unless the fact was deleted since
+                    # the name index last saw it
+                    cursor.execute(
+                        """
+                        INSERT INTO GroceryItem (name, nutrition_id, ingredient_id, kroger_product)
+                        SELECT ?, nutrition_id, ?, ? FROM NutritionFact
+                        WHERE nutrition_id = ?
+                        """,
+                        (ingredient.name, ingredient.ingredient_id,
+                         kroger_product_id, fact.key),
+                    )
+                    linked = cursor.rowcount > 0
+            if linked:
+                # After commit, so the reload sees the new GroceryItem
+                self.catalog.invalidate_ingredients(ingredient.recipe_id)
             return True
         except sqlite3.Error as e:
             logger.error(f"Error linking ingredient {ingredient.name}: {e}")
             return False
-        finally:
-            conn.close()
 
     def process_recipe(self, recipe_id: int, verbose: bool = False) -> Dict:
         """Process recipe and generate shopping list"""
@@ -175,21 +274,20 @@ class IngredientPipeline:
             if not recipe:
                 raise DatabaseError("Recipe not found")
             results["recipe"] = recipe
-            # Get and process ingredients
-            ingredients = self.get_recipe_ingredients(recipe_id)
-            for ingredient in ingredients:
-                # Find matching product
-                product = self.find_kroger_product(ingredient)
+            # Get and process ingredients, including ones not linked yet
+            ingredients = self._get_ingredients_to_link(recipe_id)
+            products = self.find_kroger_products(ingredients)
+            for ingredient, product in zip(ingredients, products):
                 if product:
                     # Save product and create link
                     product_id = self.save_kroger_product(product)
                     self.link_ingredient_to_product(ingredient, product_id)
                 else:
                     logger.warning(f"No product found for: {ingredient.name}")
-            # Generate shopping list
+            # Generate shopping list, the cost is kept current by triggers
             shopping_list = self.get_shopping_list(recipe_id)
             results["shopping_list"] = [vars(item) for item in shopping_list]
-            results["total_cost"] = sum(item.price for item in shopping_list)
+            results["total_cost"] = self.get_recipe_cost(recipe_id) or 0.0
             if verbose:
                 logger.info(f"Processed recipe: {recipe['name']}")
                 logger.info(f"Found {len(shopping_list)} items")
@@ -199,254 +297,25 @@ class IngredientPipeline:
             logger.error(f"Error processing recipe {recipe_id}: {e}")
             raise
 
-    def check_populated(self):
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            res = cursor.execute(
-                """
-                SELECT 1 FROM Ingredient;
-                """
-            )
-            results = [dict(row) for row in res.fetchall()]
-            conn.close()
-            return results
-        except sqlite3.Error as e:
-            logger.error(f"Database error fetching recipes: {e}")
-            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
-
-        pass
-
-    def get_recipe_details_all(self) -> List[Dict]:
-        """Get all recipes from database"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            res = cursor.execute(
-                """
-                SELECT * FROM Recipe;
-                """
-            )
-            results = [dict(row) for row in res.fetchall()]
-            conn.close()
-            return results
-        except sqlite3.Error as e:
-            logger.error(f"Database error fetching recipes: {e}")
-            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
-
-    def get_recipe_cuisines(self) -> List[Dict]:
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            res = cursor.execute(
-                """
-                SELECT cuisine_type, Count(*) as count
-                FROM Recipe
-                GROUP BY cuisine_type;
-                """
-            )
-            results = [dict(row) for row in res.fetchall()]
-            print(results)
-            conn.close()
-            return results
-        except sqlite3.Error as e:
-            logger.error(f"Database error fetching recipes: {e}")
-            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
-
-    def get_recipe_details_recommended(self, user_id: int) -> List[Dict]:
-        """Get all recipes from database"""
+    def add_recipe_detail(self, recipe: RecipeDetail):
+        """Add recipe to database"""
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-
-            res = cursor.execute(
-                """
-                SELECT * FROM Recipe
-                WHERE NOT EXISTS (SELECT 1 FROM GroceryReceipt WHERE user_id = ?)
-                ORDER BY RANDOM() LIMIT 5
-                """, [user_id]
-            )
-
-            count = res.fetchone()
-
-            if (count is None):
-                res = cursor.execute(
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
                     """
-                    SELECT r.*, gr.name as grocery_item FROM Recipe r
-                    JOIN Ingredient i ON r.recipe_id = i.recipe_id
-                    JOIN (SELECT * FROM GroceryReceipt ORDER BY add_date DESC) gr ON i.name LIKE gr.name
-                    WHERE gr.user_id = ?
-                    LIMIT 5
+                    INSERT INTO Recipe
+                    (name, category, cuisine_type, cooking_time, difficulty_level)
+                    VALUES (?, ?, ?, ?, ?)
                     """,
-                    [user_id]
+                    [recipe.name, recipe.category, recipe.cuisine_type,
+                     recipe.cooking_time, recipe.difficulty_level]
                 )
-
-            results = [dict(row) for row in res.fetchall()]
-            conn.close()
-            return results
-        except sqlite3.Error as e:
-            logger.error(f"Database error fetching recipes: {e}")
-            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
-
-    def get_recipe_details(self, recipe_id: int) -> Optional[Dict]:
-        """Get recipe details by ID"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT recipe_id, name, category, cuisine_type, cooking_time, difficulty_level
-                FROM Recipe
-                WHERE recipe_id = ?
-                """,
-                (recipe_id),
-            )
-            result = cursor.fetchone()
-            conn.close()
-            return dict(result) if result else None
-        except sqlite3.Error as e:
-            logger.error(f"Database error fetching recipe {recipe_id}: {e}")
-            raise DatabaseError(f"Failed to fetch recipe: {str(e)}")
-
-    def get_recipe_ingredients(self, recipe_id: int) -> List[IngredientDetail]:
-        """Get ingredients for a recipe"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT i.*, nf.calories, nf.fat, nf.protein, nf.carbs
-                FROM Ingredient i
-                JOIN GroceryItem g ON g.ingredient_id = i.ingredient_id
-                JOIN NutritionFact nf ON nf.nutrition_id = g.nutrition_id
-                WHERE i.recipe_id = ?;
-                """,
-                (recipe_id,),
-            )
-            results = cursor.fetchall()
-            conn.close()
-            return [
-                IngredientDetail(
-                    ingredient_id=row["ingredient_id"],
-                    name=row["name"],
-                    quantity=row["quantity"],
-                    measurement_unit=row["measurement_unit"],
-                    recipe_id=row["recipe_id"],
-                    calories=row["calories"],
-                    fat=row["fat"],
-                    carbs=row["carbs"],
-                    protein=row["protein"],
-                )
-                for row in results
-            ]
-        except sqlite3.Error as e:
-            logger.error(
-                f"Database error fetching ingredients for recipe {recipe_id}: {e}"
-            )
-            raise DatabaseError(f"Failed to fetch ingredients: {str(e)}")
-
-    def get_shopping_list_user(self, user_id: int):
-        """Get shopping list for a recipe with user"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT
-                    i.name as ingredient_name,
-                    i.quantity,
-                    i.measurement_unit,
-                    kp.name as product_name,
-                    kp.brand,
-                    kp.price,
-                    kp.category
-                FROM ShoppingList li
-                JOIN GroceryItem gi ON li.grocery_id = gi.item_id
-                JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
-                JOIN KrogerProduct kp ON kp.product_id = gi.kroger_product
-                WHERE li.user_id = ?;
-                """,
-                [user_id],
-            )
-            results = cursor.fetchall()
-            conn.close()
-            return [
-                ShoppingListItem(
-                    ingredient_name=row["ingredient_name"],
-                    quantity=row["quantity"],
-                    measurement_unit=row["measurement_unit"],
-                    product_name=row["product_name"],
-                    brand=row["brand"],
-                    price=row["price"],
-                    category=row["category"],
-                )
-                for row in results
-            ]
-        except sqlite3.Error as e:
-            logger.error(
-                f"Database error fetching shopping list for user {user_id}: {e}"
-            )
-            raise DatabaseError(f"Failed to fetch shopping list: {str(e)}")
-
-    def get_shopping_list(self, recipe_id: int) -> List[ShoppingListItem]:
-        """Get shopping list for a recipe"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT
-                    i.name as ingredient_name,
-                    i.quantity,
-                    i.measurement_unit,
-                    kp.name as product_name,
-                    kp.brand,
-                    kp.price,
-                    kp.category
-                FROM Ingredient i
-                JOIN GroceryItem gi ON i.ingredient_id = gi.ingredient_id
-                JOIN KrogerProduct kp ON gi.kroger_product = kp.product_id
-                WHERE i.recipe_id = ?
-                """,
-                (recipe_id,),
-            )
-            results = cursor.fetchall()
-            conn.close()
-            return [
-                ShoppingListItem(
-                    ingredient_name=row["ingredient_name"],
-                    quantity=row["quantity"],
-                    measurement_unit=row["measurement_unit"],
-                    product_name=row["product_name"],
-                    brand=row["brand"],
-                    price=row["price"],
-                    category=row["category"],
-                )
-                for row in results
-            ]
-        except sqlite3.Error as e:
-            logger.error(
-                f"Database error fetching shopping list for recipe {recipe_id}: {e}"
-            )
-            raise DatabaseError(f"Failed to fetch shopping list: {str(e)}")
-
-    def add_recipe_detail(self, recipe: RecipeDetail):
-        """Add recipe to database"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO Recipe
-                (name, category, cuisine_type, cooking_time, difficulty_level)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                [recipe.name, recipe.category, recipe.cuisine_type,
-                 recipe.cooking_time, recipe.difficulty_level]
-            )
-            conn.commit()
-            conn.close()
             recipe_id = cursor.lastrowid
+            self.catalog.add_recipe(RecipeEntry(
+                recipe_id, recipe.name, recipe.category, recipe.cuisine_type,
+                recipe.cooking_time, recipe.difficulty_level,
+            ))
             self._add_ingredient_detail(recipe.ingredients, recipe_id)
 
             return recipe_id
@@ -457,66 +326,26 @@ class IngredientPipeline:
     def _add_ingredient_detail(self, ingredients: List[IngredientPartial], recipe_id: int):
         """Add recipe to database"""
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            for ingredient in ingredients:
-                cursor.execute(
+            with self.pool.writer() as conn:
+                conn.executemany(
                     """
                     INSERT INTO Ingredient
                     (name, quantity, measurement_unit, recipe_id)
                     VALUES (?, ?, ?, ?)
                     """,
-                    [ingredient.name, ingredient.quantity,
-                     ingredient.measurement_unit, recipe_id]
+                    [
+                        [ingredient.name, ingredient.quantity,
+                         ingredient.measurement_unit, recipe_id]
+                        for ingredient in ingredients
+                    ]
                 )
-                conn.commit()
-            conn.close()
+            self.catalog.invalidate_ingredients(recipe_id)
             for ingredient in ingredients:
-                product = self.find_kroger_product(ingredient.name)
-                self.save_kroger_product(product)
-            logger.info(f"Added {ingredient.name}")
-        except sqlite3.Error as e:
-            logger.error(f"Database error adding recipe {ingredient.name}: {e}")
-            raise DatabaseError(f"Failed to fetch recipe: {str(e)}")
-
-    def add_shopping_list(self, recipe_id: int, user_id: int):
-        """Add grocery items list to database"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            id = shortuuid.ShortUUID().random(length=32)
-            cursor.execute(
-                """
-                INSERT INTO ShoppingList (list_id, user_id, grocery_id, created_date)
-                SELECT ?, ?, gi.ingredient_id, date('now') FROM GroceryItem gi
-                JOIN Ingredient i ON gi.ingredient_id = i.ingredient_id
-                WHERE i.recipe_id = ?;
-                """,
-                [id, user_id, recipe_id]
-            )
-            conn.commit()
-            conn.close()
-            list_id = cursor.lastrowid
-            return list_id
+                product = self.find_kroger_product(ingredient)
+                if product:
+                    self.save_kroger_product(product)
+                logger.info(f"Added {ingredient.name}")
         except sqlite3.Error as e:
-            logger.error(f"Database error adding to list {user_id}: {e}")
+            logger.error(f"Database error adding ingredients for recipe {recipe_id}: {e}")
             raise DatabaseError(f"Failed to fetch recipe: {str(e)}")
 
-    def delete_shopping_list(self, user_id: int):
-        """Delete grocery items"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                DELETE FROM ShoppingList WHERE user_id = ?
-                """,
-                [user_id]
-            )
-            conn.commit()
-            conn.close()
-            list_id = cursor.lastrowid
-            return list_id
-        except sqlite3.Error as e:
-            logger.error(f"Database error deleting to list {user_id}: {e}")
-            raise DatabaseError(f"Failed to fetch recipe: {str(e)}")
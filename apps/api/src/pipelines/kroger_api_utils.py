@@ -1,12 +1,21 @@
 import requests
+import httpx
+import asyncio
 import base64
-from typing import Dict, List, Optional
+import os
+import time
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
 import logging
-from datetime import datetime, timedelta
+from pipelines.rate_limiter import (
+    RateLimitExceeded, TokenBucketLimiter, get_rate_limiter
+)
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BASE_URL = os.getenv("KROGER_BASE_URL", "https://api.kroger.com/v1")
+
 
 @dataclass
 class KrogerProduct:
@@ -18,6 +27,8 @@ class KrogerProduct:
     price: float
     brand: str
     category: str
+    # Package size as Kroger writes it, e.g. "16 oz" or "12 ct"
+    size: str = ""
 
     def to_dict(self) -> Dict:
         """Convert product to dictionary"""
@@ -28,6 +39,7 @@ class KrogerProduct:
             "price": self.price,
             "brand": self.brand,
             "category": self.category,
+            "size": self.size,
         }
 
     @classmethod
@@ -42,6 +54,7 @@ class KrogerProduct:
             price=price,
             brand=data.get("brand", ""),
             category=data.get("categories", [""])[0] if data.get("categories") else "",
+            size=(items[0].get("size") or "") if items else "",
         )
 
 
@@ -54,20 +67,56 @@ class KrogerAPIError(Exception):
         super().__init__(self.message)
 
 
-class KrogerAPI:
-    """Handler for Kroger API interactions with improved error handling"""
+class KrogerTokenManager:
+    """
+    Process-wide OAuth token for one set of Kroger credentials.
+
+    The token is cached until it expires and refreshed by a background
+    timer shortly before that, so requests normally never wait on the
+    OAuth round trip. When a refresh is needed on the request path, the
+    lock lets only one caller fetch while the others wait and reuse it.
+    """
 
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        base_url: str = None,
+        refresh_margin: float = 120.0,
+    ):
         if not client_id or not client_secret:
             raise ValueError("Kroger API credentials are required")
-
         self.client_id = client_id
         self.client_secret = client_secret
-        self.base_url = "https://api.kroger.com/v1"
-        self.access_token = None
-        self.token_expiry = None
-        self.calls_remaining = 10000
-        self.rate_limit_reset = datetime.now() + timedelta(days=1)
+        self.base_url = base_url or DEFAULT_BASE_URL
+        self.refresh_margin = refresh_margin
+        self.session = requests.Session()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0  # time.monotonic()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def token(self) -> Optional[str]:
+        """Current token if still valid, without any network call"""
+        if self._token and time.monotonic() < self._expires_at:
+            return self._token
+        return None
+
+    def get_token(self) -> str:
+        token = self.token
+        if token:
+            return token
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            return self.token or self._fetch()
+
+    def invalidate(self, rejected_token: str) -> str:
+        """Called after a 401; refetch unless someone already replaced it"""
+        with self._lock:
+            if self._token == rejected_token:
+                self._token = None
+            return self.token or self._fetch()
 
     def _get_auth_header(self) -> Dict[str, str]:
         """Get base64 encoded authorization header"""
@@ -75,45 +124,18 @@ class KrogerAPI:
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
         return {"Authorization": f"Basic {encoded_credentials}"}
 
-    def _check_rate_limit(self):
-        """Check and manage rate limiting"""
-        now = datetime.now()
-        if now >= self.rate_limit_reset:
-            self.calls_remaining = 10000
-            self.rate_limit_reset = now + timedelta(days=1)
-
-        if self.calls_remaining <= 0:
-            raise KrogerAPIError(
-                "Rate limit exceeded. Please try again tomorrow.", status_code=429
-            )
-
-        self.calls_remaining -= 1
-
-    def get_access_token(self) -> str:
-        """Get access token using client credentials flow"""
+    def _fetch(self) -> str:
+        """Client credentials flow. Caller must hold self._lock"""
         url = f"{self.base_url}/connect/oauth2/token"
-        print(self._get_auth_header())
-        print(self.client_id)
-        print(self.client_secret)
         headers = {
             **self._get_auth_header(),
             "Content-Type": "application/x-www-form-urlencoded",
         }
         data = {"grant_type": "client_credentials", "scope": "product.compact"}
-
         try:
-            response = requests.post(url, headers=headers, data=data)
+            response = self.session.post(url, headers=headers, data=data)
             response.raise_for_status()
             token_data = response.json()
-
-            self.access_token = token_data.get("access_token")
-            self.token_expiry = datetime.now() + timedelta(
-                seconds=token_data.get("expires_in", 3600) - 60
-            )
-
-            logger.info("Successfully obtained access token")
-            return self.access_token
-
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to get access token: {str(e)}")
             if hasattr(e.response, "text"):
@@ -121,55 +143,162 @@ class KrogerAPI:
             raise KrogerAPIError(
                 "Failed to authenticate with Kroger API", status_code=401
             )
+        expires_in = token_data.get("expires_in", 3600)
+        self._token = token_data.get("access_token")
+        self._expires_at = time.monotonic() + expires_in - 60
+        self._schedule_refresh(max(1.0, expires_in - 60 - self.refresh_margin))
+        logger.info("Successfully obtained access token")
+        return self._token
 
-    def _ensure_valid_token(self):
-        """Ensure we have a valid access token"""
-        if not self.access_token or (
-            self.token_expiry and datetime.now() >= self.token_expiry
-        ):
-            self.get_access_token()
+    def _schedule_refresh(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._refresh_in_background)
+        self._timer.daemon = True
+        self._timer.start()
 
-    def search_products(
-        self, ingredient: str, location_id: str, limit: int = 5
-    ) -> List[KrogerProduct]:
-        """Search for products matching an ingredient"""
-        self._check_rate_limit()
-        self._ensure_valid_token()
+    def _refresh_in_background(self):
+        with self._lock:
+            try:
+                self._fetch()
+            except KrogerAPIError:
+                # The current token is still good until it expires; the next
+                # request will retry the fetch itself
+                logger.warning("Background Kroger token refresh failed")
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+_token_managers: Dict[Tuple[str, str], KrogerTokenManager] = {}
+_token_managers_lock = threading.Lock()
+
+
+def get_token_manager(
+    client_id: str, client_secret: str, base_url: str = None
+) -> KrogerTokenManager:
+    """Shared token manager for a client id, created on first use"""
+    key = (client_id, base_url or DEFAULT_BASE_URL)
+    with _token_managers_lock:
+        manager = _token_managers.get(key)
+        if manager is None or manager.client_secret != client_secret:
+            manager = KrogerTokenManager(client_id, client_secret, base_url)
+            _token_managers[key] = manager
+        return manager
+
+
+class _KrogerClientBase:
+    """Credentials, tokens and rate limiting shared by both clients"""
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        base_url: str = None,
+        rate_limiter: Optional[TokenBucketLimiter] = None,
+        token_manager: Optional[KrogerTokenManager] = None,
+    ):
+        if not client_id or not client_secret:
+            raise ValueError("Kroger API credentials are required")
+
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.base_url = base_url or DEFAULT_BASE_URL
+        # Shared by every client in every worker, see rate_limiter.py
+        self.rate_limiter = rate_limiter or get_rate_limiter("kroger")
+        # Shared by every client in this process
+        self.token_manager = token_manager or get_token_manager(
+            client_id, client_secret, self.base_url
+        )
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.token_manager.token
 
-        url = f"{self.base_url}/products"
+    def _check_rate_limit(self):
+        """Wait for a token from the shared bucket, 429 if none comes in time"""
+        try:
+            self.rate_limiter.acquire()
+        except RateLimitExceeded as e:
+            raise KrogerAPIError(e.message, status_code=429)
+
+    async def _check_rate_limit_async(self):
+        try:
+            await self.rate_limiter.acquire_async()
+        except RateLimitExceeded as e:
+            raise KrogerAPIError(e.message, status_code=429)
+
+    def _search_request(
+        self, ingredient: str, location_id: str, limit: int, token: str
+    ) -> Dict:
         headers = {
             "Accept": "application/json",
-            "Authorization": f"Bearer {self.access_token}",
+            "Authorization": f"Bearer {token}",
         }
         params = {
             "filter.term": ingredient,
             "filter.locationId": location_id,
             "filter.limit": limit,
         }
+        return {"url": f"{self.base_url}/products", "headers": headers, "params": params}
+
+    @staticmethod
+    def _parse_products(data: Dict) -> List[KrogerProduct]:
+        products = []
+        for item in data.get("data", []):
+            try:
+                product = KrogerProduct.from_api_response(item)
+                products.append(product)
+            except Exception as e:
+                logger.error(f"Error processing product data: {e}")
+                continue
+        return products
+
+
+class KrogerAPI(_KrogerClientBase):
+    """Handler for Kroger API interactions with improved error handling"""
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        base_url: str = None,
+        rate_limiter: Optional[TokenBucketLimiter] = None,
+        token_manager: Optional[KrogerTokenManager] = None,
+    ):
+        super().__init__(
+            client_id, client_secret, base_url, rate_limiter, token_manager
+        )
+        # One Session keeps the TCP+TLS connection alive between calls
+        self.session = requests.Session()
+
+    def get_access_token(self) -> str:
+        """Valid access token, fetched only when the shared one has expired"""
+        return self.token_manager.get_token()
+
+    def search_products(
+        self, ingredient: str, location_id: str, limit: int = 5
+    ) -> List[KrogerProduct]:
+        """Search for products matching an ingredient"""
+        self._check_rate_limit()
+        token = self.get_access_token()
+
+        request = self._search_request(ingredient, location_id, limit, token)
 
         try:
-            logger.debug(f"Searching products: {params}")
-            response = requests.get(url, headers=headers, params=params)
+            logger.debug(f"Searching products: {request['params']}")
+            response = self.session.get(**request)
 
             if response.status_code == 401:
                 # Token expired, retry once
-                self.get_access_token()
-                headers["Authorization"] = f"Bearer {self.access_token}"
-                response = requests.get(url, headers=headers, params=params)
+                token = self.token_manager.invalidate(token)
+                request["headers"]["Authorization"] = f"Bearer {token}"
+                response = self.session.get(**request)
 
             response.raise_for_status()
-            data = response.json()
-
-            products = []
-            for item in data.get("data", []):
-                try:
-                    product = KrogerProduct.from_api_response(item)
-                    products.append(product)
-                except Exception as e:
-                    logger.error(f"Error processing product data: {e}")
-                    continue
-
-            return products
+            return self._parse_products(response.json())
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Product search failed: {str(e)}")
@@ -180,3 +309,92 @@ class KrogerAPI:
             raise KrogerAPIError(
                 "Failed to search products", status_code=e.response.status_code
             )
+
+
+class AsyncKrogerAPI(_KrogerClientBase):
+    """
+    asyncio Kroger client. All requests share one keep-alive httpx pool and
+    at most max_concurrency searches are in flight at once. Use as
+    `async with AsyncKrogerAPI(...) as api:` so the pool is closed.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        base_url: str = None,
+        rate_limiter: Optional[TokenBucketLimiter] = None,
+        token_manager: Optional[KrogerTokenManager] = None,
+        max_concurrency: int = 8,
+        timeout: float = 10.0,
+    ):
+        super().__init__(
+            client_id, client_secret, base_url, rate_limiter, token_manager
+        )
+        self.max_concurrency = max_concurrency
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "AsyncKrogerAPI":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def get_access_token(self) -> str:
+        """Shared token; a refresh runs off the event loop"""
+        return self.token_manager.token or await asyncio.to_thread(
+            self.token_manager.get_token
+        )
+
+    async def search_products(
+        self, ingredient: str, location_id: str, limit: int = 5
+    ) -> List[KrogerProduct]:
+        """Search for products matching an ingredient"""
+        async with self._semaphore:
+            await self._check_rate_limit_async()
+            token = await self.get_access_token()
+            request = self._search_request(ingredient, location_id, limit, token)
+            try:
+                logger.debug(f"Searching products: {request['params']}")
+                response = await self.client.get(**request)
+                if response.status_code == 401:
+                    # Token expired, retry once
+                    token = await asyncio.to_thread(
+                        self.token_manager.invalidate, token
+                    )
+                    request["headers"]["Authorization"] = f"Bearer {token}"
+                    response = await self.client.get(**request)
+                response.raise_for_status()
+                return self._parse_products(response.json())
+            except httpx.HTTPStatusError as e:
+                logger.error(f"Product search failed: {str(e)}")
+                if e.response.status_code == 429:
+                    raise KrogerAPIError("Rate limit exceeded", status_code=429)
+                raise KrogerAPIError(
+                    "Failed to search products", status_code=e.response.status_code
+                )
+            except httpx.HTTPError as e:
+                logger.error(f"Product search failed: {str(e)}")
+                raise KrogerAPIError("Failed to search products")
+
+    async def search_many(
+        self, ingredients: Sequence[str], location_id: str, limit: int = 5
+    ) -> List[Union[List[KrogerProduct], Exception]]:
+        """
+        Search every ingredient concurrently. Results keep the input order;
+        a failed search yields its exception instead of aborting the rest.
+        """
+        return await asyncio.gather(
+            *(self.search_products(name, location_id, limit) for name in ingredients),
+            return_exceptions=True,
+        )
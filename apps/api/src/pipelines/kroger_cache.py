@@ -0,0 +1,143 @@
+import json
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+from database import ConnectionPool, get_pool
+from pipelines.kroger_api_utils import KrogerProduct
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = float(os.getenv("KROGER_CACHE_TTL_SECONDS", 24 * 60 * 60))
+DEFAULT_STALE_TTL = float(os.getenv("KROGER_CACHE_STALE_SECONDS", 7 * 24 * 60 * 60))
+DEFAULT_MAX_ENTRIES = int(os.getenv("KROGER_CACHE_MAX_ENTRIES", 10000))
+# Don't rewrite last_used on every hit, once per interval is enough for LRU
+TOUCH_INTERVAL = 60.0
+
+CacheKey = Tuple[str, str, int]
+
+# Background revalidation is IO bound and rare, a couple of threads is plenty
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="kroger-cache")
+
+
+@dataclass
+class CachedSearch:
+    products: List[KrogerProduct]
+    fresh: bool
+
+
+class KrogerSearchCache:
+    """
+    Persistent cache of Kroger product searches keyed by
+    (normalized term, location_id, limit), stored in KrogerSearchCache.
+
+    Entries are fresh for `ttl` seconds, then served stale for up to
+    `stale_ttl` more while a background refresh runs. The least recently
+    used entries are evicted once there are more than `max_entries`.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ConnectionPool] = None,
+        ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.pool = pool or get_pool()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    @staticmethod
+    def normalize(term: str) -> str:
+        return " ".join(term.lower().split())
+
+    def key(self, term: str, location_id: str, limit: int) -> CacheKey:
+        return (self.normalize(term), str(location_id), int(limit))
+
+    def get(self, term: str, location_id: str, limit: int) -> Optional[CachedSearch]:
+        """Cached products, or None on a miss or once past the stale window"""
+        key = self.key(term, location_id, limit)
+        now = time.time()
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                """
+                SELECT products, fetched_at, last_used FROM KrogerSearchCache
+                WHERE term = ? AND location_id = ? AND result_limit = ?
+                """,
+                key,
+            ).fetchone()
+        if row is None:
+            return None
+        age = now - row["fetched_at"]
+        if age > self.ttl + self.stale_ttl:
+            return None
+        if now - row["last_used"] > TOUCH_INTERVAL:
+            with self.pool.writer() as conn:
+                conn.execute(
+                    """
+                    UPDATE KrogerSearchCache SET last_used = ?
+                    WHERE term = ? AND location_id = ? AND result_limit = ?
+                    """,
+                    (now, *key),
+                )
+        products = [KrogerProduct(**item) for item in json.loads(row["products"])]
+        return CachedSearch(products=products, fresh=age <= self.ttl)
+
+    def put(self, term: str, location_id: str, limit: int,
+            products: List[KrogerProduct]):
+        key = self.key(term, location_id, limit)
+        now = time.time()
+        payload = json.dumps([product.to_dict() for product in products])
+        with self.pool.writer() as conn:
+            conn.execute(
+                """
+                INSERT INTO KrogerSearchCache
+                (term, location_id, result_limit, products, fetched_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (term, location_id, result_limit) DO UPDATE SET
+                    products = excluded.products,
+                    fetched_at = excluded.fetched_at,
+                    last_used = excluded.last_used
+                """,
+                (*key, payload, now, now),
+            )
+            conn.execute(
+                """
+                DELETE FROM KrogerSearchCache WHERE rowid IN (
+                    SELECT rowid FROM KrogerSearchCache
+                    ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def refresh_in_background(
+        self,
+        term: str,
+        location_id: str,
+        limit: int,
+        fetch: Callable[[], List[KrogerProduct]],
+    ):
+        """Revalidate a stale entry off the request path, once per key"""
+        key = self.key(term, location_id, limit)
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(term, location_id, limit, fetch())
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key}: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+
+        _refresh_executor.submit(refresh)
@@ -0,0 +1,187 @@
+import re
+import logging
+import threading
+import weakref
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
+import Levenshtein
+from database import ConnectionPool
+from table_versions import INSERTED, UNCHANGED, ChangeWatcher
+
+logger = logging.getLogger(__name__)
+
+MIN_SCORE = 0.75
+# Candidates re-ranked with Levenshtein, by most shared trigrams
+MAX_CANDIDATES = 64
+
+K = TypeVar("K", bound=Hashable)
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or word.endswith("ss"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize(name: str) -> str:
+    """
+    Lowercase, punctuation-free, singular words in sorted order, so
+    "Eggs, Large" and "large egg" normalize the same
+    """
+    return " ".join(sorted(_singular(word) for word in _WORDS.findall(name.lower())))
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class NameMatch(Generic[K]):
+    key: K
+    name: str
+    score: float
+
+
+class FuzzyNameIndex(Generic[K]):
+    """
+    Approximate name lookup. Candidates come from a trigram inverted index,
+    only the few sharing the most trigrams are scored with Levenshtein, so
+    a lookup costs about the same however many names are indexed.
+    """
+
+    def __init__(self, min_score: float = MIN_SCORE,
+                 max_candidates: int = MAX_CANDIDATES):
+        self.min_score = min_score
+        self.max_candidates = max_candidates
+        self._names: Dict[K, Tuple[str, str]] = {}  # key => (name, normalized)
+        self._exact: Dict[str, List[K]] = {}
+        self._grams: Dict[str, List[K]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, key: K, name: str):
+        if key in self._names:
+            return
+        normalized = normalize(name)
+        grams = trigrams(normalized)
+        self._names[key] = (name, normalized)
+        self._exact.setdefault(normalized, []).append(key)
+        for gram in grams:
+            self._grams.setdefault(gram, []).append(key)
+
+    def matches(self, name: str, limit: int = 5) -> List[NameMatch[K]]:
+        """Best matches scoring at least min_score, best first"""
+        normalized = normalize(name)
+        if not normalized:
+            return []
+        exact = self._exact.get(normalized)
+        if exact:
+            return [NameMatch(key, self._names[key][0], 1.0) for key in exact[:limit]]
+        # A name close enough to score min_score shares most of the query's
+        # trigrams, so it shares one of the rarer ones too: the most common
+        # trigrams, whose postings are the longest to count, can be skipped
+        postings = sorted(
+            (self._grams.get(gram, ()) for gram in trigrams(normalized)), key=len
+        )
+        keep = len(postings) - int(len(postings) * self.min_score / 2)
+        shared: Counter = Counter()
+        for posting in postings[:max(keep, 1)]:
+            shared.update(posting)
+        results = []
+        for key, _ in shared.most_common(self.max_candidates):
+            candidate, candidate_normalized = self._names[key]
+            score = Levenshtein.ratio(normalized, candidate_normalized)
+            if score >= self.min_score:
+                results.append(NameMatch(key, candidate, score))
+        results.sort(key=lambda match: match.score, reverse=True)
+        return results[:limit]
+
+    def best(self, name: str) -> Optional[NameMatch[K]]:
+        matches = self.matches(name, limit=1)
+        return matches[0] if matches else None
+
+
+# name => (table, its rows to index as (key, name) past a rowid)
+SOURCES = {
+    "nutrition": (
+        "NutritionFact",
+        "SELECT nutrition_id, name FROM NutritionFact WHERE nutrition_id > ?",
+    ),
+    "ingredient": (
+        "Ingredient",
+        "SELECT DISTINCT name, name FROM Ingredient WHERE ingredient_id > ?",
+    ),
+}
+
+
+class TableNameIndex:
+    """
+    A FuzzyNameIndex over one of SOURCES. New rows are added incrementally;
+    after an update or delete (see table_versions.py) it is rebuilt, so it
+    never returns a key that is gone
+    """
+
+    def __init__(self, pool: ConnectionPool, source: str):
+        self.pool = pool
+        self.source = source
+        self.index: FuzzyNameIndex = FuzzyNameIndex()
+        self._lock = threading.Lock()
+        self._watcher = ChangeWatcher(SOURCES[source][0])
+
+    def _ensure_current(self):
+        if not self._watcher.due():
+            return
+        with self._lock:
+            if not self._watcher.due():
+                return
+            rows_sql = SOURCES[self.source][1]
+            with self.pool.connection() as conn:
+                since = self._watcher.versions
+                change, versions = self._watcher.check(conn)
+                if change != UNCHANGED:
+                    if change == INSERTED:
+                        index, after = self.index, since[0][0]
+                    else:
+                        index, after = FuzzyNameIndex(), 0
+                    for key, name in conn.execute(rows_sql, (after,)):
+                        index.add(key, name)
+                    # Swapped in whole, lookups never see a half-built index
+                    self.index = index
+                    logger.info(f"Name index {self.source}: {len(index)} names")
+                self._watcher.accept(versions)
+
+    def matches(self, name: str, limit: int = 5) -> List[NameMatch]:
+        self._ensure_current()
+        return self.index.matches(name, limit)
+
+    def best(self, name: str) -> Optional[NameMatch]:
+        self._ensure_current()
+        return self.index.best(name)
+
+
+_indexes: "weakref.WeakKeyDictionary[ConnectionPool, Dict[str, TableNameIndex]]" = (
+    weakref.WeakKeyDictionary()
+)
+_indexes_lock = threading.Lock()
+
+
+def get_name_index(pool: ConnectionPool, source: str) -> TableNameIndex:
+    """Process-wide index of a SOURCES table for a pool, built on first use"""
+    with _indexes_lock:
+        indexes = _indexes.setdefault(pool, {})
+        index = indexes.get(source)
+        if index is None:
+            index = TableNameIndex(pool, source)
+            indexes[source] = index
+        return index
@@ -1,12 +1,27 @@
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 import os
+import re
 import sqlite3
 import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+from database import DEFAULT_DB_PATH, ConnectionPool, get_pool
+from pipelines.name_index import get_name_index
 
 logger = logging.getLogger("")
 logging.basicConfig(format="%(levelname)s:\t  %(message)s", level=logging.DEBUG)
 
+FDC_SEARCH_URL = os.getenv(
+    "FDC_SEARCH_URL", "https://api.nal.usda.gov/fdc/v1/foods/search"
+)
+FDC_TIMEOUT = 10
+BACKFILL_WORKERS = int(os.getenv("NUTRITION_BACKFILL_WORKERS", 8))
+
+_WORDS = re.compile(r"\w+")
+
 
 @dataclass
 class FactDetail:
@@ -32,78 +47,218 @@ class FactDetail:
                    fat=found_fat, carbs=found_carbs)
 
 
+@dataclass
+class BackfillStats:
+    names: int = 0
+    fetched: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+
 class NutritionPipeline:
 
-    def __init__(self):
-        self._db_path = "smartshelf.db"
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self._db_path = DEFAULT_DB_PATH
+        self.pool = pool or get_pool(self._db_path)
+        # requests.Session is not safe to share between threads, so each
+        # backfill worker keeps its own keep-alive connection to USDA
+        self._local = threading.local()
 
-    def call_api(ingredient: str):
-        res = requests.post(
-            f"https://api.nal.usda.gov/fdc/v1/foods/search?api_key={os.getenv('NUTRITION_KEY')}",  # noqa: E501
-            json={
-                "query": f"{ingredient}",
-                "dataType": ["Foundation"],
-            },
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _search(self, ingredient: str, data_types: Optional[List[str]] = None):
+        body = {"query": f"{ingredient}"}
+        if data_types:
+            body["dataType"] = data_types
+        res = self.session.post(
+            FDC_SEARCH_URL,
+            params={"api_key": os.getenv("NUTRITION_KEY")},
+            json=body,
+            timeout=FDC_TIMEOUT,
         )
-        nutrition_info = res.json()
+        res.raise_for_status()
+        return res.json()["foods"]
 
-        if len(nutrition_info["foods"]) > 0:
-            # search raw ingredients
-            food = nutrition_info["foods"][0]
-            nutrients = food["foodNutrients"]
-            return FactDetail._return_api_response(food["description"], nutrients)
-        else:
-            res = requests.post(
-                f"https://api.nal.usda.gov/fdc/v1/foods/search?api_key={os.getenv('NUTRITION_KEY')}",  # noqa: E501
-                json={"query": f"{ingredient}"},
-            )
-            nutrition_info = res.json()
-            if len(nutrition_info["foods"]) == 0:
-                return FactDetail("Not Found", 0, 0, 0, 0)
-            food = nutrition_info["foods"][0]
-            nutrients = food["foodNutrients"]
-            return FactDetail._return_api_response(food["description"], nutrients)
+    def call_api(self, ingredient: str) -> FactDetail:
+        # search raw ingredients first, then anything
+        foods = self._search(ingredient, ["Foundation"]) or self._search(ingredient)
+        if len(foods) == 0:
+            return FactDetail("Not Found", 0, 0, 0, 0)
+        food = foods[0]
+        nutrients = food["foodNutrients"]
+        return FactDetail._return_api_response(food["description"], nutrients)
 
-    def find_info(self, name: str):
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        try:
-            res = cursor.execute(
+    def snapshot_loaded(self) -> bool:
+        """Whether fdc_snapshot.py has loaded a FoodData Central export"""
+        with self.pool.connection() as conn:
+            try:
+                return conn.execute(
+                    "SELECT 1 FROM FdcFood LIMIT 1"
+                ).fetchone() is not None
+            except sqlite3.OperationalError:
+                return False
+
+    def search_snapshot(self, ingredient: str) -> FactDetail:
+        """
+        Resolve an ingredient against the local FoodData Central snapshot.
+        Like call_api, a food matching every word wins, Foundation before
+        SR Legacy; failing that, the food matching the most words.
+        """
+        words = [f'"{word}"' for word in _WORDS.findall(ingredient.lower())]
+        if not words:
+            return FactDetail("Not Found", 0, 0, 0, 0)
+        with self.pool.connection() as conn:
+            row = conn.execute(
                 """
-                SELECT * FROM NutritionFact WHERE name = ?
+                SELECT f.description, f.calories, f.protein, f.fat, f.carbs
+                FROM FdcFoodSearch s JOIN FdcFood f ON f.fdc_id = s.rowid
+                WHERE FdcFoodSearch MATCH ?
+                ORDER BY f.data_type != 'Foundation', bm25(FdcFoodSearch),
+                         length(f.description)
+                LIMIT 1
                 """,
-                [name]
-            )
-            return res.fetchone()
-        except sqlite3.DatabaseError as e:
-            logger.error(f"Error finding nutrition fact {name}:{e}")
-        finally:
-            conn.close()
+                [" ".join(words)],
+            ).fetchone() or conn.execute(
+                """
+                SELECT f.description, f.calories, f.protein, f.fat, f.carbs
+                FROM FdcFoodSearch s JOIN FdcFood f ON f.fdc_id = s.rowid
+                WHERE FdcFoodSearch MATCH ?
+                ORDER BY bm25(FdcFoodSearch), f.data_type != 'Foundation',
+                         length(f.description)
+                LIMIT 1
+                """,
+                [" OR ".join(words)],
+            ).fetchone()
+        if row is None:
+            return FactDetail("Not Found", 0, 0, 0, 0)
+        return FactDetail(row["description"], row["calories"] or 0,
+                          row["protein"] or 0, row["fat"] or 0, row["carbs"] or 0)
 
-    def add_info(self, name: str):
-        info = self.call_api(name)
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
+    def lookup(self, ingredient: str) -> FactDetail:
+        """The local snapshot when one is loaded, otherwise the live API"""
+        if self.snapshot_loaded():
+            return self.search_snapshot(ingredient)
+        return self.call_api(ingredient)
+
+    def pending_names(self) -> List[str]:
+        """Distinct ingredient names that have no NutritionFact yet"""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT DISTINCT i.name FROM Ingredient i
+                LEFT JOIN NutritionFact nf ON nf.name = i.name
+                WHERE nf.nutrition_id IS NULL
+                """
+            ).fetchall()
+        return [row["name"] for row in rows]
+
+    def _save(self, name: str, info: FactDetail):
+        self._save_many([(name, info)])
+
+    def _save_many(self, facts: List[Tuple[str, FactDetail]]):
+        with self.pool.writer() as conn:
+            conn.executemany(
                 """
                 INSERT OR IGNORE INTO NutritionFact
                 (name, guess, calories, fat, carbs, protein)
                 VALUES (?, ?, ?, ?, ?, ?)
                 """,
                 [
-                    name,
-                    info.name,
-                    info.calories,
-                    info.fat,
-                    info.carbs,
-                    info.protein,
+                    (name, info.name, info.calories, info.fat, info.carbs,
+                     info.protein)
+                    for name, info in facts
                 ],
             )
-            conn.commit()
+
+    def backfill(self, max_workers: int = BACKFILL_WORKERS,
+                 stop: Optional[threading.Event] = None) -> BackfillStats:
+        """
+        Look up every ingredient name that has no NutritionFact, each name
+        once, max_workers at a time. Every result is written as soon as it
+        arrives, so an interrupted backfill resumes with what is left.
+        Names whose lookup failed are left out and retried on the next run.
+        Setting stop drops the lookups that have not started yet.
+
+        With a FoodData Central snapshot loaded there is no network: every
+        name is resolved locally and the facts are written in one transaction.
+        """
+        stats = BackfillStats()
+        started = time.perf_counter()
+        names = self.pending_names()
+        stats.names = len(names)
+        logger.info(f"Nutrition backfill: {len(names)} names to look up")
+        if self.snapshot_loaded():
+            self._backfill_snapshot(names, stats, stop)
+        else:
+            self._backfill_api(names, stats, max_workers, stop)
+        stats.seconds = time.perf_counter() - started
+        logger.info(
+            f"Nutrition backfill: {stats.fetched} saved, {stats.failed} failed "
+            f"in {stats.seconds:.1f}s"
+        )
+        return stats
+
+    def _backfill_snapshot(self, names: List[str], stats: BackfillStats,
+                           stop: Optional[threading.Event]):
+        facts = []
+        for name in names:
+            if stop is not None and stop.is_set():
+                break
+            facts.append((name, self.search_snapshot(name)))
+        self._save_many(facts)
+        stats.fetched = len(facts)
+
+    def _backfill_api(self, names: List[str], stats: BackfillStats,
+                      max_workers: int, stop: Optional[threading.Event]):
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                thread_name_prefix="nutrition") as executor:
+            futures = {executor.submit(self.call_api, name): name for name in names}
+            for future in as_completed(futures):
+                if stop is not None and stop.is_set():
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    break
+                name = futures[future]
+                try:
+                    info = future.result()
+                except (requests.RequestException, KeyError, ValueError) as e:
+                    stats.failed += 1
+                    logger.warning(f"Nutrition lookup failed for {name}: {e}")
+                    continue
+                self._save(name, info)
+                stats.fetched += 1
+
+    def find_info(self, name: str):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                res = cursor.execute(
+                    """
+                    SELECT * FROM NutritionFact WHERE name = ?
+                    """,
+                    [name]
+                )
+                row = res.fetchone()
+                if row is None:
+                    # "eggs" or "Egg, large" for a fact saved as "Large Egg"
+                    match = get_name_index(self.pool, "nutrition").best(name)
+                    if match:
+                        row = cursor.execute(
+                            "SELECT * FROM NutritionFact WHERE nutrition_id = ?",
+                            [match.key]
+                        ).fetchone()
+                return row
+            except sqlite3.DatabaseError as e:
+                logger.error(f"Error finding nutrition fact {name}:{e}")
+
+    def add_info(self, name: str):
+        info = self.lookup(name)
+        try:
+            self._save(name, info)
         except sqlite3.DatabaseError as e:
             logger.error(f"Error inserting nutrition fact {name}:{e}")
-        finally:
-            conn.close()
@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from database import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = float(os.getenv("KROGER_RATE_PER_SECOND", 5))
+DEFAULT_BURST = float(os.getenv("KROGER_RATE_BURST", 10))
+DEFAULT_DAILY_QUOTA = int(os.getenv("KROGER_DAILY_QUOTA", 10000))
+DEFAULT_MAX_WAIT = float(os.getenv("KROGER_RATE_MAX_WAIT_SECONDS", 5))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call cannot be admitted within max_wait"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket whose state lives in the RateLimitBucket table, so every
+    thread and every uvicorn worker process draws from the same bucket.
+
+    `rate` tokens per second refill up to `burst`; each call also counts
+    against `daily_quota` (reset at UTC midnight). A caller that would have
+    to wait at most `max_wait` seconds for a token sleeps and retries
+    instead of failing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = DEFAULT_RATE,
+        burst: float = DEFAULT_BURST,
+        daily_quota: int = DEFAULT_DAILY_QUOTA,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        pool: Optional[ConnectionPool] = None,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.daily_quota = daily_quota
+        self.max_wait = max_wait
+        self.pool = pool or get_pool()
+
+    def _try_acquire(self) -> float:
+        """Take a token if one is available. Returns 0, or seconds to wait"""
+        now = time.time()
+        today = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d")
+        # BEGIN IMMEDIATE in writer() serializes this read-modify-write
+        # across processes as well as threads
+        with self.pool.writer() as conn:
+            row = conn.execute(
+                """
+                SELECT tokens, refilled_at, day, day_calls
+                FROM RateLimitBucket WHERE name = ?
+                """,
+                (self.name,),
+            ).fetchone()
+            if row is None:
+                tokens, day_calls = self.burst, 0
+            else:
+                elapsed = max(0.0, now - row["refilled_at"])
+                tokens = min(self.burst, row["tokens"] + elapsed * self.rate)
+                day_calls = row["day_calls"] if row["day"] == today else 0
+            if day_calls >= self.daily_quota:
+                raise RateLimitExceeded(
+                    "Daily quota exhausted. Please try again tomorrow."
+                )
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+                day_calls += 1
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute(
+                """
+                INSERT INTO RateLimitBucket (name, tokens, refilled_at, day, day_calls)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    tokens = excluded.tokens,
+                    refilled_at = excluded.refilled_at,
+                    day = excluded.day,
+                    day_calls = excluded.day_calls
+                """,
+                (self.name, tokens, now, today, day_calls),
+            )
+        return wait
+
+    def acquire(self):
+        """Block until a token is granted, or raise RateLimitExceeded"""
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            wait = self._try_acquire()
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded("Rate limit exceeded", retry_after=wait)
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire() for coroutines; waits without blocking the event loop"""
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire)
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded("Rate limit exceeded", retry_after=wait)
+            await asyncio.sleep(wait)
+
+    def remaining_today(self) -> int:
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT day, day_calls FROM RateLimitBucket WHERE name = ?",
+                (self.name,),
+            ).fetchone()
+        used = row["day_calls"] if row and row["day"] == today else 0
+        return max(0, self.daily_quota - used)
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str = "kroger") -> TokenBucketLimiter:
+    """Process-wide limiter for a bucket name, created on first use"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = TokenBucketLimiter(name)
+            _limiters[name] = limiter
+        return limiter
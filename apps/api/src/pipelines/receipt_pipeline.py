@@ -1,14 +1,60 @@
-import sqlite3
+import os
+import json
 import logging
-from typing import List
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 from datetime import datetime
 from dataclasses import dataclass
-from errors import DatabaseError
+from database import DEFAULT_DB_PATH, ConnectionPool, get_pool
+from pagination import Page, keyset_page, limit_clause
+from pipelines.recommender import get_recommender
+import rollups
 import shortuuid
 
 logger = logging.getLogger("")
 logging.basicConfig(format="%(levelname)s:\t  %(message)s", level=logging.DEBUG)
 
+# Rows read per chunk of a streamed export
+EXPORT_BATCH_SIZE = int(os.getenv("SMARTSHELF_EXPORT_BATCH_SIZE", 500))
+
+# name => (columns, key, source of one user's rows). Rows are read newest
+# first down the index on the key, a chunk at a time, each chunk starting
+# below the last key of the one before. Receipt lines tie on (add_date,
+# receipt_id), so their key ends in rowid; add_receipts always sets a
+# receipt_id, lines without one are not exported
+EXPORTS: Dict[str, Tuple[List[str], List[str], str]] = {
+    "items": (
+        ["receipt_id", "add_date", "name", "price"],
+        ["add_date", "receipt_id", "rowid"],
+        "FROM GroceryReceipt WHERE user_id = ? AND receipt_id IS NOT NULL",
+    ),
+    "receipts": (
+        ["receipt_id", "add_date", "items", "total"],
+        ["add_date", "receipt_id"],
+        "FROM ReceiptSummary WHERE user_id = ?",
+    ),
+    "prices": (
+        ["year", "month", "total", "item_count"],
+        ["year", "month"],
+        "FROM MonthlySpend WHERE user_id = ?",
+    ),
+}
+
+
+def export_query(kind: str, after: bool = False) -> str:
+    """
+    One chunk of EXPORTS[kind]: the columns then the key of each row.
+    Parameters are user_id, the previous chunk's last key if after, and
+    the chunk size
+    """
+    columns, key, source = EXPORTS[kind]
+    below = f"AND ({', '.join(key)}) < ({', '.join('?' * len(key))})" if after else ""
+    return f"""
+        SELECT {', '.join(columns + key)}
+        {source} {below}
+        ORDER BY {', '.join(f'{name} DESC' for name in key)}
+        LIMIT ?
+        """
+
 
 @dataclass
 class ReceiptItemDetail:
@@ -21,6 +67,15 @@ class ReceiptDetail:
     ingredients: List[ReceiptItemDetail]
     user_id: int
     date: str = datetime.now().strftime("%Y-%m-%d")
+    # Client chosen, makes retrying an upload of this receipt safe
+    idempotency_key: Optional[str] = None
+
+
+@dataclass
+class ReceiptResult:
+    receipt_id: str
+    idempotency_key: Optional[str]
+    created: bool
 
 
 @dataclass
@@ -36,94 +91,191 @@ class PriceDetail:
     total: int
     month: str
     year: str
+    item_count: int
 
 
 class ReceiptPipeline:
-    def __init__(self, db_path="smartshelf.db"):
+    def __init__(self, db_path=DEFAULT_DB_PATH, pool: Optional[ConnectionPool] = None):
         self.db_path = db_path
-
-    def _get_db_connection(self):
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            return conn
-        except sqlite3.Error as e:
-            logger.error(f"Database connection error: {e}")
-            raise DatabaseError(f"Failed to connect to database: {str(e)}")
+        self.pool = pool or get_pool(db_path)
 
     def add_new_receipt(self, receipt: ReceiptDetail) -> bool:
         try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            id = shortuuid.ShortUUID().random(length=32)
-            for item in receipt.ingredients:
-                print(item)
-                cursor.execute(
-                    """
-                    INSERT INTO GroceryReceipt(
-                        receipt_id,
-                        name,
-                        price,
-                        add_date,
-                        user_id)
-                    VALUES (?, ?, ?, ?, ?);
-                    """,
-                    [id, item.name, item.price, receipt.date, receipt.user_id],
-                )
-
-            conn.commit()
-            conn.close()
-            return id
+            return self.add_receipts([receipt])[0].receipt_id
         except Exception as e:
             print(e)
             return e
 
-    def get_receipt_history(self, user_id: int) -> List[SummaryDetail]:
-        """Verify the user credentials on login and password changes"""
-        try:
-            conn = self._get_db_connection()
-            cursor = conn.cursor()
-            res = cursor.execute(
+    def add_receipts(self, receipts: Sequence[ReceiptDetail]) -> List[ReceiptResult]:
+        """
+        Write many receipts in one transaction, every line in one executemany.
+        A receipt whose (user_id, idempotency_key) was written before, by an
+        earlier request or earlier in this one, is skipped; its result has
+        the first receipt_id and created False. Results are in input order
+        """
+        results: List[ReceiptResult] = []
+        lines: List[Tuple] = []
+        keys: List[Tuple[int, str, str]] = []
+        with self.pool.writer() as conn:
+            seen = self._existing_keys(conn, receipts)
+            for receipt in receipts:
+                key = receipt.idempotency_key
+                if key is not None and (receipt.user_id, key) in seen:
+                    results.append(
+                        ReceiptResult(seen[receipt.user_id, key], key, created=False)
+                    )
+                    continue
+                # One uuid4 encoded at once, random(length=) draws per character
+                receipt_id = shortuuid.uuid()
+                if key is not None:
+                    seen[receipt.user_id, key] = receipt_id
+                    keys.append((receipt.user_id, key, receipt_id))
+                lines.extend(
+                    (receipt_id, item.name, item.price, receipt.date, receipt.user_id)
+                    for item in receipt.ingredients
+                )
+                results.append(ReceiptResult(receipt_id, key, created=True))
+            # The writer holds the write lock, every row past this one is ours
+            last_rowid = conn.execute(
+                "SELECT MAX(rowid) FROM GroceryReceipt"
+            ).fetchone()[0] or 0
+            conn.executemany(
                 """
-                    SELECT receipt_id, add_date, COUNT(*) as items,
-                    SUM(price) as total
-                    FROM GroceryReceipt
-                    WHERE user_id == ?
-                    GROUP BY receipt_id
-                    ORDER BY add_date DESC;
-                    """, [
-                    user_id
-                ]
+                INSERT INTO GroceryReceipt(
+                    receipt_id,
+                    name,
+                    price,
+                    add_date,
+                    user_id)
+                VALUES (?, ?, ?, ?, ?);
+                """,
+                lines,
             )
+            conn.executemany(
+                """
+                INSERT INTO ReceiptIdempotencyKey (user_id, idempotency_key, receipt_id)
+                VALUES (?, ?, ?)
+                """,
+                keys,
+            )
+            rollups.add_lines(conn, last_rowid)
+            purchases: Dict[int, List[Tuple]] = {}
+            for rowid, user_id, name, add_date in conn.execute(
+                """
+                SELECT rowid, user_id, name, add_date FROM GroceryReceipt
+                WHERE rowid > ?
+                """,
+                (last_rowid,),
+            ):
+                purchases.setdefault(user_id, []).append((rowid, name, add_date))
+        recommender = get_recommender(self.pool)
+        for user_id, rows in purchases.items():
+            recommender.add_purchases(user_id, rows)
+        return results
 
-            column_names = [description[0] for description in cursor.description]
-            result = [dict(zip(column_names, row)) for row in res.fetchall()]
-            conn.close()
-            return result
+    def _existing_keys(self, conn, receipts: Sequence[ReceiptDetail]
+                       ) -> Dict[Tuple[int, str], str]:
+        """(user_id, idempotency_key) => receipt_id for keys already written"""
+        keyed = [
+            [receipt.user_id, receipt.idempotency_key]
+            for receipt in receipts if receipt.idempotency_key is not None
+        ]
+        if not keyed:
+            return {}
+        rows = conn.execute(
+            """
+            SELECT user_id, idempotency_key, receipt_id FROM ReceiptIdempotencyKey
+            WHERE (user_id, idempotency_key) IN (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+                FROM json_each(?)
+            )
+            """,
+            (json.dumps(keyed),),
+        )
+        return {(user_id, key): receipt_id for user_id, key, receipt_id in rows}
+
+    def get_receipt_history(self, user_id: int) -> List[SummaryDetail]:
+        """Verify the user credentials on login and password changes"""
+        try:
+            return self.get_receipt_history_page(user_id).items
         except Exception as e:
             print(e)
             return e
 
-    def get_price_history(self, year: int, user_id: int) -> List[PriceDetail]:
-        try:
-            conn = sqlite3.connect("smartshelf.db")
+    def get_receipt_history_page(
+        self, user_id: int, after: Optional[Sequence] = None,
+        limit: Optional[int] = None,
+    ) -> Page[Dict]:
+        """
+        A user's receipts, newest first, from their ReceiptSummary rows.
+        after is the (add_date, receipt_id) of the previous page's last
+        receipt; the primary key is walked from there, so later pages cost
+        no more than the first
+        """
+        where = "WHERE user_id = ?"
+        params: List = [user_id]
+        if after is not None:
+            where += " AND (add_date, receipt_id) < (?, ?)"
+            params += list(after)
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             res = cursor.execute(
-                """
-                SELECT SUM(price) as total,
-                strftime('%m', add_date) AS month,
-                strftime('%Y', add_date) AS year
-                FROM GroceryReceipt gr
-                WHERE gr.user_id == ?
-                AND year = ?
-                GROUP BY month
+                f"""
+                SELECT receipt_id, add_date, items, total
+                FROM ReceiptSummary
+                {where}
+                ORDER BY add_date DESC, receipt_id DESC
+                {limit_clause(limit)}
                 """,
-                [user_id, str(year)],
+                params,
             )
-
             column_names = [description[0] for description in cursor.description]
-            result = [dict(zip(column_names, row)) for row in res.fetchall()]
-            conn.close()
+            rows = [dict(zip(column_names, row)) for row in res.fetchall()]
+        return keyset_page(
+            rows, limit, key=lambda row: (row["add_date"], row["receipt_id"])
+        )
+
+    def export_history(self, user_id: int, kind: str = "items",
+                       batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Tuple]]:
+        """
+        A user's whole history as EXPORTS[kind] rows, batch_size at a time.
+        A pooled connection is borrowed per chunk and returned before the
+        chunk is yielded, so a slow client never holds one
+        """
+        columns, _, _ = EXPORTS[kind]
+        width = len(columns)
+        after: Optional[Tuple] = None
+        while True:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                rows = cursor.execute(
+                    export_query(kind, after is not None),
+                    [user_id, *(after or ()), batch_size],
+                ).fetchall()
+            if rows:
+                yield [row[:width] for row in rows]
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][width:]
+
+    def get_price_history(self, year: int, user_id: int) -> List[PriceDetail]:
+        """Spend per month of a year, read from the MonthlySpend rollup"""
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                res = cursor.execute(
+                    """
+                    SELECT total, month, year, item_count
+                    FROM MonthlySpend
+                    WHERE user_id = ? AND year = ?
+                    ORDER BY month
+                    """,
+                    [user_id, str(year)],
+                )
+
+                column_names = [description[0] for description in cursor.description]
+                result = [dict(zip(column_names, row)) for row in res.fetchall()]
             return result
         except Exception as e:
             print(e)
@@ -131,21 +283,20 @@ class ReceiptPipeline:
 
     def get_receipt_for_user(self, user_id: int, receipt_id: str):
         try:
-            conn = sqlite3.connect("smartshelf.db")
-            cursor = conn.cursor()
-            res = cursor.execute(
-                """
-                    SELECT name, price
-                    FROM GroceryReceipt
-                    WHERE user_id == ?
-                    AND receipt_id == ?;
-                    """,
-                [user_id, receipt_id],
-            )
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                res = cursor.execute(
+                    """
+                        SELECT name, price
+                        FROM GroceryReceipt
+                        WHERE user_id == ?
+                        AND receipt_id == ?;
+                        """,
+                    [user_id, receipt_id],
+                )
 
-            column_names = [description[0] for description in cursor.description]
-            result = [dict(zip(column_names, row)) for row in res.fetchall()]
-            conn.close()
+                column_names = [description[0] for description in cursor.description]
+                result = [dict(zip(column_names, row)) for row in res.fetchall()]
             return result
         except Exception as e:
             print(e)
@@ -0,0 +1,277 @@
+import json
+import bisect
+import hashlib
+import logging
+import threading
+import weakref
+from typing import Dict, List, Optional, Tuple
+from database import ConnectionPool
+from table_versions import INSERTED, UNCHANGED, ChangeWatcher, Versions
+
+logger = logging.getLogger(__name__)
+
+
+class RecipeEntry:
+    __slots__ = (
+        "recipe_id", "name", "category", "cuisine_type",
+        "cooking_time", "difficulty_level",
+    )
+
+    def __init__(self, recipe_id, name, category, cuisine_type,
+                 cooking_time, difficulty_level):
+        self.recipe_id = recipe_id
+        self.name = name
+        self.category = category
+        self.cuisine_type = cuisine_type
+        self.cooking_time = cooking_time
+        self.difficulty_level = difficulty_level
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class IngredientEntry:
+    __slots__ = (
+        "ingredient_id", "name", "quantity", "measurement_unit", "recipe_id",
+        "calories", "protein", "fat", "carbs",
+    )
+
+    def __init__(self, ingredient_id, name, quantity, measurement_unit,
+                 recipe_id, calories, protein, fat, carbs):
+        self.ingredient_id = ingredient_id
+        self.name = name
+        self.quantity = quantity
+        self.measurement_unit = measurement_unit
+        self.recipe_id = recipe_id
+        self.calories = calories
+        self.protein = protein
+        self.fat = fat
+        self.carbs = carbs
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class RecipeCatalog:
+    """
+    In-process copy of the recipe catalog: every recipe, the per-cuisine
+    counts and, loaded on first request, each recipe's ingredient list.
+
+    Writes made through the pipelines update it directly. Every other
+    write, from any process, is picked up through the tables' versions
+    (table_versions.py), re-checked at most every CHECK_INTERVAL seconds:
+    new rows are loaded incrementally, an update or delete reloads.
+
+    Recipes and cuisine counts are copy-on-write: writers build new ones
+    under the lock and swap them in, readers take whatever is current
+    without locking and never see one change part way.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        # (recipes by id, their ids sorted for paging), replaced together
+        self._recipes: Optional[Tuple[Dict[int, RecipeEntry], List[int]]] = None
+        self._cuisines: Dict[Optional[str], int] = {}
+        self._ingredients: Dict[int, List[IngredientEntry]] = {}
+        # Bumped whenever cached ingredient lists are dropped, so a list
+        # read before that is not cached after it
+        self._generation = 0
+        self._watcher = ChangeWatcher(
+            "Recipe", "Ingredient", "GroceryItem", "NutritionFact"
+        )
+        self.etag = None
+
+    def _accept(self, versions: Versions):
+        self._watcher.accept(versions)
+        digest = hashlib.sha1(repr(versions).encode()).hexdigest()[:16]
+        self.etag = f'W/"{digest}"'
+
+    def _add_entries(self, entries: List[RecipeEntry]):
+        """Swap in copies with entries added, called under the lock"""
+        recipes, ids = self._recipes
+        entries = [entry for entry in entries if entry.recipe_id not in recipes]
+        if not entries:
+            return
+        recipes, ids = dict(recipes), list(ids)
+        cuisines = dict(self._cuisines)
+        for entry in entries:
+            recipes[entry.recipe_id] = entry
+            bisect.insort(ids, entry.recipe_id)
+            cuisines[entry.cuisine_type] = cuisines.get(entry.cuisine_type, 0) + 1
+        self._recipes = (recipes, ids)
+        self._cuisines = cuisines
+
+    def _load(self, conn):
+        recipes = {}
+        cuisines: Dict[Optional[str], int] = {}
+        for row in conn.execute(
+            """
+            SELECT recipe_id, name, category, cuisine_type, cooking_time,
+                difficulty_level
+            FROM Recipe ORDER BY recipe_id
+            """
+        ):
+            recipes[row["recipe_id"]] = RecipeEntry(*row)
+            cuisines[row["cuisine_type"]] = cuisines.get(row["cuisine_type"], 0) + 1
+        self._recipes = (recipes, list(recipes))
+        self._cuisines = cuisines
+        self._ingredients = {}
+        self._generation += 1
+        logger.info(f"Loaded recipe catalog: {len(recipes)} recipes")
+
+    def _load_inserted(self, conn, since: Versions):
+        """Add new recipes, drop the ingredient lists new rows belong to"""
+        (recipe_id, _), (ingredient_id, _), (item_id, _), _ = since
+        self._add_entries([RecipeEntry(*row) for row in conn.execute(
+            """
+            SELECT recipe_id, name, category, cuisine_type, cooking_time,
+                difficulty_level
+            FROM Recipe WHERE recipe_id > ? ORDER BY recipe_id
+            """,
+            (recipe_id,),
+        )])
+        # A new NutritionFact only shows up in a list once an item links it
+        stale = conn.execute(
+            """
+            SELECT recipe_id FROM Ingredient WHERE ingredient_id > ?
+            UNION
+            SELECT i.recipe_id FROM GroceryItem g
+            JOIN Ingredient i ON i.ingredient_id = g.ingredient_id
+            WHERE g.item_id > ?
+            """,
+            (ingredient_id, item_id),
+        ).fetchall()
+        if stale:
+            for row in stale:
+                self._ingredients.pop(row[0], None)
+            self._generation += 1
+
+    def _ensure_current(self):
+        if self._recipes is not None and not self._watcher.due():
+            return
+        with self._lock:
+            if self._recipes is not None and not self._watcher.due():
+                return
+            with self.pool.connection() as conn:
+                since = self._watcher.versions
+                change, versions = self._watcher.check(conn)
+                if self._recipes is None or since is None:
+                    self._load(conn)
+                elif change == INSERTED:
+                    self._load_inserted(conn, since)
+                elif change != UNCHANGED:
+                    self._load(conn)
+                self._accept(versions)
+
+    def current_etag(self) -> str:
+        self._ensure_current()
+        return self.etag
+
+    def recipes(self) -> List[RecipeEntry]:
+        self._ensure_current()
+        return list(self._recipes[0].values())
+
+    def recipes_after(self, after: Optional[int],
+                      limit: Optional[int] = None) -> List[RecipeEntry]:
+        """Recipes in id order with recipe_id > after, at most limit of them"""
+        self._ensure_current()
+        recipes, ids = self._recipes
+        start = 0 if after is None else bisect.bisect_right(ids, after)
+        end = None if limit is None else start + limit
+        return [recipes[recipe_id] for recipe_id in ids[start:end]]
+
+    def recipe(self, recipe_id: int) -> Optional[RecipeEntry]:
+        self._ensure_current()
+        return self._recipes[0].get(recipe_id)
+
+    def cuisines(self) -> List[Dict]:
+        self._ensure_current()
+        # Same order as GROUP BY cuisine_type: NULL first, then by name
+        return [
+            {"cuisine_type": cuisine_type, "count": count}
+            for cuisine_type, count in sorted(
+                self._cuisines.items(),
+                key=lambda item: (item[0] is not None, item[0] or ""),
+            )
+        ]
+
+    def ingredients(self, recipe_id: int) -> List[IngredientEntry]:
+        return self.ingredients_many([recipe_id])[recipe_id]
+
+    def ingredients_many(
+        self, recipe_ids: List[int]
+    ) -> Dict[int, List[IngredientEntry]]:
+        """Ingredient lists for several recipes, the uncached ones in one query"""
+        self._ensure_current()
+        generation = self._generation
+        found = {}
+        missing = []
+        for recipe_id in recipe_ids:
+            cached = self._ingredients.get(recipe_id)
+            if cached is None:
+                missing.append(recipe_id)
+            else:
+                found[recipe_id] = cached
+        if not missing:
+            return found
+        loaded: Dict[int, List[IngredientEntry]] = {
+            recipe_id: [] for recipe_id in missing
+        }
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT i.ingredient_id, i.name, i.quantity, i.measurement_unit,
+                    i.recipe_id, nf.calories, nf.protein, nf.fat, nf.carbs
+                FROM Ingredient i
+                JOIN GroceryItem g ON g.ingredient_id = i.ingredient_id
+                JOIN NutritionFact nf ON nf.nutrition_id = g.nutrition_id
+                WHERE i.recipe_id IN (SELECT value FROM json_each(?));
+                """,
+                (json.dumps(missing),),
+            ).fetchall()
+        for row in rows:
+            loaded[row["recipe_id"]].append(IngredientEntry(*row))
+        with self._lock:
+            # Dropped while the query ran: the rows may predate the change
+            if self._generation == generation:
+                self._ingredients.update(loaded)
+        found.update(loaded)
+        return found
+
+    def add_recipe(self, entry: RecipeEntry):
+        """Write-through for a recipe inserted by this process"""
+        with self._lock:
+            if self._recipes is None:
+                return  # Not loaded yet, the first read will see it
+            self._add_entries([entry])
+
+    def invalidate_ingredients(self, recipe_id: int):
+        """Drop a recipe's ingredient list after its ingredients or links change"""
+        with self._lock:
+            self._ingredients.pop(recipe_id, None)
+            self._generation += 1
+
+    def invalidate(self):
+        """Reload everything on the next read"""
+        with self._lock:
+            # Readers keep the current copy until the reload replaces it
+            self._watcher.reset()
+            self._ingredients = {}
+            self._generation += 1
+
+
+_catalogs: "weakref.WeakKeyDictionary[ConnectionPool, RecipeCatalog]" = (
+    weakref.WeakKeyDictionary()
+)
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(pool: ConnectionPool) -> RecipeCatalog:
+    """Process-wide catalog for a pool, created on first use"""
+    with _catalogs_lock:
+        catalog = _catalogs.get(pool)
+        if catalog is None:
+            catalog = RecipeCatalog(pool)
+            _catalogs[pool] = catalog
+        return catalog
@@ -0,0 +1,418 @@
+import sqlite3
+import logging
+from typing import List, Dict, Optional, Sequence
+from dataclasses import dataclass
+from database import DEFAULT_DB_PATH, ConnectionPool, get_pool
+from pipelines.recommender import get_recommender
+from pipelines.recipe_catalog import RecipeEntry, get_catalog
+from pipelines.shopping_list import ConsolidatedList, get_consolidator
+from pagination import Page, keyset_page, limit_clause
+from errors import DatabaseError
+import shortuuid
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngredientDetail:
+    ingredient_id: int
+    name: str
+    quantity: float
+    measurement_unit: str
+    recipe_id: int
+    calories: int
+    protein: int
+    fat: int
+    carbs: int
+
+
+@dataclass
+class IngredientPartial:
+    name: str
+    quantity: float
+    measurement_unit: str
+
+
+@dataclass
+class RecipeDetail:
+    name: str
+    category: float
+    cuisine_type: str
+    cooking_time: int
+    difficulty_level: int
+    ingredients: List[IngredientPartial]
+
+
+@dataclass
+class ShoppingListItem:
+    ingredient_name: str
+    quantity: float
+    measurement_unit: str
+    product_name: str
+    brand: str
+    price: float
+    category: str
+    store_location: Optional[str] = None
+
+
+class RecipeRepository:
+    """Recipe, ingredient and shopping list queries. SQLite only, no network"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH,
+                 pool: Optional[ConnectionPool] = None):
+        self.db_path = db_path
+        self.pool = pool or get_pool(db_path)
+        self.catalog = get_catalog(self.pool)
+
+    def check_populated(self):
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                res = cursor.execute(
+                    """
+                    SELECT 1 FROM Ingredient LIMIT 1;
+                    """
+                )
+                results = [dict(row) for row in res.fetchall()]
+            return results
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching recipes: {e}")
+            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
+
+    def get_recipe_details_all(self) -> List[Dict]:
+        """Get all recipes from the catalog cache"""
+        try:
+            return [entry.to_dict() for entry in self.catalog.recipes()]
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching recipes: {e}")
+            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
+
+    def get_recipe_details_page(self, after: Optional[int] = None,
+                                limit: Optional[int] = None) -> Page[Dict]:
+        """Recipes in recipe_id order, starting after the given id"""
+        try:
+            entries = self.catalog.recipes_after(
+                after, None if limit is None else limit + 1
+            )
+            return keyset_page(
+                entries, limit, key=lambda entry: (entry.recipe_id,),
+                item=RecipeEntry.to_dict,
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching recipes: {e}")
+            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
+
+    def get_recipe_cuisines(self) -> List[Dict]:
+        try:
+            return self.catalog.cuisines()
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching recipes: {e}")
+            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
+
+    def get_recipe_details_recommended(self, user_id: int) -> List[Dict]:
+        """Top recipes for what the user buys, see pipelines/recommender.py"""
+        try:
+            recipes = (
+                self.catalog.recipe(recipe_id)
+                for recipe_id in get_recommender(self.pool).recommend(user_id)
+            )
+            return [recipe.to_dict() for recipe in recipes if recipe]
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching recipes: {e}")
+            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
+
+    def get_recipe_details(self, recipe_id: int) -> Optional[Dict]:
+        """Get recipe details by ID"""
+        try:
+            entry = self.catalog.recipe(recipe_id)
+            return entry.to_dict() if entry else None
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching recipe {recipe_id}: {e}")
+            raise DatabaseError(f"Failed to fetch recipe: {str(e)}")
+
+    def get_recipe_ingredients(self, recipe_id: int) -> List[IngredientDetail]:
+        """Get ingredients for a recipe"""
+        try:
+            return [
+                IngredientDetail(**entry.to_dict())
+                for entry in self.catalog.ingredients(recipe_id)
+            ]
+        except sqlite3.Error as e:
+            logger.error(
+                f"Database error fetching ingredients for recipe {recipe_id}: {e}"
+            )
+            raise DatabaseError(f"Failed to fetch ingredients: {str(e)}")
+
+    def get_recipes_with_ingredients(self, recipe_ids: List[int]) -> List[Dict]:
+        """Recipes with their ingredient lists, in the order asked for"""
+        try:
+            recipes = [
+                recipe for recipe in map(self.catalog.recipe, dict.fromkeys(recipe_ids))
+                if recipe
+            ]
+            ingredients = self.catalog.ingredients_many(
+                [recipe.recipe_id for recipe in recipes]
+            )
+            return [
+                {
+                    **recipe.to_dict(),
+                    "ingredients": [
+                        entry.to_dict() for entry in ingredients[recipe.recipe_id]
+                    ],
+                }
+                for recipe in recipes
+            ]
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching ingredients for recipes: {e}")
+            raise DatabaseError(f"Failed to fetch ingredients: {str(e)}")
+
+    def get_recipe_cost(self, recipe_id: int) -> Optional[float]:
+        """A recipe's precomputed cost, None until it has linked products"""
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    "SELECT total_cost FROM RecipeCost WHERE recipe_id = ?",
+                    (recipe_id,),
+                ).fetchone()
+            return row["total_cost"] if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching cost of recipe {recipe_id}: {e}")
+            raise DatabaseError(f"Failed to fetch recipe cost: {str(e)}")
+
+    def get_recipes_by_cost_page(
+        self, max_cost: Optional[float] = None, descending: bool = False,
+        after: Optional[Sequence] = None, limit: Optional[int] = None,
+    ) -> Page[Dict]:
+        """
+        Recipes by their precomputed RecipeCost, cheapest first unless
+        descending, optionally costing at most max_cost. after is the
+        (total_cost, recipe_id) the previous page ended on
+        """
+        conditions = []
+        params: List = []
+        if max_cost is not None:
+            conditions.append("total_cost <= ?")
+            params.append(max_cost)
+        if after is not None:
+            conditions.append(
+                f"(total_cost, recipe_id) {'<' if descending else '>'} (?, ?)"
+            )
+            params += list(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+        try:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    f"""
+                    SELECT recipe_id, total_cost, items FROM RecipeCost
+                    {where}
+                    ORDER BY total_cost {direction}, recipe_id {direction}
+                    {limit_clause(limit)}
+                    """,
+                    params,
+                ).fetchall()
+            page = keyset_page(
+                rows, limit, key=lambda row: (row["total_cost"], row["recipe_id"])
+            )
+            # Details come from the in-memory catalog, not a join
+            page.items = [
+                {
+                    **recipe.to_dict(),
+                    "total_cost": round(row["total_cost"], 2),
+                    "priced_items": row["items"],
+                }
+                for row in page.items
+                for recipe in [self.catalog.recipe(row["recipe_id"])] if recipe
+            ]
+            return page
+        except sqlite3.Error as e:
+            logger.error(f"Database error fetching recipes by cost: {e}")
+            raise DatabaseError(f"Failed to fetch recipes: {str(e)}")
+
+    def _get_ingredients_to_link(self, recipe_id: int) -> List[IngredientDetail]:
+        """All of a recipe's ingredients, whether or not they have a GroceryItem"""
+        try:
+            with self.pool.connection() as conn:
+                results = conn.execute(
+                    """
+                    SELECT i.*, nf.calories, nf.fat, nf.protein, nf.carbs
+                    FROM Ingredient i
+                    LEFT JOIN NutritionFact nf ON nf.name = i.name
+                    WHERE i.recipe_id = ?;
+                    """,
+                    (recipe_id,),
+                ).fetchall()
+            return [
+                IngredientDetail(
+                    ingredient_id=row["ingredient_id"],
+                    name=row["name"],
+                    quantity=row["quantity"],
+                    measurement_unit=row["measurement_unit"],
+                    recipe_id=row["recipe_id"],
+                    calories=row["calories"] or 0,
+                    fat=row["fat"] or 0,
+                    carbs=row["carbs"] or 0,
+                    protein=row["protein"] or 0,
+                )
+                for row in results
+            ]
+        except sqlite3.Error as e:
+            logger.error(
+                f"Database error fetching ingredients for recipe {recipe_id}: {e}"
+            )
+            raise DatabaseError(f"Failed to fetch ingredients: {str(e)}")
+
+    def get_shopping_list_user(self, user_id: int):
+        """Get shopping list for a recipe with user"""
+        return self.get_shopping_list_user_page(user_id).items
+
+    def get_shopping_list_user_page(
+        self, user_id: int, after: Optional[Sequence] = None,
+        limit: Optional[int] = None,
+    ) -> Page[ShoppingListItem]:
+        """
+        One page of a user's shopping list in idx_shopping_list_user_item order.
+        after is the (grocery_id, rowid) the previous page ended on
+        """
+        where = "WHERE li.user_id = ?"
+        params: List = [user_id]
+        if after is not None:
+            where += " AND (li.grocery_id, li.rowid) > (?, ?)"
+            params += list(after)
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"""
+                    SELECT
+                        li.grocery_id,
+                        li.rowid as list_rowid,
+                        i.name as ingredient_name,
+                        i.quantity,
+                        i.measurement_unit,
+                        kp.name as product_name,
+                        kp.brand,
+                        kp.price,
+                        kp.category
+                    FROM ShoppingList li
+                    JOIN GroceryItem gi ON li.grocery_id = gi.item_id
+                    JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
+                    JOIN KrogerProduct kp ON kp.product_id = gi.kroger_product
+                    {where}
+                    ORDER BY li.grocery_id, li.rowid
+                    {limit_clause(limit)}
+                    """,
+                    params,
+                )
+                results = cursor.fetchall()
+            return keyset_page(
+                results, limit,
+                key=lambda row: (row["grocery_id"], row["list_rowid"]),
+                item=lambda row: ShoppingListItem(
+                    ingredient_name=row["ingredient_name"],
+                    quantity=row["quantity"],
+                    measurement_unit=row["measurement_unit"],
+                    product_name=row["product_name"],
+                    brand=row["brand"],
+                    price=row["price"],
+                    category=row["category"],
+                ),
+            )
+        except sqlite3.Error as e:
+            logger.error(
+                f"Database error fetching shopping list for user {user_id}: {e}"
+            )
+            raise DatabaseError(f"Failed to fetch shopping list: {str(e)}")
+
+    def get_shopping_list_consolidated(self, user_id: int) -> ConsolidatedList:
+        """A user's shopping list as one line per product, see pipelines/shopping_list.py"""
+        try:
+            return get_consolidator(self.pool).consolidate(user_id)
+        except sqlite3.Error as e:
+            logger.error(
+                f"Database error consolidating shopping list for user {user_id}: {e}"
+            )
+            raise DatabaseError(f"Failed to fetch shopping list: {str(e)}")
+
+    def get_shopping_list(self, recipe_id: int) -> List[ShoppingListItem]:
+        """Get shopping list for a recipe"""
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT
+                        i.name as ingredient_name,
+                        i.quantity,
+                        i.measurement_unit,
+                        kp.name as product_name,
+                        kp.brand,
+                        kp.price,
+                        kp.category
+                    FROM Ingredient i
+                    JOIN GroceryItem gi ON i.ingredient_id = gi.ingredient_id
+                    JOIN KrogerProduct kp ON gi.kroger_product = kp.product_id
+                    WHERE i.recipe_id = ?
+                    """,
+                    (recipe_id,),
+                )
+                results = cursor.fetchall()
+            return [
+                ShoppingListItem(
+                    ingredient_name=row["ingredient_name"],
+                    quantity=row["quantity"],
+                    measurement_unit=row["measurement_unit"],
+                    product_name=row["product_name"],
+                    brand=row["brand"],
+                    price=row["price"],
+                    category=row["category"],
+                )
+                for row in results
+            ]
+        except sqlite3.Error as e:
+            logger.error(
+                f"Database error fetching shopping list for recipe {recipe_id}: {e}"
+            )
+            raise DatabaseError(f"Failed to fetch shopping list: {str(e)}")
+
+    def add_shopping_list(self, recipe_id: int, user_id: int):
+        """
+        Add a recipe's grocery items to the user's list. Items already on
+        the list are skipped (idx_shopping_list_user_item is unique)
+        """
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                id = shortuuid.ShortUUID().random(length=32)
+                cursor.execute(
+                    """
+                    INSERT OR IGNORE INTO ShoppingList
+                        (list_id, user_id, grocery_id, created_date)
+                    SELECT ?, ?, gi.item_id, date('now') FROM GroceryItem gi
+                    JOIN Ingredient i ON gi.ingredient_id = i.ingredient_id
+                    WHERE i.recipe_id = ?;
+                    """,
+                    [id, user_id, recipe_id]
+                )
+            list_id = cursor.lastrowid
+            return list_id
+        except sqlite3.Error as e:
+            logger.error(f"Database error adding to list {user_id}: {e}")
+            raise DatabaseError(f"Failed to fetch recipe: {str(e)}")
+
+    def delete_shopping_list(self, user_id: int):
+        """Delete grocery items"""
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    DELETE FROM ShoppingList WHERE user_id = ?
+                    """,
+                    [user_id]
+                )
+            list_id = cursor.lastrowid
+            return list_id
+        except sqlite3.Error as e:
+            logger.error(f"Database error deleting to list {user_id}: {e}")
+            raise DatabaseError(f"Failed to fetch recipe: {str(e)}")
@@ -0,0 +1,259 @@
+import os
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+from database import ConnectionPool
+from pipelines.name_index import get_name_index, normalize
+from table_versions import UNCHANGED, ChangeWatcher
+
+logger = logging.getLogger(__name__)
+
+# A purchase counts half as much after this many days
+HALF_LIFE_DAYS = float(os.getenv("RECOMMENDER_HALF_LIFE_DAYS", 60))
+# Ranked recipe ids kept per user, recommend(limit) slices this
+CACHE_SIZE = 50
+MAX_USERS = int(os.getenv("RECOMMENDER_MAX_USERS", 1024))
+
+_EPOCH = date(2020, 1, 1)
+# Every user shares the anonymous key's affinity: all purchases, by anyone
+_EVERYONE = None
+
+
+def recency_weight(day: str) -> float:
+    """
+    Grows with the purchase date instead of decaying with its age, so a
+    stored weight never needs recomputing. Only ratios between weights
+    matter when ranking, and those are the same as with decay.
+    """
+    try:
+        days = (date.fromisoformat(str(day)[:10]) - _EPOCH).days
+    except ValueError:
+        days = 0
+    return 2.0 ** max(-900.0, min(900.0, days / HALF_LIFE_DAYS))
+
+
+class RecipeMatrix:
+    """Recipes x ingredient terms, tf-idf weighted with unit-length rows"""
+
+    def __init__(self, recipe_ids: np.ndarray, terms: Dict[str, int],
+                 matrix: sparse.csr_matrix):
+        self.recipe_ids = recipe_ids
+        self.terms = terms
+        self.matrix = matrix
+
+    @classmethod
+    def load(cls, conn) -> "RecipeMatrix":
+        cursor = conn.cursor()
+        cursor.row_factory = None  # Plain tuples, this reads every ingredient
+        rows = cursor.execute("SELECT recipe_id, name FROM Ingredient").fetchall()
+        recipe_column = np.fromiter((row[0] for row in rows), dtype=np.int64,
+                                    count=len(rows))
+        terms: Dict[str, int] = {}
+        columns_by_name = {
+            name: terms.setdefault(normalize(name), len(terms))
+            for name in {row[1] for row in rows}
+        }
+        column_index = np.fromiter((columns_by_name[row[1]] for row in rows),
+                                   dtype=np.int64, count=len(rows))
+        recipe_ids, row_index = np.unique(recipe_column, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (row_index, column_index)),
+            shape=(len(recipe_ids), len(terms)),
+        )
+        # An ingredient listed twice in a recipe still counts once
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        # Salt is in everything and says nothing about taste
+        document_frequency = np.bincount(matrix.indices, minlength=len(terms))
+        idf = np.log((1 + len(recipe_ids)) / (1 + document_frequency)) + 1
+        matrix = matrix @ sparse.diags(idf)
+        norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+        norms[norms == 0] = 1
+        matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+        return cls(recipe_ids, terms, matrix)
+
+
+class Affinity:
+    """One user's purchases as weights per ingredient term"""
+
+    def __init__(self):
+        self.weights: Dict[int, float] = {}
+        self.max_rowid = 0
+        self.ranked: Optional[List[int]] = None
+
+
+class Recommender:
+    """
+    Ranks every recipe for a user in one sparse matrix-vector product:
+    the recipe/ingredient matrix times the user's ingredient affinities,
+    built from GroceryReceipt with recent purchases weighted up.
+
+    Rankings are cached per user. New receipts are folded into the cached
+    affinities instead of reloading the user's history: at once by
+    add_purchases for this process's writes, and before each ranking is
+    served for any other process's. The matrix is rebuilt whenever
+    Ingredient changes (see table_versions.py).
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self.names = get_name_index(pool, "ingredient")
+        self._lock = threading.RLock()
+        self._matrix: Optional[RecipeMatrix] = None
+        self._watcher = ChangeWatcher("Ingredient")
+        # Largest GroceryReceipt rowid folded into the cached affinities
+        self._receipt_rowid = 0
+        self._term_cache: Dict[str, Optional[int]] = {}
+        self._users: "OrderedDict[Optional[int], Affinity]" = OrderedDict()
+
+    def _ensure_matrix(self) -> RecipeMatrix:
+        with self._lock:
+            if self._matrix is not None and not self._watcher.due():
+                return self._matrix
+            with self.pool.connection() as conn:
+                change, versions = self._watcher.check(conn)
+                if self._matrix is None or change != UNCHANGED:
+                    self._rebuild(conn)
+            self._watcher.accept(versions)
+            return self._matrix
+
+    def _rebuild(self, conn):
+        self._matrix = RecipeMatrix.load(conn)
+        # Term ids and rankings refer to the old matrix
+        self._term_cache = {}
+        self._users.clear()
+        # Affinities are loaded afresh from here on
+        self._receipt_rowid = conn.execute(
+            "SELECT MAX(rowid) FROM GroceryReceipt"
+        ).fetchone()[0] or 0
+        logger.info(
+            f"Recommender matrix: {self._matrix.matrix.shape[0]} recipes, "
+            f"{self._matrix.matrix.shape[1]} ingredients"
+        )
+
+    def _term(self, name: str) -> Optional[int]:
+        """The matrix column a receipt line buys, if it matches an ingredient"""
+        if name not in self._term_cache:
+            match = self.names.best(name)
+            self._term_cache[name] = (
+                self._matrix.terms.get(normalize(match.key)) if match else None
+            )
+        return self._term_cache[name]
+
+    def _add(self, affinity: Affinity, rows: Sequence[Tuple[int, str, str]]):
+        for rowid, name, day in rows:
+            if rowid <= affinity.max_rowid:
+                continue  # Already counted when the history was loaded
+            term = self._term(name)
+            if term is not None:
+                affinity.weights[term] = (
+                    affinity.weights.get(term, 0.0) + recency_weight(day)
+                )
+        if rows:
+            affinity.max_rowid = max(affinity.max_rowid, max(row[0] for row in rows))
+
+    def _affinity(self, user_id: Optional[int]) -> Affinity:
+        affinity = self._users.get(user_id)
+        if affinity is not None:
+            self._users.move_to_end(user_id)
+            return affinity
+        affinity = Affinity()
+        with self.pool.connection() as conn:
+            if user_id is _EVERYONE:
+                rows = conn.execute(
+                    "SELECT rowid, name, add_date FROM GroceryReceipt"
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    """
+                    SELECT rowid, name, add_date FROM GroceryReceipt
+                    WHERE user_id = ?
+                    """,
+                    (user_id,),
+                ).fetchall()
+        self._add(affinity, [tuple(row) for row in rows])
+        self._users[user_id] = affinity
+        if len(self._users) > MAX_USERS:
+            self._users.popitem(last=False)
+        return affinity
+
+    def _rank(self, matrix: RecipeMatrix, affinity: Affinity) -> List[int]:
+        if not affinity.weights or matrix.matrix.shape[0] == 0:
+            return []
+        # Weights grow with the date; scaling by the largest keeps them finite
+        top = max(affinity.weights.values())
+        vector = np.zeros(matrix.matrix.shape[1])
+        columns = np.fromiter(affinity.weights, dtype=np.int64)
+        vector[columns] = np.fromiter(affinity.weights.values(), dtype=float) / top
+        scores = matrix.matrix @ vector
+        count = min(CACHE_SIZE, len(scores))
+        cutoff = np.partition(scores, len(scores) - count)[len(scores) - count]
+        best = np.flatnonzero(scores >= max(cutoff, np.finfo(float).tiny))
+        # Highest score first, ties in recipe id order
+        best = best[np.lexsort((best, -scores[best]))][:count]
+        return [int(matrix.recipe_ids[i]) for i in best]
+
+    def _fold_new_receipts(self):
+        """Fold in receipts written since the last check, by any process"""
+        with self.pool.connection() as conn:
+            if (conn.execute("SELECT MAX(rowid) FROM GroceryReceipt").fetchone()[0]
+                    or 0) <= self._receipt_rowid:
+                return
+            rows = conn.execute(
+                """
+                SELECT rowid, user_id, name, add_date FROM GroceryReceipt
+                WHERE rowid > ?
+                """,
+                (self._receipt_rowid,),
+            ).fetchall()
+        purchases: Dict[int, List[Tuple[int, str, str]]] = {}
+        for rowid, user_id, name, add_date in rows:
+            purchases.setdefault(user_id, []).append((rowid, name, add_date))
+        for user_id, user_rows in purchases.items():
+            self.add_purchases(user_id, user_rows)
+        self._receipt_rowid = max(row[0] for row in rows)
+
+    def recommend(self, user_id: int, limit: int = 5) -> List[int]:
+        """Recipe ids, best first. Users without a history get what sells most"""
+        matrix = self._ensure_matrix()
+        with self._lock:
+            self._fold_new_receipts()
+            for key in (user_id, _EVERYONE):
+                affinity = self._affinity(key)
+                if affinity.ranked is None:
+                    affinity.ranked = self._rank(matrix, affinity)
+                if affinity.ranked:
+                    return affinity.ranked[:limit]
+            return [int(recipe_id) for recipe_id in matrix.recipe_ids[:limit]]
+
+    def add_purchases(self, user_id: int, rows: Sequence[Tuple[int, str, str]]):
+        """Fold freshly written GroceryReceipt (rowid, name, add_date) rows in"""
+        with self._lock:
+            if self._matrix is None:
+                return  # Nothing cached yet, the first recommend loads them
+            for key in (user_id, _EVERYONE):
+                affinity = self._users.get(key)
+                if affinity is not None:
+                    self._add(affinity, rows)
+                    affinity.ranked = None
+
+
+_recommenders: "weakref.WeakKeyDictionary[ConnectionPool, Recommender]" = (
+    weakref.WeakKeyDictionary()
+)
+_recommenders_lock = threading.Lock()
+
+
+def get_recommender(pool: ConnectionPool) -> Recommender:
+    """Process-wide recommender for a pool, created on first use"""
+    with _recommenders_lock:
+        recommender = _recommenders.get(pool)
+        if recommender is None:
+            recommender = Recommender(pool)
+            _recommenders[pool] = recommender
+        return recommender
@@ -0,0 +1,147 @@
+import os
+import json
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from database import ConnectionPool
+from pipelines.units import packages_needed, to_base
+
+# Consolidated lists kept, least recently read are dropped first
+MAX_USERS = int(os.getenv("SHOPPING_LIST_MAX_USERS", 1024))
+
+# Tables whose updates and deletes can change any user's consolidated list.
+# New rows only matter once a ShoppingList row points at them, which moves
+# that user's MAX(rowid)
+TRACKED = ("ShoppingList", "GroceryItem", "Ingredient", "KrogerProduct")
+
+
+@dataclass
+class ConsolidatedItem:
+    product_id: int
+    product_name: str
+    brand: str
+    category: str
+    price: float
+    size: Optional[str]
+    # dimension => amount needed, in ml, g, each or the recipe's own unit
+    quantities: Dict[str, float] = field(default_factory=dict)
+    ingredients: List[str] = field(default_factory=list)
+    packages: int = 1
+    cost: float = 0.0
+
+
+@dataclass
+class ConsolidatedList:
+    items: List[ConsolidatedItem]
+    total_cost: float
+
+
+class ShoppingListConsolidator:
+    """
+    A user's shopping list as one line per product: every recipe's amounts
+    summed per product and unit in a single GROUP BY, converted to a base
+    unit (pipelines/units.py) and combined, then turned into whole packages
+    and a cost.
+
+    Results are cached per user and reused while the user's ShoppingList
+    rows are unchanged and no row of TRACKED has been updated or deleted
+    (a price, a package size, a quantity), checked per request on an
+    index-only fingerprint and the TableVersion counters.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._lists: "OrderedDict[int, Tuple[Tuple, ConsolidatedList]]" = OrderedDict()
+
+    def consolidate(self, user_id: int) -> ConsolidatedList:
+        with self.pool.connection() as conn:
+            fingerprint = tuple(conn.execute(
+                f"""
+                SELECT COUNT(*), MAX(rowid), (
+                    SELECT TOTAL(modified) FROM TableVersion
+                    WHERE name IN ({', '.join('?' * len(TRACKED))})
+                )
+                FROM ShoppingList WHERE user_id = ?
+                """,
+                (*TRACKED, user_id),
+            ).fetchone())
+            with self._lock:
+                cached = self._lists.get(user_id)
+                if cached is not None and cached[0] == fingerprint:
+                    self._lists.move_to_end(user_id)
+                    return cached[1]
+            rows = conn.execute(
+                """
+                SELECT kp.product_id, kp.name AS product_name, kp.brand, kp.category,
+                    kp.price, kp.size, i.measurement_unit AS unit,
+                    TOTAL(i.quantity) AS amount,
+                    json_group_array(DISTINCT i.name) AS ingredients
+                FROM ShoppingList li
+                JOIN GroceryItem gi ON gi.item_id = li.grocery_id
+                JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
+                JOIN KrogerProduct kp ON kp.product_id = gi.kroger_product
+                WHERE li.user_id = ?
+                GROUP BY kp.product_id, i.measurement_unit
+                ORDER BY kp.product_id
+                """,
+                (user_id,),
+            ).fetchall()
+        consolidated = self._build(rows)
+        with self._lock:
+            self._lists[user_id] = (fingerprint, consolidated)
+            self._lists.move_to_end(user_id)
+            if len(self._lists) > MAX_USERS:
+                self._lists.popitem(last=False)
+        return consolidated
+
+    @staticmethod
+    def _build(rows) -> ConsolidatedList:
+        items: Dict[int, ConsolidatedItem] = {}
+        for row in rows:
+            item = items.get(row["product_id"])
+            if item is None:
+                item = items[row["product_id"]] = ConsolidatedItem(
+                    product_id=row["product_id"],
+                    product_name=row["product_name"],
+                    brand=row["brand"],
+                    category=row["category"],
+                    price=row["price"] or 0.0,
+                    size=row["size"],
+                )
+            # "cup" and "cups" are separate groups but one dimension
+            dimension, amount = to_base(row["amount"], row["unit"])
+            item.quantities[dimension] = item.quantities.get(dimension, 0.0) + amount
+            item.ingredients.extend(
+                name for name in json.loads(row["ingredients"])
+                if name not in item.ingredients
+            )
+        for item in items.values():
+            item.quantities = {
+                dimension: round(amount, 2)
+                for dimension, amount in item.quantities.items()
+            }
+            item.packages = packages_needed(item.quantities, item.size)
+            item.cost = round(item.packages * item.price, 2)
+        return ConsolidatedList(
+            items=list(items.values()),
+            total_cost=round(sum(item.cost for item in items.values()), 2),
+        )
+
+
+_consolidators: "weakref.WeakKeyDictionary[ConnectionPool, ShoppingListConsolidator]" = (
+    weakref.WeakKeyDictionary()
+)
+_consolidators_lock = threading.Lock()
+
+
+def get_consolidator(pool: ConnectionPool) -> ShoppingListConsolidator:
+    """Process-wide consolidator for a pool, created on first use"""
+    with _consolidators_lock:
+        consolidator = _consolidators.get(pool)
+        if consolidator is None:
+            consolidator = ShoppingListConsolidator(pool)
+            _consolidators[pool] = consolidator
+        return consolidator
@@ -0,0 +1,82 @@
+import re
+import math
+from fractions import Fraction
+from typing import Dict, Optional, Tuple
+
+# unit => (dimension, size in the dimension's base unit: ml, g or each).
+# Recipes mean weight by a bare "oz", only "fl oz" is a volume
+UNITS: Dict[str, Tuple[str, float]] = {
+    **dict.fromkeys(["ml", "milliliter", "milliliters"], ("ml", 1.0)),
+    **dict.fromkeys(["l", "liter", "liters", "litre", "litres"], ("ml", 1000.0)),
+    **dict.fromkeys(["tsp", "tsps", "teaspoon", "teaspoons"], ("ml", 4.92892)),
+    **dict.fromkeys(["tbsp", "tbsps", "tbs", "tablespoon", "tablespoons"],
+                    ("ml", 14.7868)),
+    **dict.fromkeys(["fl oz", "floz", "fluid ounce", "fluid ounces"], ("ml", 29.5735)),
+    **dict.fromkeys(["cup", "cups", "c"], ("ml", 236.588)),
+    **dict.fromkeys(["pt", "pint", "pints"], ("ml", 473.176)),
+    **dict.fromkeys(["qt", "quart", "quarts"], ("ml", 946.353)),
+    **dict.fromkeys(["gal", "gallon", "gallons"], ("ml", 3785.41)),
+    **dict.fromkeys(["mg"], ("g", 0.001)),
+    **dict.fromkeys(["g", "gram", "grams"], ("g", 1.0)),
+    **dict.fromkeys(["kg", "kilogram", "kilograms"], ("g", 1000.0)),
+    **dict.fromkeys(["oz", "ounce", "ounces"], ("g", 28.3495)),
+    **dict.fromkeys(["lb", "lbs", "pound", "pounds"], ("g", 453.592)),
+    **dict.fromkeys(["", "ct", "count", "each", "ea", "whole", "large", "medium",
+                     "small"], ("each", 1.0)),
+}
+
+# Recipe shorthand that only case tells apart, read before lowercasing
+_CASED = {"T": "tbsp", "t": "tsp"}
+
+_SIZE = re.compile(r"(\d+(?:\.\d+)?(?:\s*/\s*\d+)?)\s*([a-z][a-z .]*)?")
+
+
+def unit_key(unit: Optional[str]) -> str:
+    """How a measurement_unit is looked up in UNITS: "Tbsp." => "tbsp", "T" => "tbsp" """
+    key = " ".join((unit or "").replace(".", "").split())
+    return _CASED.get(key) or key.lower()
+
+
+def to_base(quantity: Optional[float], unit: Optional[str]) -> Tuple[str, float]:
+    """
+    (dimension, amount in its base unit). A unit UNITS does not know, like
+    "cloves" or "pinch", is its own dimension and is only summed with itself
+    """
+    key = unit_key(unit)
+    dimension, factor = UNITS.get(key, (key, 1.0))
+    return dimension, (quantity or 0) * factor
+
+
+def parse_size(size: Optional[str]) -> Optional[Tuple[str, float]]:
+    """
+    A Kroger package size ("16 oz", "1/2 gal", "12 ct") as (dimension,
+    amount), or None when it cannot be read
+    """
+    match = _SIZE.search((size or "").lower())
+    if not match:
+        return None
+    try:
+        amount = float(Fraction(match.group(1).replace(" ", "")))
+    except ZeroDivisionError:
+        return None
+    words = unit_key(match.group(2)).split()
+    # "2 lb bag", "24 fl oz bottle": the longest known unit first
+    key = next((" ".join(words[:n]) for n in (2, 1, 0)
+                if " ".join(words[:n]) in UNITS), None)
+    if key is None or amount <= 0:
+        return None
+    dimension, factor = UNITS[key]
+    return dimension, amount * factor
+
+
+def packages_needed(needed: Dict[str, float], size: Optional[str]) -> int:
+    """
+    Packages of a product that cover the needed amounts per dimension.
+    Amounts that cannot be compared with the package size still need one
+    """
+    package = parse_size(size)
+    if package is None or needed.get(package[0], 0) <= 0:
+        return 1
+    dimension, amount = package
+    # Rounded first, so 2.0000001 packages is 2 rather than 3
+    return max(1, math.ceil(round(needed[dimension] / amount, 6)))
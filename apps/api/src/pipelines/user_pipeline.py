@@ -1,8 +1,8 @@
-import sqlite3
 import logging
-from typing import List
+from typing import Dict, List, Optional
 from datetime import datetime
 from dataclasses import dataclass
+from database import DEFAULT_DB_PATH, ConnectionPool, get_pool
 from errors import DatabaseError
 
 logger = logging.getLogger("")
@@ -27,136 +27,112 @@ class UserDetail:
 
 
 class UserPipeline:
-    def __init__(self, db_path='smartshelf.db'):
+    def __init__(self, db_path=DEFAULT_DB_PATH, pool: Optional[ConnectionPool] = None):
         self.db_path = db_path
-
-    def _get_db_connection(self):
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            return conn
-        except sqlite3.Error as e:
-            logger.error(f"Database connection error: {e}")
-            raise DatabaseError(f"Failed to connect to database: {str(e)}")
+        self.pool = pool or get_pool(db_path)
 
     def add_new_user(self, new_user: UserDetail) -> bool:
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute(
-                """
-                INSERT INTO User (name, email, password, reg_date)
-                VALUES (?, ?, ?, ?);
-                """,
-                [new_user.name, new_user.email, new_user.password, new_user.date]
-            )
+            with self.pool.writer() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO User (name, email, password, reg_date)
+                    VALUES (?, ?, ?, ?);
+                    """,
+                    [new_user.name, new_user.email, new_user.password, new_user.date]
+                )
+            return True
         except Exception as e:
             logger.error(f"Cannot add new user {e}")
-        finally:
-            cursor.commit()
-            conn.close()
+            raise e
 
     def op_user(self, new_admin_email: str):
         """ Add new admin """
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute(
-                """
-                UPDATE User
-                SET admin = 1
-                WHERE email = ?;
-                """,
-                [new_admin_email],
-            )
-            conn.commit()
+            with self.pool.writer() as conn:
+                conn.execute(
+                    """
+                    UPDATE User
+                    SET admin = 1
+                    WHERE email = ?;
+                    """,
+                    [new_admin_email],
+                )
             return "ok"
         except Exception as e:
             logger.error(f"Cannot verify user {e}")
             raise e
-        finally:
-            conn.close()
 
     def verify_credentials(self, email: str, password: str):
         """Verify the user credentials on login and password changes"""
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        try:
-            res = cursor.execute(
-                """
-                SELECT user_id, name, email, admin from User
-                WHERE email = ?
-                AND password= ?;
-                """,
-                [email, password],
-            )
-            user = res.fetchone()
-            if user is None:
-                raise DatabaseError("User Not Found")
-            return user
-        except Exception as e:
-            logger.error(f"Cannot verify user {e}")
-            raise e
-        finally:
-            conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                res = cursor.execute(
+                    """
+                    SELECT user_id, name, email, admin from User
+                    WHERE email = ?
+                    AND password= ?;
+                    """,
+                    [email, password],
+                )
+                user = res.fetchone()
+                if user is None:
+                    raise DatabaseError("User Not Found")
+                return user
+            except Exception as e:
+                logger.error(f"Cannot verify user {e}")
+                raise e
 
     def update_credentials(self, id: int, newInfo: UserDetail) -> bool:
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute(
-                """
-                UPDATE User
-                SET name= ?, email= ?, password = ?
-                WHERE user_id = ?;
-                """,
-                [newInfo.name, newInfo.email, newInfo.password, id],
-            )
+            with self.pool.writer() as conn:
+                conn.execute(
+                    """
+                    UPDATE User
+                    SET name= ?, email= ?, password = ?
+                    WHERE user_id = ?;
+                    """,
+                    [newInfo.name, newInfo.email, newInfo.password, id],
+                )
             return True
         except Exception as e:
             logger.error(f"Cannot verify user {e}")
             raise e
-        finally:
-            cursor.commit()
-            conn.close()
 
-    def get_max_and_min(self) -> List[int]:
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        try:
-            res = cursor.execute(
-                """
-                SELECT MIN(count) as min, MAX(count) as max, AVG(count) as avg
-                FROM (
-                   SELECT strftime('%m, %Y', reg_date) AS signup_date,
-                   strftime('%Y', reg_date) AS year, Count(*) as count
-                   FROM User GROUP BY signup_date ORDER BY year
-                );
-                """
-            )
-            column_names = [description[0] for description in cursor.description]
-            result = [dict(zip(column_names, row)) for row in res.fetchall()]
-            return result
-        except Exception as e:
-            logger.error(f"Cannot fetch monthly statistics {e}")
-        finally:
-            conn.close()
+    def get_max_and_min(self) -> List[Dict]:
+        """Fewest, most and average signups per month, from SignupMonthly"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                res = cursor.execute(
+                    """
+                    SELECT MIN(signups) as min, MAX(signups) as max, AVG(signups) as avg
+                    FROM SignupMonthly;
+                    """
+                )
+                column_names = [description[0] for description in cursor.description]
+                result = [dict(zip(column_names, row)) for row in res.fetchall()]
+                return result
+            except Exception as e:
+                logger.error(f"Cannot fetch monthly statistics {e}")
 
     def get_monthly_signups(self) -> List[MonthlyStatDetail]:
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        try:
-            res = cursor.execute(
-                """
-                SELECT strftime('%m, %Y', reg_date) AS signup_date,
-                strftime('%Y', reg_date) AS year, Count(*) as signups
-                FROM User GROUP BY signup_date ORDER BY year;
-                """
-            )
-            column_names = [description[0] for description in cursor.description]
-            result = [dict(zip(column_names, row)) for row in res.fetchall()]
-            return result
-        except Exception as e:
-            logger.error(f"Cannot fetch monthly statistics {e}")
-        finally:
-            conn.close()
+        """
+        Signups per month, oldest first. The counters are kept by triggers on
+        User (migration 11), so this reads a row per month, not per user
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                res = cursor.execute(
+                    """
+                    SELECT month || ', ' || year AS signup_date, year, signups
+                    FROM SignupMonthly ORDER BY year, month;
+                    """
+                )
+                column_names = [description[0] for description in cursor.description]
+                result = [dict(zip(column_names, row)) for row in res.fetchall()]
+                return result
+            except Exception as e:
+                logger.error(f"Cannot fetch monthly statistics {e}")
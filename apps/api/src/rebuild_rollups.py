@@ -0,0 +1,34 @@
+"""
+Recomputes the GroceryReceipt rollups (see rollups.py) from the line items,
+after receipts were loaded without going through ReceiptPipeline.
+
+usage (from apps/api):
+    python src/rebuild_rollups.py [MonthlySpend ReceiptSummary]
+"""
+import argparse
+import logging
+from database import get_pool
+from migrations import migrate
+from rollups import ROLLUPS, rebuild
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("names", nargs="*", help="rollups to rebuild, all by default")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in ROLLUPS]
+    if unknown:
+        parser.error(f"unknown rollup(s) {', '.join(unknown)}, "
+                     f"choose from {', '.join(ROLLUPS)}")
+    logging.basicConfig(format="%(levelname)s:\t  %(message)s", level=logging.INFO)
+
+    pool = get_pool()
+    migrate(pool)
+    with pool.writer() as conn:
+        counts = rebuild(conn, args.names)
+    for name, count in counts.items():
+        print(f"{name}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Tables derived from GroceryReceipt, so the receipt pages read a row per
+month or per receipt instead of aggregating every line item:
+    - MonthlySpend: a user's total spend and line count per month
+    - ReceiptSummary: a receipt's date, line count and total
+
+ReceiptPipeline.add_receipts folds new lines in within the transaction
+that writes them. Receipts written any other way (a bulk load, a restored
+backup) need a rebuild, see rebuild_rollups.py.
+"""
+import sqlite3
+from typing import Dict, Iterable, Optional
+
+# name => upsert adding the GroceryReceipt lines with rowid > ?
+ROLLUPS: Dict[str, str] = {
+    "MonthlySpend": """
+        INSERT INTO MonthlySpend (user_id, year, month, total, item_count)
+        SELECT user_id, strftime('%Y', add_date) AS year,
+            strftime('%m', add_date) AS month, SUM(price), COUNT(*)
+        FROM GroceryReceipt
+        WHERE rowid > ? AND year IS NOT NULL
+        GROUP BY user_id, year, month
+        ON CONFLICT (user_id, year, month) DO UPDATE SET
+            total = total + excluded.total,
+            item_count = item_count + excluded.item_count
+    """,
+    "ReceiptSummary": """
+        INSERT INTO ReceiptSummary (user_id, add_date, receipt_id, items, total)
+        SELECT user_id, add_date, receipt_id, COUNT(*), SUM(price)
+        FROM GroceryReceipt
+        WHERE rowid > ? AND receipt_id IS NOT NULL
+        GROUP BY user_id, add_date, receipt_id
+        ON CONFLICT (user_id, add_date, receipt_id) DO UPDATE SET
+            items = items + excluded.items,
+            total = total + excluded.total
+    """,
+}
+
+
+def add_lines(conn: sqlite3.Connection, after_rowid: int):
+    """Fold GroceryReceipt lines past after_rowid into every rollup"""
+    for sql in ROLLUPS.values():
+        conn.execute(sql, (after_rowid,))
+
+
+def rebuild(conn: sqlite3.Connection,
+            names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Recompute rollups from every GroceryReceipt line, returns their row counts"""
+    counts = {}
+    for name in names or ROLLUPS:
+        conn.execute(f"DELETE FROM {name}")
+        conn.execute(ROLLUPS[name], (0,))
+        counts[name] = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+    return counts
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, List
+import logging
+from jobs import runner, POPULATE_JOB
+from populate import Populate
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["admin"], prefix="/api/v1/admin")
+
+
+def start_populate_job():
+    return runner.submit(
+        POPULATE_JOB, lambda job: Populate(job=job),
+        total_steps=len(Populate.STEPS),
+    )
+
+
+@router.get("/jobs", response_model=List[Dict])
+async def list_jobs():
+    return [job.to_dict() for job in runner.list()]
+
+
+@router.get("/jobs/{job_id}", response_model=Dict)
+async def get_job(job_id: str):
+    job = runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.post("/jobs/populate", response_model=Dict, status_code=202)
+async def populate():
+    """Re-run population, e.g. after a cancelled or failed startup load"""
+    try:
+        return start_populate_job().to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=Dict, status_code=202)
+async def cancel_job(job_id: str):
+    """Stops at the next checkpoint; finished steps are kept"""
+    job = runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -0,0 +1,20 @@
+from fastapi import HTTPException
+from typing import Callable
+from jobs import runner, POPULATE_JOB
+
+
+def requires_data(*steps: str) -> Callable[[], None]:
+    """
+    Dependency for endpoints that need data loaded by the populate job.
+    While that job is still working toward one of the steps, respond 503
+    with Retry-After instead of serving partial or empty results.
+    """
+    def check():
+        missing = runner.unfinished_steps(POPULATE_JOB, steps)
+        if missing:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Still loading {', '.join(missing)}, try again shortly",
+                headers={"Retry-After": "5"},
+            )
+    return check
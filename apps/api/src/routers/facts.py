@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from pipelines.nutrition_pipeline import NutritionPipeline
 from typing import List
+from routers.dependencies import requires_data
 import logging
 
 logger = logging.getLogger("")
@@ -10,7 +11,7 @@ logging.basicConfig(format="%(levelname)s:\t  %(message)s", level=logging.DEBUG)
 router = APIRouter(tags=["nutrition facts"], prefix="/api/v1/facts")
 
 
-@router.get("/{name}")
+@router.get("/{name}", dependencies=[Depends(requires_data("nutrition_facts"))])
 def get_fact(name: str):
     try:
         pipeline = NutritionPipeline()
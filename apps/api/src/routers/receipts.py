@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
-from pydantic import BaseModel
-from pipelines.receipt_pipeline import ReceiptPipeline
-from typing import List
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from pipelines.receipt_pipeline import EXPORTS, ReceiptPipeline, ReceiptResult
+from typing import AsyncIterator, List, Literal, Optional
+from pagination import PageParams, page_params, page_response
+from streaming import stream_response
 import logging
 
 logger = logging.getLogger("")
@@ -10,32 +14,109 @@ logging.basicConfig(format="%(levelname)s:\t  %(message)s", level=logging.DEBUG)
 
 router = APIRouter(tags=["receipts"], prefix="/api/v1/receipts")
 
+# Receipts accepted by one /bulk request
+MAX_BULK_RECEIPTS = int(os.getenv("SMARTSHELF_MAX_BULK_RECEIPTS", 10000))
+
 
 class ReceiptItem(BaseModel):
     name: str
     price: float
 
 
+# Columns of a receipt_history row, what fields= can pick from
+RECEIPT_HISTORY_FIELDS = ["receipt_id", "add_date", "items", "total"]
+
+
 class Receipt(BaseModel):
     ingredients: List[ReceiptItem]
     date: str = datetime.now().strftime("%Y-%m-%d")
     user_id: int
+    # Retrying with the same key returns the first upload's receipt_id
+    idempotency_key: Optional[str] = None
+
+
+ReceiptList = TypeAdapter(List[Receipt])
 
 
 @router.post("/add_receipt")
-async def add_receipt(receipt: Receipt):
+async def add_receipt(receipt: Receipt,
+                      idempotency_key: Optional[str] = Header(None)):
     try:
+        if receipt.idempotency_key is None:
+            receipt.idempotency_key = idempotency_key
         pipeline = ReceiptPipeline()
         return pipeline.add_new_receipt(receipt)
     except Exception as e:
         logger.error(f"Error calling method {e}")
 
 
+async def _ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    yield pending
+
+
+async def _read_receipts(request: Request) -> List[Receipt]:
+    """A JSON array of receipts, or NDJSON read one line at a time"""
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        receipts = []
+        number = 0
+        async for line in _ndjson_lines(request):
+            number += 1
+            if not line.strip():
+                continue
+            try:
+                receipts.append(Receipt.model_validate_json(line))
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=422,
+                    detail={"line": number, "errors": e.errors(include_url=False)},
+                )
+            if len(receipts) > MAX_BULK_RECEIPTS:
+                break
+    else:
+        try:
+            receipts = ReceiptList.validate_json(await request.body())
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    if len(receipts) > MAX_BULK_RECEIPTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BULK_RECEIPTS} receipts per request",
+        )
+    return receipts
+
+
+@router.post("/bulk", response_model=List[ReceiptResult])
+async def add_receipts_bulk(request: Request):
+    """
+    Many receipts written in a single transaction, sent as a JSON array or
+    as NDJSON (Content-Type: application/x-ndjson, one receipt per line).
+    Give each receipt an idempotency_key so a failed request can be retried
+    as is: receipts already written come back with created false
+    """
+    receipts = await _read_receipts(request)
+    pipeline = ReceiptPipeline()
+    return await run_in_threadpool(pipeline.add_receipts, receipts)
+
+
 @router.get("/receipt_history")
-async def get_receipt_history(user_id: int):
+async def get_receipt_history(
+    user_id: int, request: Request, params: PageParams = Depends(page_params)
+):
+    """A user's receipts newest first, a page at a time (see pagination.py)"""
     try:
         pipeline = ReceiptPipeline()
-        return pipeline.get_receipt_history(user_id)
+        page = pipeline.get_receipt_history_page(
+            user_id, params.after(str, str), params.limit
+        )
+        return page_response(request, page, params, RECEIPT_HISTORY_FIELDS)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error calling method {e}")
 
@@ -56,3 +137,22 @@ def get_receipt_for_user(user_id: int, receipt_id: str):
         return pipeline.get_receipt_for_user(user_id, receipt_id)
     except Exception as e:
         logger.error(f"Error calling method {e}")
+
+
+@router.get("/export")
+def export_history(
+    user_id: int,
+    kind: Literal["items", "receipts", "prices"] = "items",
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+):
+    """
+    A user's whole receipt or price history as one streamed NDJSON or CSV
+    download, rows are sent as they are read (see streaming.py)
+    """
+    pipeline = ReceiptPipeline()
+    columns, _, _ = EXPORTS[kind]
+    return stream_response(
+        columns, pipeline.export_history(user_id, kind), format,
+        filename=f"{kind}-{user_id}", gzip=gzip,
+    )
@@ -1,15 +1,18 @@
 # src/routes/recipe_routes.py
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional, Dict
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Request, Response
+from typing import List, Literal, Optional, Dict
 from pydantic import BaseModel
 import logging
-from pipelines.ingredient_pipeline import IngredientPipeline
-from pipelines.kroger_api_utils import KrogerAPI
-import os
+from pipelines.recipe_repository import RecipeRepository
+from routers.dependencies import requires_data
+from pagination import PageParams, page_params, page_response
 
 router = APIRouter(prefix="/api/v1/recipes", tags=["recipes"])
 logger = logging.getLogger(__name__)
 
+# Recipes per /batch request, keeps the response a bounded size
+MAX_BATCH_RECIPES = 100
+
 
 class Recipe(BaseModel):
     recipe_id: int
@@ -43,42 +46,183 @@ class ShoppingListItem(BaseModel):
     store_location: Optional[str]
 
 
+class ConsolidatedItem(BaseModel):
+    product_id: int
+    product_name: str
+    brand: Optional[str]
+    category: Optional[str]
+    price: float
+    size: Optional[str]
+    quantities: Dict[str, float]
+    ingredients: List[str]
+    packages: int
+    cost: float
+
+
+class ConsolidatedList(BaseModel):
+    items: List[ConsolidatedItem]
+    total_cost: float
+
+
+RECIPE_FIELDS = list(Recipe.model_fields)
+SHOPPING_LIST_FIELDS = list(ShoppingListItem.model_fields)
+
+
+class RecipeCost(Recipe):
+    total_cost: float
+    priced_items: int
+
+
+RECIPE_COST_FIELDS = list(RecipeCost.model_fields)
+
+
+class RecipeWithIngredients(Recipe):
+    ingredients: List[Ingredient]
+
+
 class IdLookUps(BaseModel):
     user_id: int
     recipe_id: int
 
 
-# Dependency for IngredientPipeline
-def get_ingredient_pipeline():
-    client_id = os.getenv("KROGER_CLIENT_ID")
-    client_secret = os.getenv("KROGER_CLIENT_SECRET")
-    location_id = os.getenv("KROGER_LOCATION_ID", "70100465")
+# Catalog reads only need SQLite
+def get_recipe_repository() -> RecipeRepository:
+    return RecipeRepository()
 
-    if not client_id or not client_secret:
-        raise HTTPException(status_code=500, detail="Missing Kroger API credentials")
 
-    return IngredientPipeline(
-        client_id=client_id, client_secret=client_secret, location_id=location_id
-    )
+def _not_modified(
+    request: Request, response: Response, repository: RecipeRepository
+) -> Optional[Response]:
+    """
+    Tag a catalog response with the catalog's ETag. Returns a bare 304 when
+    the client already holds the current version.
+    """
+    etag = repository.catalog.current_etag()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
 
 
-@router.get("/", response_model=List[Recipe])
-async def get_all_recipes():
-    """Get all available recipes"""
+@router.get(
+    "/", response_model=List[Recipe],
+    dependencies=[Depends(requires_data("recipes"))],
+)
+async def get_all_recipes(
+    request: Request,
+    response: Response,
+    params: PageParams = Depends(page_params),
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
+    """Recipes in id order, a page at a time (see pagination.py)"""
     try:
-        pipeline = get_ingredient_pipeline()
-        return pipeline.get_recipe_details_all()
+        not_modified = _not_modified(request, response, repository)
+        if not_modified:
+            return not_modified
+        after = params.after(int)
+        page = repository.get_recipe_details_page(
+            after[0] if after else None, params.limit
+        )
+        return page_response(request, page, params, RECIPE_FIELDS, response)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching recipes: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching recipes")
 
 
-@router.get("/{recipe_id}", response_model=Recipe)
-async def get_recipe(recipe_id: int):
+def _recipes_by_cost(
+    request: Request, params: PageParams, repository: RecipeRepository,
+    order: str, max_cost: Optional[float] = None,
+):
+    try:
+        page = repository.get_recipes_by_cost_page(
+            max_cost, order == "desc", params.after(float, int), params.limit
+        )
+        return page_response(request, page, params, RECIPE_COST_FIELDS)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching recipes by cost: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error fetching recipes by cost")
+
+
+@router.get(
+    "/cost/cheapest", response_model=List[RecipeCost],
+    dependencies=[Depends(requires_data("kroger"))],
+)
+async def get_cheapest_recipes(
+    request: Request,
+    order: Literal["asc", "desc"] = "asc",
+    params: PageParams = Depends(page_params),
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
+    """Recipes by what their linked Kroger products cost, a page at a time"""
+    return _recipes_by_cost(request, params, repository, order)
+
+
+@router.get(
+    "/cost/under/{amount}", response_model=List[RecipeCost],
+    dependencies=[Depends(requires_data("kroger"))],
+)
+async def get_recipes_under(
+    request: Request,
+    amount: float = Path(..., ge=0),
+    order: Literal["asc", "desc"] = "asc",
+    params: PageParams = Depends(page_params),
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
+    """Recipes costing at most amount, cheapest first"""
+    return _recipes_by_cost(request, params, repository, order, max_cost=amount)
+
+
+# Declared before /{recipe_id}, which would otherwise claim "batch"
+@router.get(
+    "/batch", response_model=List[RecipeWithIngredients],
+    dependencies=[Depends(requires_data("ingredients", "nutrition_facts"))],
+)
+async def get_recipes_batch(
+    request: Request,
+    response: Response,
+    ids: List[int] = Query(..., description="recipe ids, e.g. ?ids=1&ids=2"),
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
+    """Several recipes with their ingredients and nutrition in one request"""
+    if len(ids) > MAX_BATCH_RECIPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_RECIPES} recipe ids per request",
+        )
+    try:
+        not_modified = _not_modified(request, response, repository)
+        if not_modified:
+            return not_modified
+        return repository.get_recipes_with_ingredients(ids)
+    except Exception as e:
+        logger.error(f"Error fetching recipes {ids}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error fetching recipes")
+
+
+@router.get(
+    "/{recipe_id}", response_model=Recipe,
+    dependencies=[Depends(requires_data("recipes"))],
+)
+async def get_recipe(
+    recipe_id: int,
+    request: Request,
+    response: Response,
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
     """Get details for a specific recipe"""
     try:
-        pipeline = get_ingredient_pipeline()
-        recipe = pipeline.get_recipe_details(recipe_id)
+        not_modified = _not_modified(request, response, repository)
+        if not_modified:
+            return not_modified
+        recipe = repository.get_recipe_details(recipe_id)
         if not recipe:
             raise HTTPException(status_code=404, detail="Recipe not found")
         return recipe
@@ -89,79 +233,141 @@ async def get_recipe(recipe_id: int):
         raise HTTPException(status_code=500, detail="Error fetching recipe")
 
 
-@router.get("/recommended/{user_id}", response_model=List[Recipe])
-async def get_recipe_recommended(user_id: int):
+@router.get(
+    "/recommended/{user_id}", response_model=List[Recipe],
+    dependencies=[Depends(requires_data("ingredients"))],
+)
+async def get_recipe_recommended(
+    user_id: int, repository: RecipeRepository = Depends(get_recipe_repository)
+):
     """Get ingredients for a specific recipe"""
     try:
-        pipeline = get_ingredient_pipeline()
-        return pipeline.get_recipe_details_recommended(user_id)
+        return repository.get_recipe_details_recommended(user_id)
     except Exception as e:
         logger.error(f"Error fetching ingredients for recipe {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching ingredients")
 
 
-@router.get("/{recipe_id}/ingredients", response_model=List[Ingredient])
-async def get_recipe_ingredients(recipe_id: int):
+@router.get(
+    "/{recipe_id}/ingredients", response_model=List[Ingredient],
+    dependencies=[Depends(requires_data("ingredients", "nutrition_facts"))],
+)
+async def get_recipe_ingredients(
+    recipe_id: int,
+    request: Request,
+    response: Response,
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
     """Get ingredients for a specific recipe"""
     try:
-        pipeline = get_ingredient_pipeline()
-        ingredients = pipeline.get_recipe_ingredients(recipe_id)
+        not_modified = _not_modified(request, response, repository)
+        if not_modified:
+            return not_modified
+        ingredients = repository.get_recipe_ingredients(recipe_id)
         return [vars(ingredient) for ingredient in ingredients]
     except Exception as e:
         logger.error(f"Error fetching ingredients for recipe {recipe_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching ingredients")
 
 
-@router.get("/{recipe_id}/shopping-list", response_model=List[ShoppingListItem])
-async def get_shopping_list(recipe_id: int):
+@router.get(
+    "/{recipe_id}/shopping-list", response_model=List[ShoppingListItem],
+    dependencies=[Depends(requires_data("kroger"))],
+)
+async def get_shopping_list(
+    recipe_id: int, repository: RecipeRepository = Depends(get_recipe_repository)
+):
     """Get shopping list for a specific recipe"""
     try:
-        pipeline = get_ingredient_pipeline()
-        shopping_list = pipeline.get_shopping_list(recipe_id)
+        shopping_list = repository.get_shopping_list(recipe_id)
         return [vars(item) for item in shopping_list]
     except Exception as e:
         logger.error(f"Error generating shopping list for recipe {recipe_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Error generating shopping list")
 
 
-@router.get("/{user_id}/shopping-list-user", response_model=List[ShoppingListItem])
-async def get_shopping_list_user(user_id: int):
-    """Get shopping list for a specific recipe"""
+@router.get(
+    "/{user_id}/shopping-list-user", response_model=List[ShoppingListItem],
+    dependencies=[Depends(requires_data("kroger"))],
+)
+async def get_shopping_list_user(
+    user_id: int,
+    request: Request,
+    params: PageParams = Depends(page_params),
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
+    """Get a user's shopping list, a page at a time"""
     try:
-        pipeline = get_ingredient_pipeline()
-        shopping_list = pipeline.get_shopping_list_user(user_id)
-        return [vars(item) for item in shopping_list]
+        page = repository.get_shopping_list_user_page(
+            user_id, params.after(int, int), params.limit
+        )
+        page.items = [vars(item) for item in page.items]
+        return page_response(request, page, params, SHOPPING_LIST_FIELDS)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating shopping list for {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Error generating shopping list")
 
 
-@router.get("/cuisines/", response_model=List[Dict])
-async def get_recipes_by_cuisine():
+@router.get(
+    "/{user_id}/shopping-list-consolidated", response_model=ConsolidatedList,
+    dependencies=[Depends(requires_data("kroger"))],
+)
+async def get_shopping_list_consolidated(
+    user_id: int, repository: RecipeRepository = Depends(get_recipe_repository)
+):
+    """
+    A user's shopping list with one line per product: amounts summed across
+    recipes in common units, rounded up to whole packages, with their cost
+    """
+    try:
+        return repository.get_shopping_list_consolidated(user_id)
+    except Exception as e:
+        logger.error(f"Error consolidating shopping list for {user_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error generating shopping list")
+
+
+@router.get(
+    "/cuisines/", response_model=List[Dict],
+    dependencies=[Depends(requires_data("recipes"))],
+)
+async def get_recipes_by_cuisine(
+    request: Request,
+    response: Response,
+    repository: RecipeRepository = Depends(get_recipe_repository)
+):
     """Get recipes filtered by cuisine type"""
     try:
-        pipeline = get_ingredient_pipeline()
-        return pipeline.get_recipe_cuisines()
+        not_modified = _not_modified(request, response, repository)
+        if not_modified:
+            return not_modified
+        return repository.get_recipe_cuisines()
     except Exception as e:
         logger.error(f"Error fetching recipes for cuisines: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching recipes by cuisine")
 
 
-@router.post("/add_list")
-async def add_recipe_to_list(body: IdLookUps):
+@router.post(
+    "/add_list",
+    dependencies=[Depends(requires_data("kroger"))],
+)
+async def add_recipe_to_list(
+    body: IdLookUps, repository: RecipeRepository = Depends(get_recipe_repository)
+):
     try:
-        pipeline = get_ingredient_pipeline()
-        return pipeline.add_shopping_list(user_id=body.user_id, recipe_id=body.recipe_id)
+        return repository.add_shopping_list(user_id=body.user_id, recipe_id=body.recipe_id)
     except Exception as e:
         logger.error(f"Error adding to ShoppingList: {str(e)}")
         raise HTTPException(status_code=500, detail="Error adding to ShoppingList")
 
 
 @router.delete("/clear_list")
-async def clear_list(body: IdLookUps):
+async def clear_list(
+    body: IdLookUps, repository: RecipeRepository = Depends(get_recipe_repository)
+):
     try:
-        pipeline = get_ingredient_pipeline()
-        return pipeline.delete_shopping_list(body.user_id)
+        return repository.delete_shopping_list(body.user_id)
     except Exception as e:
         logger.error(f"Error adding to ShoppingList: {str(e)}")
         raise HTTPException(status_code=500, detail="Error deleting to ShoppingList")
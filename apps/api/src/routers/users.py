@@ -58,7 +58,8 @@ def op_user(email: str) -> str | dict:
 def add_user(user: User) -> str | dict:
     try:
         pipeline = UserPipeline()
-        return pipeline.get_monthly_signups()
+        pipeline.add_new_user(user)
+        return "ok"
     except Exception as e:
         logger.error(e)
         raise HTTPException(status_code=500, detail="Error could not add new user")
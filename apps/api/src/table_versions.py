@@ -0,0 +1,86 @@
+"""
+Change detection for the tables the in-process caches mirror (recipe
+catalog, name indexes, recommender, shopping lists).
+
+A table's version is (MAX(rowid), TableVersion.modified). New rows raise
+the first; triggers added by migrations bump the second on every UPDATE
+or DELETE, in the transaction that writes the row. Any process sees a
+committed change, whichever pooled connection it reads with, and bulk
+inserts pay nothing per row. (INSERT OR REPLACE deletes without firing
+the DELETE trigger, don't use it on a tracked table.)
+"""
+import time
+import sqlite3
+from typing import Optional, Tuple
+
+# How often a cache re-checks its tables for writes made by other processes
+CHECK_INTERVAL = 1.0
+
+UNCHANGED = "unchanged"
+# Only new rows: a cache can load the rows past the largest id it has
+INSERTED = "inserted"
+# Rows were updated or deleted: a cache has to reload
+MODIFIED = "modified"
+
+# (max rowid, modified) per table
+Versions = Tuple[Tuple[int, int], ...]
+
+
+def read_versions(conn: sqlite3.Connection, tables: Tuple[str, ...]) -> Versions:
+    versions = []
+    for table in tables:
+        row = conn.execute(
+            f"""
+            SELECT (SELECT MAX(rowid) FROM {table}),
+                (SELECT modified FROM TableVersion WHERE name = ?)
+            """,
+            (table,),
+        ).fetchone()
+        versions.append((row[0] or 0, row[1] or 0))
+    return tuple(versions)
+
+
+class ChangeWatcher:
+    """
+    Tells a cache what changed in its tables since the versions it last
+    accepted. Callers serialize check() and accept() with their own lock:
+
+        if watcher.due():
+            change, versions = watcher.check(conn)
+            if change != UNCHANGED:
+                ... reload ...
+            watcher.accept(versions)
+
+    Versions are read before the data they describe, so a write landing in
+    between is seen again by the next check rather than missed.
+    """
+
+    def __init__(self, *tables: str, interval: float = CHECK_INTERVAL):
+        self.tables = tables
+        self.interval = interval
+        self.versions: Optional[Versions] = None
+        self._checked_at = 0.0
+
+    def due(self) -> bool:
+        return (self.versions is None
+                or time.monotonic() - self._checked_at >= self.interval)
+
+    def check(self, conn: sqlite3.Connection) -> Tuple[str, Versions]:
+        versions = read_versions(conn, self.tables)
+        self._checked_at = time.monotonic()
+        if self.versions is None:
+            return MODIFIED, versions
+        if versions == self.versions:
+            return UNCHANGED, versions
+        if all(new[0] >= old[0] and new[1] == old[1]
+               for new, old in zip(versions, self.versions)):
+            return INSERTED, versions
+        return MODIFIED, versions
+
+    def accept(self, versions: Versions):
+        """Record the versions a cache now reflects"""
+        self.versions = versions
+
+    def reset(self):
+        """Treat the next check as a change, whatever the versions say"""
+        self.versions = None
@@ -0,0 +1,79 @@
+# src/test_bulk_load.py
+"""
+BulkLoader: a load into an empty table drops and rebuilds only its
+non-unique indexes, so "OR IGNORE" still sees the unique ones, and
+load_csv stores REAL and INTEGER columns as numbers and empty cells as
+NULL, skipping rows that do not convert.
+"""
+import csv
+from bulk_load import INTEGER, REAL, BulkLoader, Column
+
+
+def indexes(pool, table):
+    with pool.connection() as conn:
+        return {
+            row["name"]: row["sql"] for row in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index'"
+                " AND tbl_name = ? AND sql IS NOT NULL",
+                (table,),
+            )
+        }
+
+
+def test_unique_indexes_stay_while_loading(pool, monkeypatch):
+    before = indexes(pool, "Recipe")
+    assert {"idx_recipe_source_id", "idx_recipe_cuisine"} <= set(before)
+    dropped = []
+    drop_indexes = BulkLoader._drop_indexes
+
+    def record(conn, table):
+        statements = drop_indexes(conn, table)
+        dropped.extend(statements)
+        return statements
+
+    monkeypatch.setattr(BulkLoader, "_drop_indexes", staticmethod(record))
+    # source_id 1 twice: the second is ignored, not loaded beside the first
+    stats = BulkLoader(pool, batch_size=2).load_rows(
+        "Recipe", ["name", "source_id", "cuisine_type"],
+        [("Pancakes", 1, "American"), ("Ramen", 2, "Japanese"),
+         ("Pancakes again", 1, "American")],
+        on_conflict="OR IGNORE",
+    )
+    assert stats.rows == 3
+    assert before["idx_recipe_cuisine"] in dropped
+    assert before["idx_recipe_source_id"] not in dropped
+    assert indexes(pool, "Recipe") == before
+    with pool.connection() as conn:
+        rows = conn.execute("SELECT source_id, name FROM Recipe ORDER BY 1").fetchall()
+    assert [tuple(row) for row in rows] == [(1, "Pancakes"), (2, "Ramen")]
+
+
+def test_load_csv_converts_typed_columns(pool, tmp_path):
+    path = tmp_path / "ingredients.csv"
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        csv.writer(csvfile).writerows([
+            ["Name", "quantity", "unit", "recipe_id"],
+            ["flour", "2.5", "cups", "1"],
+            ["salt", "", "", "1.0"],
+            ["egg", "3", "", " "],
+            ["milk", "a cup", "cups", "2"],
+        ])
+    stats = BulkLoader(pool).load_csv(str(path), "Ingredient", [
+        Column("name", "Name"),
+        Column("quantity", convert=REAL),
+        Column("measurement_unit", "unit"),
+        Column("recipe_id", convert=INTEGER),
+    ])
+    assert (stats.rows, stats.skipped) == (3, 1)
+    assert stats.errors[0].startswith("line 5")
+    with pool.connection() as conn:
+        rows = conn.execute(
+            "SELECT name, quantity, typeof(quantity), measurement_unit,"
+            " recipe_id, typeof(recipe_id) FROM Ingredient ORDER BY ingredient_id"
+        ).fetchall()
+    # TEXT columns keep empty strings as read
+    assert [tuple(row) for row in rows] == [
+        ("flour", 2.5, "real", "cups", 1, "integer"),
+        ("salt", None, "null", "", 1, "integer"),
+        ("egg", 3.0, "real", "", None, "null"),
+    ]
@@ -0,0 +1,48 @@
+# src/test_fdc_snapshot.py
+"""
+load_snapshot replaces FdcFood and its search index in one transaction:
+a reload that fails part way keeps the previous snapshot searchable.
+"""
+import json
+import pytest
+from fdc_snapshot import load_snapshot
+from pipelines.nutrition_pipeline import NutritionPipeline
+
+
+def export(path, *foods):
+    path.write_text(json.dumps({"FoundationFoods": [
+        {
+            "fdcId": fdc_id,
+            "dataType": "Foundation",
+            "description": description,
+            "foodNutrients": [
+                {"nutrient": {"id": 1008}, "amount": calories},
+                {"nutrient": {"id": 1003}, "amount": 1.0},
+            ],
+        }
+        for fdc_id, description, calories in foods
+    ]}))
+    return str(path)
+
+
+def search(pool, name):
+    return NutritionPipeline(pool=pool).search_snapshot(name)
+
+
+def test_reload_replaces_foods_and_index(pool, tmp_path):
+    load_snapshot([export(tmp_path / "a.json", (1, "Milk, whole", 61))], pool)
+    assert search(pool, "whole milk").calories == 61
+    load_snapshot([export(tmp_path / "b.json", (2, "Butter, salted", 717))], pool)
+    assert search(pool, "butter").calories == 717
+    assert search(pool, "whole milk").name == "Not Found"
+
+
+def test_failed_reload_keeps_the_previous_snapshot(pool, tmp_path):
+    load_snapshot([export(tmp_path / "a.json", (1, "Milk, whole", 61))], pool)
+    with pytest.raises(FileNotFoundError):
+        load_snapshot([
+            export(tmp_path / "b.json", (2, "Butter, salted", 717)),
+            str(tmp_path / "missing.json"),
+        ], pool)
+    assert search(pool, "whole milk").calories == 61
+    assert search(pool, "butter").name == "Not Found"
@@ -0,0 +1,114 @@
+# src/test_foodcom_import.py
+"""
+Food.com import: list cells are split directly when they are plain quoted
+strings and go through ast.literal_eval otherwise, malformed rows are
+counted and skipped, and importing a file again updates recipes in place
+by source_id instead of duplicating them or their ingredients.
+"""
+import csv
+import ast
+import pytest
+import foodcom_import
+from foodcom_import import FoodComImporter, parse_list
+
+COLUMNS = ["name", "id", "minutes", "n_steps", "tags", "ingredients"]
+
+
+def write_csv(path, *rows):
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def literal_evals(monkeypatch):
+    """Every value parse_list hands to ast.literal_eval"""
+    seen = []
+    original = ast.literal_eval
+
+    def literal_eval(value):
+        seen.append(value)
+        return original(value)
+
+    monkeypatch.setattr(foodcom_import.ast, "literal_eval", literal_eval)
+    return seen
+
+
+def test_plain_string_lists_skip_literal_eval(literal_evals):
+    assert parse_list("['a', \"b c\"]") == ["a", "b c"]
+    assert parse_list("[]") == [] and parse_list("") == []
+    assert literal_evals == []
+
+
+def test_other_lists_fall_back_to_literal_eval(literal_evals):
+    assert parse_list(r"['it\'s', 'b']") == ["it's", "b"]
+    assert parse_list("[1, 'a']") == [1, "a"]
+    assert len(literal_evals) == 2
+    with pytest.raises(ValueError, match="expected a list"):
+        parse_list("{'a': 1}")
+    with pytest.raises(SyntaxError):
+        parse_list("['unclosed")
+    with pytest.raises(ValueError):
+        parse_list("__import__('os')")
+
+
+def recipes(pool):
+    with pool.connection() as conn:
+        return {
+            row["source_id"]: (row["name"], row["cuisine_type"], row["ingredients"])
+            for row in conn.execute(
+                """
+                SELECT r.source_id, r.name, r.cuisine_type,
+                    (SELECT group_concat(name, '|') FROM (
+                        SELECT name FROM Ingredient i
+                        WHERE i.recipe_id = r.recipe_id ORDER BY name
+                    )) AS ingredients
+                FROM Recipe r
+                """
+            )
+        }
+
+
+def test_malformed_rows_are_counted_and_skipped(pool, tmp_path):
+    path = write_csv(
+        tmp_path / "recipes.csv",
+        ["pancakes", "1", "20", "4", "['breakfast', 'easy']", "['egg', 'flour']"],
+        ["broken tags", "2", "5", "1", "['unclosed", "['egg']"],
+        ["no id", "x", "5", "1", "[]", "[]"],
+    )
+    stats = FoodComImporter(pool, batch_size=1).import_files([path])
+    assert (stats.recipes, stats.ingredients, stats.skipped) == (1, 2, 2)
+    assert "line 3" in stats.errors[0] and "line 4" in stats.errors[1]
+    assert list(recipes(pool)) == [1]
+
+
+def test_reimport_updates_in_place(pool, tmp_path):
+    first = write_csv(
+        tmp_path / "first.csv",
+        ["pancakes ", "1", "20", "4", "['breakfast']", "[' egg', 'flour', 'milk']"],
+        ["ramen", "2", "30", "8", "['japanese']", "['noodles']"],
+    )
+    second = write_csv(
+        tmp_path / "second.csv",
+        ["buttermilk pancakes", "1", "25", "5", "['breakfast', 'american']",
+         "['egg', 'flour', 'buttermilk']"],
+        ["ramen", "2", "30", "8", "['japanese']", "['noodles']"],
+    )
+    importer = FoodComImporter(pool, batch_size=1)
+    importer.import_files([first])
+    assert recipes(pool) == {
+        1: ("Pancakes", None, "egg|flour|milk"),
+        2: ("Ramen", "Japanese", "noodles"),
+    }
+    importer.import_files([second, second])
+    assert recipes(pool) == {
+        1: ("Buttermilk Pancakes", "American", "buttermilk|egg|flour"),
+        2: ("Ramen", "Japanese", "noodles"),
+    }
+    with pool.connection() as conn:
+        counts = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM Recipe), (SELECT COUNT(*) FROM Ingredient)"
+        ).fetchone()
+    assert tuple(counts) == (2, 4)
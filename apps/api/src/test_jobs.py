@@ -0,0 +1,115 @@
+# src/test_jobs.py
+"""
+JobRunner runs, cancels and reports jobs; requires_data answers 503 with
+Retry-After while the populate job has not finished a needed step.
+"""
+import time
+import threading
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from jobs import CANCELLED, FAILED, POPULATE_JOB, RUNNING, SUCCEEDED, JobRunner
+from routers import dependencies
+from routers.dependencies import requires_data
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner()
+    yield runner
+    runner.shutdown()
+
+
+def wait_finished(job, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while job.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not job.active, f"{job.name} still {job.status}"
+
+
+def test_job_reports_steps(runner):
+    def work(job):
+        job.step("one")
+        job.step("two")
+
+    job = runner.submit("work", work, total_steps=2)
+    wait_finished(job)
+    assert job.status == SUCCEEDED
+    assert job.completed_steps == ["one", "two"]
+
+
+def test_failure_is_recorded(runner):
+    def work(job):
+        raise RuntimeError("boom")
+
+    job = runner.submit("work", work)
+    wait_finished(job)
+    assert job.status == FAILED and job.error == "boom"
+
+
+def test_cancel_stops_at_the_next_checkpoint(runner):
+    started, release = threading.Event(), threading.Event()
+
+    def work(job):
+        job.step("one")
+        started.set()
+        release.wait(5)
+        job.step("two")  # checks for cancellation first
+
+    job = runner.submit("work", work)
+    assert started.wait(5)
+    assert job.status == RUNNING
+    with pytest.raises(ValueError):
+        runner.submit("work", work)  # one active job per name
+    runner.cancel(job.id)
+    release.set()
+    wait_finished(job)
+    assert job.status == CANCELLED
+    assert job.current_step == "one" and job.completed_steps == []
+
+
+def test_cancelled_before_start_never_runs(runner):
+    release = threading.Event()
+    ran = []
+    blocker = runner.submit("blocker", lambda job: release.wait(5))
+    queued = runner.submit("queued", lambda job: ran.append(job))
+    runner.cancel(queued.id)
+    release.set()
+    wait_finished(blocker)
+    wait_finished(queued)
+    assert queued.status == CANCELLED and not ran
+
+
+def test_requires_data_until_the_step_is_done(runner, monkeypatch):
+    monkeypatch.setattr(dependencies, "runner", runner)
+    app = FastAPI()
+
+    @app.get("/recipes", dependencies=[Depends(requires_data("recipes"))])
+    def recipes():
+        return []
+
+    loading, loaded, release, finish = (threading.Event() for _ in range(4))
+
+    def populate(job):
+        job.step("users")
+        job.step("recipes")
+        loading.set()
+        release.wait(5)
+        job.step("kroger")
+        loaded.set()
+        finish.wait(5)
+
+    client = TestClient(app)
+    job = runner.submit(POPULATE_JOB, populate)
+    assert loading.wait(5)
+    response = client.get("/recipes")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    release.set()
+    assert loaded.wait(5)
+    # Recipes are done even though the job is still running
+    assert job.active
+    assert client.get("/recipes").status_code == 200
+    finish.set()
+    wait_finished(job)
+    assert client.get("/recipes").status_code == 200
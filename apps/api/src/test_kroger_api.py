@@ -0,0 +1,258 @@
+# src/test_kroger_api.py
+"""
+AsyncKrogerAPI against a local stub of the Kroger API: searches are
+bounded to max_concurrency and reuse keep-alive connections, a 401 is
+answered with one token refresh, and search_many reports failures per
+item. IngredientPipeline keeps its connections from one search to the
+next.
+
+KrogerTokenManager against a counting token endpoint and a fake clock:
+one fetch however many threads ask, the token cached until it expires,
+refreshed by its timer before then, and replaced once after a 401.
+"""
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from pipelines import kroger_api_utils
+from pipelines.ingredient_pipeline import IngredientPipeline
+from pipelines.kroger_api_utils import AsyncKrogerAPI, KrogerAPIError, KrogerTokenManager
+from pipelines.rate_limiter import TokenBucketLimiter
+from pipelines.recipe_repository import IngredientPartial
+
+
+class StubKroger(ThreadingHTTPServer):
+    """The token and product search endpoints, counting what they are asked"""
+
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.tokens_issued = 0
+        self.rejected = set()  # tokens answered with a 401
+        self.searches = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()  # client ports seen
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.tokens_issued += 1
+            token = f"token-{self.server.tokens_issued}"
+        self.reply(200, {"access_token": token, "expires_in": 3600})
+
+    def do_GET(self):
+        stub = self.server
+        token = self.headers["Authorization"].removeprefix("Bearer ")
+        term = parse_qs(urlparse(self.path).query)["filter.term"][0]
+        with stub.lock:
+            stub.connections.add(self.client_address[1])
+            if token in stub.rejected:
+                return self.reply(401, {"error": "expired"})
+            stub.searches += 1
+            stub.in_flight += 1
+            stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+        time.sleep(stub.delay)
+        with stub.lock:
+            stub.in_flight -= 1
+        if term == "fail":
+            return self.reply(500, {"error": "boom"})
+        self.reply(200, {"data": [{
+            "productId": "7",
+            "description": term,
+            "items": [{"price": {"regular": 2.5}, "size": "1 gal"}],
+        }]})
+
+
+@pytest.fixture
+def stub():
+    stub = StubKroger(delay=0.05)
+    threading.Thread(target=stub.serve_forever, args=(0.05,), daemon=True).start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
+
+
+@pytest.fixture
+def limiter(pool):
+    return TokenBucketLimiter("test", rate=1000, burst=1000, max_wait=1, pool=pool)
+
+
+@pytest.fixture
+def tokens(stub):
+    tokens = KrogerTokenManager("id", "secret", base_url=stub.url)
+    yield tokens
+    tokens.close()
+
+
+def search_many(stub, limiter, tokens, names, max_concurrency=8, rounds=1):
+    async def run():
+        async with AsyncKrogerAPI("id", "secret", base_url=stub.url,
+                                  rate_limiter=limiter, token_manager=tokens,
+                                  max_concurrency=max_concurrency) as api:
+            return [await api.search_many(names, "01") for _ in range(rounds)]
+    return asyncio.run(run())
+
+
+def test_searches_are_bounded_and_reuse_connections(stub, limiter, tokens):
+    names = [f"item {n}" for n in range(12)]
+    first, second = search_many(stub, limiter, tokens, names, max_concurrency=3, rounds=2)
+    assert [products[0].name for products in first] == names
+    assert stub.max_in_flight == 3
+    # The second round reuses the first round's connections
+    assert stub.searches == 24 and len(stub.connections) == 3
+
+
+def test_sequential_searches_share_one_connection(stub, limiter, tokens):
+    search_many(stub, limiter, tokens, ["milk", "eggs", "bread"], max_concurrency=1)
+    assert len(stub.connections) == 1
+
+
+def test_rejected_token_is_refreshed_once(stub, limiter, tokens):
+    stub.rejected.add(tokens.get_token())
+    (results,) = search_many(stub, limiter, tokens, ["milk", "eggs", "bread", "flour"])
+    assert all(products[0].price == 2.5 for products in results)
+    # Every search saw the 401, one of them fetched the token the rest reused
+    assert stub.tokens_issued == 2 and tokens.token == "token-2"
+
+
+def test_search_many_reports_failures_per_item(stub, limiter, tokens):
+    (results,) = search_many(stub, limiter, tokens, ["milk", "fail", "eggs"])
+    assert results[0][0].name == "milk" and results[2][0].name == "eggs"
+    assert isinstance(results[1], KrogerAPIError)
+    assert results[1].status_code == 500
+
+
+def test_pipeline_keeps_its_connections_between_recipes(stub, limiter, tokens, pool,
+                                                        monkeypatch):
+    monkeypatch.setattr(kroger_api_utils, "get_rate_limiter", lambda name: limiter)
+    pipeline = IngredientPipeline("id", "secret", "01", pool=pool, token_manager=tokens)
+    pipeline.api.base_url = stub.url
+    try:
+        for name in ["milk", "eggs", "bread"]:
+            ingredient = IngredientPartial(name=name, quantity=1, measurement_unit="cup")
+            assert pipeline.find_kroger_products([ingredient])[0].name == name
+    finally:
+        pipeline.close()
+    assert stub.searches == 3 and len(stub.connections) == 1
+
+
+class Clock:
+    """Stands in for the time module, so tokens expire without sleeping"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class TokenEndpoint:
+    """Stands in for the manager's session: counts fetches, each a new token"""
+
+    def __init__(self, expires_in: int = 3600, delay: float = 0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.fetches = 0
+
+    def post(self, url, headers, data):
+        time.sleep(self.delay)
+        self.fetches += 1
+        token = {"access_token": f"token-{self.fetches}", "expires_in": self.expires_in}
+        return type("Response", (), {
+            "raise_for_status": lambda response: None,
+            "json": lambda response: token,
+        })()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(kroger_api_utils, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def endpoint():
+    return TokenEndpoint()
+
+
+@pytest.fixture
+def manager(clock, endpoint):
+    manager = KrogerTokenManager("id", "secret", refresh_margin=120)
+    manager.session = endpoint
+    yield manager
+    manager.close()
+
+
+def test_concurrent_callers_share_one_fetch(manager, endpoint):
+    endpoint.delay = 0.05
+    barrier = threading.Barrier(8)
+    tokens = []
+
+    def get():
+        barrier.wait()
+        tokens.append(manager.get_token())
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tokens == ["token-1"] * 8
+    assert endpoint.fetches == 1
+
+
+def test_token_is_cached_until_it_expires(manager, endpoint, clock):
+    assert manager.get_token() == "token-1"
+    # Treated as expired a minute early
+    clock.now += 3600 - 61
+    assert manager.get_token() == "token-1"
+    clock.now += 1
+    assert manager.token is None
+    assert manager.get_token() == "token-2"
+    assert endpoint.fetches == 2
+
+
+def test_timer_refreshes_before_expiry(manager, endpoint, clock):
+    manager.get_token()
+    timer = manager._timer
+    assert timer.daemon and timer.is_alive()
+    # Fires refresh_margin before the token is treated as expired
+    assert timer.interval == 3600 - 60 - 120
+    clock.now += timer.interval
+    assert manager.token == "token-1"
+    timer.function()
+    assert manager.token == "token-2" and endpoint.fetches == 2
+    # and schedules the next refresh in place of the one that fired
+    assert manager._timer is not timer and timer.finished.is_set()
+
+
+def test_invalidate_refetches_only_the_rejected_token(manager, endpoint):
+    rejected = manager.get_token()
+    assert manager.invalidate(rejected) == "token-2"
+    # A second caller holding the same stale token gets the new one, no fetch
+    assert manager.invalidate(rejected) == "token-2"
+    assert endpoint.fetches == 2
@@ -0,0 +1,97 @@
+# src/test_kroger_cache.py
+"""
+KrogerSearchCache: fresh within the TTL, served stale (with one background
+refresh per key) within the stale window, gone after it, and the least
+recently used entries evicted past max_entries.
+"""
+import time
+import threading
+import pytest
+from pipelines import kroger_cache
+from pipelines.kroger_api_utils import KrogerProduct
+from pipelines.kroger_cache import TOUCH_INTERVAL, KrogerSearchCache
+
+
+class Clock:
+    """Stands in for the time module, so entries age without sleeping"""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(kroger_cache, "time", clock)
+    return clock
+
+
+def product(product_id: int) -> KrogerProduct:
+    return KrogerProduct(product_id, f"milk {product_id}", "", 2.5, "Kroger",
+                         "Dairy", "1 gal")
+
+
+def test_fresh_then_stale_then_expired(pool, clock):
+    cache = KrogerSearchCache(pool, ttl=60, stale_ttl=600)
+    cache.put("Whole  Milk", "01", 3, [product(1)])
+
+    cached = cache.get("whole milk", "01", 3)
+    assert cached.fresh and cached.products == [product(1)]
+
+    clock.now += 61
+    cached = cache.get("whole milk", "01", 3)
+    assert not cached.fresh and cached.products == [product(1)]
+
+    clock.now += 600
+    assert cache.get("whole milk", "01", 3) is None
+
+
+def test_key_includes_location_and_limit(pool, clock):
+    cache = KrogerSearchCache(pool)
+    cache.put("milk", "01", 3, [product(1)])
+    assert cache.get("milk", "02", 3) is None
+    assert cache.get("milk", "01", 5) is None
+
+
+def test_refresh_in_background_runs_once_per_key(pool, clock):
+    cache = KrogerSearchCache(pool, ttl=60, stale_ttl=600)
+    cache.put("milk", "01", 3, [product(1)])
+    clock.now += 61
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return [product(2)]
+
+    cache.refresh_in_background("milk", "01", 3, fetch)
+    # A second stale read while the first refresh is in flight
+    cache.refresh_in_background("MILK", "01", 3, fetch)
+    release.set()
+    deadline = time.monotonic() + 5
+    while cache._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(calls) == 1
+    cached = cache.get("milk", "01", 3)
+    assert cached.fresh and cached.products == [product(2)]
+
+
+def test_least_recently_used_entries_are_evicted(pool, clock):
+    cache = KrogerSearchCache(pool, max_entries=2)
+    cache.put("milk", "01", 3, [product(1)])
+    clock.now += 1
+    cache.put("eggs", "01", 3, [product(2)])
+    # Reading milk past the touch interval makes eggs the oldest
+    clock.now += TOUCH_INTERVAL + 1
+    assert cache.get("milk", "01", 3) is not None
+    clock.now += 1
+    cache.put("bread", "01", 3, [product(3)])
+
+    assert cache.get("eggs", "01", 3) is None
+    assert cache.get("milk", "01", 3) is not None
+    assert cache.get("bread", "01", 3) is not None
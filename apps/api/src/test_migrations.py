@@ -0,0 +1,67 @@
+# src/test_migrations.py
+"""
+migrate() applies every pending step in one write transaction: a step
+that fails leaves the schema and PRAGMA user_version as they were.
+"""
+import sqlite3
+import pytest
+import migrations
+from migrations import migrate, schema_version, statements
+
+
+@pytest.fixture
+def pool(make_pool):
+    return make_pool(migrated=False)
+
+
+def tables(pool):
+    with pool.connection() as conn:
+        return {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )}
+
+
+def test_statements_keep_trigger_bodies_whole():
+    script = """
+        CREATE TABLE A (x TEXT DEFAULT ';');
+        -- a comment; with a semicolon
+        CREATE TRIGGER a_insert AFTER INSERT ON A BEGIN
+            UPDATE A SET x = 'a;b';
+            DELETE FROM A WHERE x IS NULL;
+        END;
+    """
+    found = statements(script)
+    assert len(found) == 2
+    assert found[0].startswith("CREATE TABLE A")
+    assert found[1].endswith("END;")
+
+
+def test_failing_migration_rolls_back(pool, monkeypatch):
+    latest = migrate(pool)
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [
+        (latest + 1, "adds a table", "CREATE TABLE Applied (x INTEGER);"),
+        (latest + 2, "fails halfway", """
+            CREATE TABLE Partial (x INTEGER);
+            INSERT INTO Missing VALUES (1);
+        """),
+    ])
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(pool)
+    with pool.connection() as conn:
+        assert schema_version(conn) == latest
+    assert not {"Applied", "Partial"} & tables(pool)
+
+
+def test_failing_callable_migration_rolls_back(pool, monkeypatch):
+    def step(conn):
+        conn.execute("CREATE TABLE Partial (x INTEGER)")
+        raise RuntimeError("step failed")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [
+        (len(migrations.MIGRATIONS) + 1, "fails", step),
+    ])
+    with pytest.raises(RuntimeError):
+        migrate(pool)
+    with pool.connection() as conn:
+        assert schema_version(conn) == 0
+    assert "Partial" not in tables(pool)
@@ -0,0 +1,53 @@
+# src/test_name_index.py
+"""
+Fuzzy name matching, and TableNameIndex following its table: new rows
+are added, renamed and deleted rows stop matching.
+"""
+import pytest
+from pipelines.name_index import FuzzyNameIndex, TableNameIndex, normalize
+
+
+@pytest.fixture
+def seed():
+    return """
+        INSERT INTO NutritionFact (nutrition_id, name) VALUES
+            (1, 'Large Egg'), (2, 'Whole Milk'), (3, 'All-Purpose Flour');
+    """
+
+
+@pytest.fixture
+def index(pool):
+    index = TableNameIndex(pool, "nutrition")
+    index._watcher.interval = 0  # Check on every lookup
+    return index
+
+
+def test_normalize_ignores_case_order_and_plurals():
+    assert normalize("Eggs, Large") == normalize("large egg")
+
+
+def test_fuzzy_matches_rank_by_similarity():
+    names = FuzzyNameIndex()
+    for key, name in enumerate(["whole milk", "skim milk", "buttermilk"]):
+        names.add(key, name)
+    assert names.best("milk, whole").key == 0
+    assert names.best("wholle milk").name == "whole milk"
+    assert names.best("chocolate") is None
+
+
+def test_new_rows_are_added(pool, index):
+    assert index.best("butter") is None
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO NutritionFact (nutrition_id, name) VALUES (4, 'Butter')")
+    assert index.best("butter").key == 4
+    assert index.best("eggs, large").key == 1
+
+
+def test_deleted_and_renamed_rows_stop_matching(pool, index):
+    assert index.best("whole milk").key == 2
+    with pool.writer() as conn:
+        conn.execute("DELETE FROM NutritionFact WHERE nutrition_id = 2")
+        conn.execute("UPDATE NutritionFact SET name = 'Bread Flour' WHERE nutrition_id = 3")
+    assert index.best("whole milk") is None
+    assert index.best("all purpose flour") is None
+    assert index.best("bread flour").key == 3
@@ -0,0 +1,96 @@
+# src/test_nutrition_pipeline.py
+"""
+NutritionPipeline.backfill with call_api stubbed out: every ingredient
+name without a NutritionFact is looked up once however many recipes use
+it, setting stop ends the run early, and the next run looks up only the
+names still missing, failed lookups among them.
+"""
+import threading
+import time
+import pytest
+import requests
+from pipelines.nutrition_pipeline import FactDetail, NutritionPipeline
+
+NAMES = [f"food {n}" for n in range(20)]
+
+
+@pytest.fixture
+def seed():
+    # Every name in two recipes, and one that already has its fact
+    values = ", ".join(
+        f"('{name}', {recipe})" for name in NAMES + ["salt"] for recipe in (1, 2)
+    )
+    return f"""
+        INSERT INTO Ingredient (name, recipe_id) VALUES {values};
+        INSERT INTO NutritionFact (name, guess, calories) VALUES ('salt', 'Salt', 0);
+    """
+
+
+class Lookups:
+    """Stands in for call_api, recording every name it is asked for"""
+
+    def __init__(self, fail=(), delay: float = 0.0):
+        self.fail = set(fail)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.names = []
+        self.on_call = None
+
+    def __call__(self, name: str) -> FactDetail:
+        with self.lock:
+            self.names.append(name)
+        if self.on_call is not None:
+            self.on_call()
+        time.sleep(self.delay)
+        if name in self.fail:
+            raise requests.ConnectionError("refused")
+        return FactDetail(name.title(), 100, 1, 2, 3)
+
+
+@pytest.fixture
+def pipeline(pool):
+    return NutritionPipeline(pool=pool)
+
+
+def facts(pool):
+    with pool.connection() as conn:
+        return {row["name"] for row in conn.execute("SELECT name FROM NutritionFact")}
+
+
+def test_each_pending_name_is_looked_up_once(pipeline, pool, monkeypatch):
+    lookups = Lookups()
+    monkeypatch.setattr(pipeline, "call_api", lookups)
+    stats = pipeline.backfill(max_workers=4)
+    assert sorted(lookups.names) == sorted(NAMES)
+    assert (stats.names, stats.fetched, stats.failed) == (20, 20, 0)
+    assert facts(pool) == set(NAMES) | {"salt"}
+    assert pipeline.pending_names() == []
+
+
+def test_stop_ends_the_run_and_the_next_picks_up_the_rest(pipeline, pool, monkeypatch):
+    stop = threading.Event()
+    first = Lookups(delay=0.01)
+    first.on_call = stop.set
+    monkeypatch.setattr(pipeline, "call_api", first)
+    stats = pipeline.backfill(max_workers=2, stop=stop)
+    # Only the lookups already running when stop was set
+    assert len(first.names) < len(NAMES)
+    saved = facts(pool) - {"salt"}
+    assert stats.fetched == len(saved)
+    second = Lookups()
+    monkeypatch.setattr(pipeline, "call_api", second)
+    stats = pipeline.backfill(max_workers=2)
+    assert sorted(second.names) == sorted(set(NAMES) - saved)
+    assert stats.fetched == len(NAMES) - len(saved)
+    assert pipeline.pending_names() == []
+
+
+def test_failed_lookups_are_retried_on_the_next_run(pipeline, pool, monkeypatch):
+    monkeypatch.setattr(pipeline, "call_api", Lookups(fail={"food 3", "food 7"}))
+    stats = pipeline.backfill(max_workers=4)
+    assert (stats.fetched, stats.failed) == (18, 2)
+    assert sorted(pipeline.pending_names()) == ["food 3", "food 7"]
+    retry = Lookups()
+    monkeypatch.setattr(pipeline, "call_api", retry)
+    assert pipeline.backfill(max_workers=4).fetched == 2
+    assert sorted(retry.names) == ["food 3", "food 7"]
@@ -0,0 +1,115 @@
+# src/test_pagination.py
+"""
+Keyset pagination through the routers: following X-Next-Cursor returns
+every row exactly once, across page boundaries and ties in the sort key,
+a request with neither limit nor cursor gets the whole list, and a cursor
+whose values are not the types of the sort key is a 400.
+"""
+from functools import partial
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor
+from pipelines.receipt_pipeline import ReceiptPipeline
+from pipelines.recipe_repository import RecipeRepository
+from routers import receipts, recipes
+
+RECIPES = 250
+RECEIPTS = 7
+
+
+@pytest.fixture
+def seed():
+    # Receipts share dates, so pages have to break ties on receipt_id
+    return f"""
+        WITH RECURSIVE n (i) AS (
+            SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {RECIPES}
+        )
+        INSERT INTO Recipe (recipe_id, name) SELECT i, 'recipe ' || i FROM n;
+        WITH RECURSIVE n (i) AS (
+            SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < {RECEIPTS - 1}
+        )
+        INSERT INTO ReceiptSummary (user_id, add_date, receipt_id, items, total)
+        SELECT 1, '2024-01-0' || (i / 3 + 1), 'r' || i, 1, 1.0 FROM n;
+    """
+
+
+@pytest.fixture
+def client(pool, monkeypatch):
+    app = FastAPI()
+    app.include_router(recipes.router)
+    app.include_router(receipts.router)
+    app.dependency_overrides[recipes.get_recipe_repository] = (
+        lambda: RecipeRepository(pool=pool)
+    )
+    monkeypatch.setattr(receipts, "ReceiptPipeline", partial(ReceiptPipeline, pool=pool))
+    return TestClient(app)
+
+
+def walk(client, url, **params):
+    """Every page of url, following X-Next-Cursor"""
+    pages = []
+    while True:
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        assert response.headers["Link"].endswith('rel="next"')
+        params = {**params, "cursor": cursor}
+
+
+def test_unpaged_request_gets_every_row(client):
+    response = client.get("/api/v1/recipes/")
+    assert len(response.json()) == RECIPES
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_cursor_walks_recipes_across_pages(client):
+    pages = walk(client, "/api/v1/recipes/", limit=100)
+    assert [len(page) for page in pages] == [100, 100, 50]
+    ids = [recipe["recipe_id"] for page in pages for recipe in page]
+    assert ids == list(range(1, RECIPES + 1))
+
+
+def test_cursor_alone_pages_with_the_default_size(client):
+    first = client.get("/api/v1/recipes/", params={"limit": 10})
+    second = client.get("/api/v1/recipes/",
+                        params={"cursor": first.headers["X-Next-Cursor"]})
+    assert second.json()[0]["recipe_id"] == 11
+    assert len(second.json()) == DEFAULT_PAGE_SIZE
+
+
+def test_cursor_walks_receipts_across_tied_dates(client):
+    url = "/api/v1/receipts/receipt_history"
+    pages = walk(client, url, user_id=1, limit=2, fields="receipt_id,add_date")
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    walked = [row for page in pages for row in page]
+    whole = client.get(url, params={"user_id": 1, "fields": "receipt_id,add_date"})
+    assert walked == whole.json()
+    assert len({row["receipt_id"] for row in walked}) == RECEIPTS
+    assert walked == sorted(walked, key=lambda row: (row["add_date"], row["receipt_id"]),
+                            reverse=True)
+
+
+def test_bad_cursor_and_fields_are_rejected(client):
+    assert client.get("/api/v1/recipes/", params={"cursor": "nope"}).status_code == 400
+    assert client.get("/api/v1/recipes/", params={"fields": "secret"}).status_code == 400
+
+
+@pytest.mark.parametrize("url, good, bad", [
+    ("/api/v1/recipes/", [1], [["x"], [{"a": 1}], [True], [1.5]]),
+    ("/api/v1/recipes/1/shopping-list-user", [1, 1], [[{"a": 1}, 1], [1, "x"]]),
+    ("/api/v1/recipes/cost/cheapest", [2.5, 1], [["x", 1], [2.5, None]]),
+    ("/api/v1/receipts/receipt_history", ["2024-01-01", "r1"],
+     [[{"a": 1}, 1], ["2024-01-01", 1], [None, "r1"]]),
+])
+def test_cursor_values_must_match_the_sort_key(client, url, good, bad):
+    params = {"user_id": 1}
+    assert client.get(url, params={**params, "cursor": encode_cursor(good)}
+                      ).status_code == 200
+    for key in bad:
+        response = client.get(url, params={**params, "cursor": encode_cursor(key)})
+        assert response.status_code == 400, key
+        assert response.json()["detail"] == "Invalid cursor"
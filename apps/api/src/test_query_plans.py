@@ -0,0 +1,406 @@
+# src/test_query_plans.py
+"""
+EXPLAIN QUERY PLAN checks for the per-request pipeline queries.
+
+Each entry mirrors a query in pipelines/ (keep them in sync when a query
+changes). A query fails if any step of its plan is a bare "SCAN <table>",
+i.e. a full table scan with no index.
+
+Deliberately not listed: SELECT * FROM Recipe (the whole catalog), the
+full Ingredient / GroceryReceipt reads that build the recommender and the
+SignupMonthly reads, which are a row per month.
+"""
+import re
+import pytest
+from database import ConnectionPool
+from migrations import _recipe_cost_of, migrate
+from pipelines.receipt_pipeline import export_query
+from rollups import ROLLUPS
+
+FULL_SCAN = re.compile(r"^SCAN \w+$")
+# A paged query that sorts its rows cannot stop at the page boundary
+SORTS = re.compile(r"USE TEMP B-TREE FOR ORDER BY")
+PAGED = [
+    "receipt.get_receipt_history_page",
+    "recipe.get_shopping_list_user_page",
+    "recipe.get_recipes_by_cost_page",
+]
+# Nor can a streamed export read a chunk without sorting everything below it
+STREAMED = [
+    "receipt.export_items",
+    "receipt.export_receipts",
+    "receipt.export_prices",
+]
+
+HOT_QUERIES = {
+    "receipt.get_receipt_history_page": (
+        """
+        SELECT receipt_id, add_date, items, total
+        FROM ReceiptSummary
+        WHERE user_id = ? AND (add_date, receipt_id) < (?, ?)
+        ORDER BY add_date DESC, receipt_id DESC
+        LIMIT 101
+        """,
+        [1, "2024-01-01", "abc"],
+    ),
+    "receipt.export_items": (
+        export_query("items", after=True),
+        [1, "2024-01-01", "abc", 1, 500],
+    ),
+    "receipt.export_receipts": (
+        export_query("receipts", after=True),
+        [1, "2024-01-01", "abc", 500],
+    ),
+    "receipt.export_prices": (
+        export_query("prices", after=True),
+        [1, "2024", "01", 500],
+    ),
+    "receipt.existing_keys": (
+        """
+        SELECT user_id, idempotency_key, receipt_id FROM ReceiptIdempotencyKey
+        WHERE (user_id, idempotency_key) IN (
+            SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+            FROM json_each(?)
+        )
+        """,
+        ['[[1, "scan-1"]]'],
+    ),
+    "receipt.new_purchases": (
+        """
+        SELECT rowid, user_id, name, add_date FROM GroceryReceipt
+        WHERE rowid > ?
+        """,
+        [0],
+    ),
+    "receipt.get_price_history": (
+        """
+        SELECT total, month, year, item_count
+        FROM MonthlySpend
+        WHERE user_id = ? AND year = ?
+        ORDER BY month
+        """,
+        [1, "2024"],
+    ),
+    "rollups.monthly_spend": (ROLLUPS["MonthlySpend"], [0]),
+    "rollups.receipt_summary": (ROLLUPS["ReceiptSummary"], [0]),
+    "receipt.get_receipt_for_user": (
+        """
+        SELECT name, price FROM GroceryReceipt
+        WHERE user_id == ? AND receipt_id == ?;
+        """,
+        [1, "abc"],
+    ),
+    "ingredient.save_kroger_product": (
+        "SELECT product_id, size FROM KrogerProduct WHERE name = ? AND brand = ?",
+        ["Large Egg", "Kroger"],
+    ),
+    "ingredient.link_ingredient_to_product.exists": (
+        """
+        SELECT item_id FROM GroceryItem
+        WHERE ingredient_id = ? AND kroger_product = ?
+        """,
+        [1, 1],
+    ),
+    "ingredient.link_ingredient_to_product.insert": (
+        """
+        INSERT INTO GroceryItem (name, nutrition_id, ingredient_id, kroger_product)
+        SELECT ?, nutrition_id, ?, ? FROM NutritionFact
+        WHERE nutrition_id = ?
+        """,
+        ["Salt", 1, 1, 1],
+    ),
+    "recipe.get_recipe_cuisines": (
+        """
+        SELECT cuisine_type, Count(*) as count
+        FROM Recipe GROUP BY cuisine_type;
+        """,
+        [],
+    ),
+    "recommender.user_purchases": (
+        """
+        SELECT rowid, name, add_date FROM GroceryReceipt
+        WHERE user_id = ?
+        """,
+        [1],
+    ),
+    "recommender.new_receipts": (
+        """
+        SELECT rowid, user_id, name, add_date FROM GroceryReceipt
+        WHERE rowid > ?
+        """,
+        [1],
+    ),
+    "recipe.get_recipe_details": (
+        """
+        SELECT recipe_id, name, category, cuisine_type, cooking_time, difficulty_level
+        FROM Recipe WHERE recipe_id = ?
+        """,
+        [1],
+    ),
+    "recipe_catalog.ingredients_many": (
+        """
+        SELECT i.ingredient_id, i.name, i.quantity, i.measurement_unit,
+            i.recipe_id, nf.calories, nf.protein, nf.fat, nf.carbs
+        FROM Ingredient i
+        JOIN GroceryItem g ON g.ingredient_id = i.ingredient_id
+        JOIN NutritionFact nf ON nf.nutrition_id = g.nutrition_id
+        WHERE i.recipe_id IN (SELECT value FROM json_each(?));
+        """,
+        ["[1, 2, 3]"],
+    ),
+    "recipe._get_ingredients_to_link": (
+        """
+        SELECT i.*, nf.calories, nf.fat, nf.protein, nf.carbs
+        FROM Ingredient i
+        LEFT JOIN NutritionFact nf ON nf.name = i.name
+        WHERE i.recipe_id = ?;
+        """,
+        [1],
+    ),
+    "recipe.get_shopping_list_user_page": (
+        """
+        SELECT li.grocery_id, li.rowid as list_rowid,
+            i.name as ingredient_name, i.quantity, i.measurement_unit,
+            kp.name as product_name, kp.brand, kp.price, kp.category
+        FROM ShoppingList li
+        JOIN GroceryItem gi ON li.grocery_id = gi.item_id
+        JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
+        JOIN KrogerProduct kp ON kp.product_id = gi.kroger_product
+        WHERE li.user_id = ? AND (li.grocery_id, li.rowid) > (?, ?)
+        ORDER BY li.grocery_id, li.rowid
+        LIMIT 101
+        """,
+        [1, 1, 1],
+    ),
+    "recipe.get_recipes_by_cost_page": (
+        """
+        SELECT recipe_id, total_cost, items FROM RecipeCost
+        WHERE total_cost <= ? AND (total_cost, recipe_id) > (?, ?)
+        ORDER BY total_cost ASC, recipe_id ASC
+        LIMIT 101
+        """,
+        [10.0, 2.5, 1],
+    ),
+    "recipe.get_recipe_cost": (
+        "SELECT total_cost FROM RecipeCost WHERE recipe_id = ?",
+        [1],
+    ),
+    # What the recipe_cost_* triggers run, with NEW.product_id bound as ?
+    "migrations.recipe_cost_price.delete": (
+        _recipe_cost_of("""
+            SELECT i.recipe_id FROM GroceryItem gi
+            JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
+            WHERE gi.kroger_product = ?
+        """)[0],
+        [1],
+    ),
+    "migrations.recipe_cost_price.insert": (
+        _recipe_cost_of("""
+            SELECT i.recipe_id FROM GroceryItem gi
+            JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
+            WHERE gi.kroger_product = ?
+        """)[1],
+        [1],
+    ),
+    "recipe.get_shopping_list": (
+        """
+        SELECT i.name as ingredient_name, i.quantity, i.measurement_unit,
+            kp.name as product_name, kp.brand, kp.price, kp.category
+        FROM Ingredient i
+        JOIN GroceryItem gi ON i.ingredient_id = gi.ingredient_id
+        JOIN KrogerProduct kp ON gi.kroger_product = kp.product_id
+        WHERE i.recipe_id = ?
+        """,
+        [1],
+    ),
+    "recipe.add_shopping_list": (
+        """
+        INSERT OR IGNORE INTO ShoppingList
+            (list_id, user_id, grocery_id, created_date)
+        SELECT ?, ?, gi.item_id, date('now') FROM GroceryItem gi
+        JOIN Ingredient i ON gi.ingredient_id = i.ingredient_id
+        WHERE i.recipe_id = ?;
+        """,
+        ["list", 1, 1],
+    ),
+    "shopping_list.fingerprint": (
+        """
+        SELECT COUNT(*), MAX(rowid), (
+            SELECT TOTAL(modified) FROM TableVersion
+            WHERE name IN (?, ?, ?, ?)
+        )
+        FROM ShoppingList WHERE user_id = ?
+        """,
+        ["ShoppingList", "GroceryItem", "Ingredient", "KrogerProduct", 1],
+    ),
+    "shopping_list.consolidate": (
+        """
+        SELECT kp.product_id, kp.name AS product_name, kp.brand, kp.category,
+            kp.price, kp.size, i.measurement_unit AS unit,
+            TOTAL(i.quantity) AS amount,
+            json_group_array(DISTINCT i.name) AS ingredients
+        FROM ShoppingList li
+        JOIN GroceryItem gi ON gi.item_id = li.grocery_id
+        JOIN Ingredient i ON i.ingredient_id = gi.ingredient_id
+        JOIN KrogerProduct kp ON kp.product_id = gi.kroger_product
+        WHERE li.user_id = ?
+        GROUP BY kp.product_id, i.measurement_unit
+        ORDER BY kp.product_id
+        """,
+        [1],
+    ),
+    "recipe.delete_shopping_list": (
+        "DELETE FROM ShoppingList WHERE user_id = ?",
+        [1],
+    ),
+    "user.verify_credentials": (
+        """
+        SELECT user_id, name, email, admin from User
+        WHERE email = ? AND password= ?;
+        """,
+        ["a@example.com", "hash"],
+    ),
+    "user.op_user": (
+        "UPDATE User SET admin = 1 WHERE email = ?;",
+        ["a@example.com"],
+    ),
+    "user.update_credentials": (
+        "UPDATE User SET name= ?, email= ?, password = ? WHERE user_id = ?;",
+        ["a", "a@example.com", "hash", 1],
+    ),
+    "kroger_cache.get": (
+        """
+        SELECT products, fetched_at, last_used FROM KrogerSearchCache
+        WHERE term = ? AND location_id = ? AND result_limit = ?
+        """,
+        ["salt", "01400943", 1],
+    ),
+    "kroger_cache.evict": (
+        """
+        DELETE FROM KrogerSearchCache WHERE rowid IN (
+            SELECT rowid FROM KrogerSearchCache
+            ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+        """,
+        [10000],
+    ),
+    "table_versions.read_versions": (
+        """
+        SELECT (SELECT MAX(rowid) FROM Ingredient),
+            (SELECT modified FROM TableVersion WHERE name = ?)
+        """,
+        ["Ingredient"],
+    ),
+    "recipe_catalog.new_recipes": (
+        """
+        SELECT recipe_id, name, category, cuisine_type, cooking_time,
+            difficulty_level
+        FROM Recipe WHERE recipe_id > ? ORDER BY recipe_id
+        """,
+        [1],
+    ),
+    "recipe_catalog.stale_ingredients": (
+        """
+        SELECT recipe_id FROM Ingredient WHERE ingredient_id > ?
+        UNION
+        SELECT i.recipe_id FROM GroceryItem g
+        JOIN Ingredient i ON i.ingredient_id = g.ingredient_id
+        WHERE g.item_id > ?
+        """,
+        [1, 1],
+    ),
+    "foodcom_import.recipe_ids": (
+        """
+        SELECT source_id, recipe_id FROM Recipe
+        WHERE source_id IN (SELECT value FROM json_each(?))
+        """,
+        ["[137739]"],
+    ),
+    "foodcom_import.prune_ingredients": (
+        """
+        DELETE FROM Ingredient
+        WHERE recipe_id = ?
+        AND name NOT IN (SELECT value FROM json_each(?))
+        AND NOT EXISTS (
+            SELECT 1 FROM GroceryItem gi
+            WHERE gi.ingredient_id = Ingredient.ingredient_id
+        )
+        """,
+        [1, '["salt"]'],
+    ),
+    "foodcom_import.insert_ingredient": (
+        """
+        INSERT INTO Ingredient (name, recipe_id)
+        SELECT ?, ?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM Ingredient WHERE recipe_id = ? AND name = ?
+        )
+        """,
+        ["salt", 1, 1, "salt"],
+    ),
+    "nutrition.find_info": (
+        "SELECT * FROM NutritionFact WHERE name = ?",
+        ["Salt"],
+    ),
+    "nutrition.find_info_by_id": (
+        "SELECT * FROM NutritionFact WHERE nutrition_id = ?",
+        [1],
+    ),
+    "name_index.nutrition_rows": (
+        "SELECT nutrition_id, name FROM NutritionFact WHERE nutrition_id > ?",
+        [0],
+    ),
+    "name_index.ingredient_rows": (
+        "SELECT DISTINCT name, name FROM Ingredient WHERE ingredient_id > ?",
+        [0],
+    ),
+    "nutrition.search_snapshot": (
+        """
+        SELECT f.description, f.calories, f.protein, f.fat, f.carbs
+        FROM FdcFoodSearch s JOIN FdcFood f ON f.fdc_id = s.rowid
+        WHERE FdcFoodSearch MATCH ?
+        ORDER BY f.data_type != 'Foundation', bm25(FdcFoodSearch),
+                 length(f.description)
+        LIMIT 1
+        """,
+        ['"large" "egg"'],
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    pool = ConnectionPool(db_path=str(tmp_path_factory.mktemp("db") / "plans.db"))
+    migrate(pool)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_query_uses_index(pool, name):
+    sql, params = HOT_QUERIES[name]
+    with pool.connection() as conn:
+        plan = [
+            row["detail"]
+            for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        ]
+    scans = [step for step in plan if FULL_SCAN.match(step)]
+    assert not scans, f"{name} falls back to a full scan: {plan}"
+
+
+@pytest.mark.parametrize("name", PAGED + STREAMED)
+def test_paged_query_reads_in_index_order(pool, name):
+    sql, params = HOT_QUERIES[name]
+    with pool.connection() as conn:
+        plan = [
+            row["detail"]
+            for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        ]
+    assert not any(SORTS.search(step) for step in plan), (
+        f"{name} sorts instead of following an index: {plan}"
+    )
+
+
+def test_migrate_is_idempotent(pool):
+    version = migrate(pool)
+    assert migrate(pool) == version
@@ -0,0 +1,62 @@
+# src/test_rate_limiter.py
+"""
+TokenBucketLimiter: bursts are admitted at once, later calls queue for a
+refill within max_wait, the daily quota is shared by every limiter on the
+same bucket and resets with the UTC day.
+"""
+import time
+import asyncio
+import pytest
+from pipelines.rate_limiter import RateLimitExceeded, TokenBucketLimiter
+
+
+def test_burst_then_queue_for_refill(pool):
+    limiter = TokenBucketLimiter("test", rate=5, burst=2, max_wait=1, pool=pool)
+    limiter.acquire()
+    limiter.acquire()
+    # The bucket is empty: the third call waits about 1 / rate for a token
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.1
+
+
+def test_async_callers_queue(pool):
+    limiter = TokenBucketLimiter("test", rate=20, burst=1, max_wait=1, pool=pool)
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire_async() for _ in range(3)))
+        return time.monotonic() - started
+
+    # One token up front, then two refills at 20 per second
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_wait_past_max_wait_raises(pool):
+    limiter = TokenBucketLimiter("test", rate=1, burst=1, max_wait=0.1, pool=pool)
+    limiter.acquire()
+    with pytest.raises(RateLimitExceeded) as raised:
+        limiter.acquire()
+    assert 0.9 < raised.value.retry_after <= 1
+
+
+def test_daily_quota_is_shared_by_workers(pool):
+    # Two limiters on one bucket stand in for two worker processes
+    first = TokenBucketLimiter("test", burst=10, daily_quota=3, pool=pool)
+    second = TokenBucketLimiter("test", burst=10, daily_quota=3, pool=pool)
+    first.acquire()
+    second.acquire()
+    assert first.remaining_today() == 1
+    second.acquire()
+    with pytest.raises(RateLimitExceeded, match="Daily quota"):
+        first.acquire()
+    assert second.remaining_today() == 0
+
+
+def test_daily_quota_resets_with_the_day(pool):
+    limiter = TokenBucketLimiter("test", burst=10, daily_quota=1, pool=pool)
+    limiter.acquire()
+    with pool.writer() as conn:
+        conn.execute("UPDATE RateLimitBucket SET day = '2000-01-01'")
+    assert limiter.remaining_today() == 1
+    limiter.acquire()
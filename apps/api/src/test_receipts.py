@@ -0,0 +1,107 @@
+# src/test_receipts.py
+"""
+Bulk receipt uploads and exports. A retried upload replays its receipts
+by idempotency key instead of writing them twice, a bad NDJSON line is
+reported by number. Exports read in keyset chunks: every row comes back
+once, newest first, and the pooled connection is free between chunks.
+"""
+import json
+from functools import partial
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pipelines.receipt_pipeline import ReceiptPipeline
+from routers import receipts
+
+LINES = 11
+
+
+@pytest.fixture
+def pool(make_pool):
+    # Lines share dates and receipt ids, so chunks have to break ties on rowid
+    return make_pool(size=1, timeout=1, seed=f"""
+        WITH RECURSIVE line (n) AS (
+            SELECT 0 UNION ALL SELECT n + 1 FROM line WHERE n < {LINES - 1}
+        )
+        INSERT INTO GroceryReceipt (receipt_id, name, price, add_date, user_id)
+        SELECT 'r' || (n / 2), 'item ' || n, 1.0, '2024-01-0' || (n / 4 + 1), 1
+        FROM line;
+    """)
+
+
+def test_export_walks_every_row_across_chunks(pool):
+    batches = list(ReceiptPipeline(pool=pool).export_history(1, "items", batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 3, 3, 2]
+    rows = [row for batch in batches for row in batch]
+    assert sorted(row[2] for row in rows) == sorted(f"item {n}" for n in range(LINES))
+    assert rows == sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)
+
+
+def test_export_returns_the_connection_between_chunks(pool):
+    batches = ReceiptPipeline(pool=pool).export_history(1, "items", batch_size=4)
+    next(batches)
+    # A pool of one would time out here if the export still held its connection
+    with pool.connection() as conn:
+        conn.execute("SELECT 1")
+    assert sum(len(batch) for batch in batches) == LINES - 4
+
+
+@pytest.fixture
+def client(pool, monkeypatch):
+    app = FastAPI()
+    app.include_router(receipts.router)
+    monkeypatch.setattr(receipts, "ReceiptPipeline", partial(ReceiptPipeline, pool=pool))
+    return TestClient(app)
+
+
+def receipt(key, *names, user_id=2):
+    return {
+        "user_id": user_id,
+        "date": "2024-02-01",
+        "idempotency_key": key,
+        "ingredients": [{"name": name, "price": 2.5} for name in names],
+    }
+
+
+def lines_of(pool, user_id=2):
+    with pool.connection() as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM GroceryReceipt WHERE user_id = ?", (user_id,)
+        ).fetchone()[0]
+
+
+def test_retried_upload_replays_receipts_by_key(client, pool):
+    url = "/api/v1/receipts/bulk"
+    first = client.post(url, json=[receipt("a", "milk", "eggs")]).json()
+    assert first[0]["created"] is True
+    # The retry carries one receipt already written and one new one
+    retry = client.post(url, json=[receipt("a", "milk", "eggs"), receipt("b", "bread")])
+    assert retry.status_code == 200
+    replayed, added = retry.json()
+    assert replayed == {**first[0], "created": False}
+    assert added["created"] is True and added["receipt_id"] != replayed["receipt_id"]
+    assert lines_of(pool) == 3
+
+
+def test_same_key_twice_in_one_upload_is_written_once(client, pool):
+    results = client.post("/api/v1/receipts/bulk",
+                          json=[receipt("a", "milk"), receipt("a", "milk")]).json()
+    assert [result["created"] for result in results] == [True, False]
+    assert results[0]["receipt_id"] == results[1]["receipt_id"]
+    assert lines_of(pool) == 1
+
+
+def test_bad_ndjson_line_is_reported_by_number(client, pool):
+    body = "\n".join([
+        json.dumps(receipt("a", "milk")),
+        "",
+        json.dumps({"user_id": 2, "ingredients": [{"name": "eggs"}]}),
+    ])
+    response = client.post("/api/v1/receipts/bulk", content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail["line"] == 3
+    assert detail["errors"][0]["loc"] == ["ingredients", 0, "price"]
+    # Nothing from the request is written
+    assert lines_of(pool) == 0
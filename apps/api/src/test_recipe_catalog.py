@@ -0,0 +1,101 @@
+# src/test_recipe_catalog.py
+"""
+RecipeCatalog picks up writes made by another process (a second pool on
+the same file here): inserts incrementally, updates and deletes with a
+reload, and ingredient lists read across a change are not cached. Added
+recipes are swapped in as new copies, never changed under a reader.
+"""
+import pytest
+from pipelines.recipe_catalog import RecipeCatalog, RecipeEntry
+
+
+@pytest.fixture
+def seed():
+    return """
+        INSERT INTO Recipe (recipe_id, name, cuisine_type) VALUES
+            (1, 'Pancakes', 'American'), (2, 'Ramen', 'Japanese');
+        INSERT INTO NutritionFact (nutrition_id, name, calories, fat, carbs, protein)
+            VALUES (1, 'egg', 70, 5, 0, 6), (2, 'flour', 100, 0, 22, 3);
+        INSERT INTO Ingredient (ingredient_id, name, quantity, measurement_unit,
+            recipe_id) VALUES (1, 'egg', 2, 'each', 1);
+        INSERT INTO GroceryItem (item_id, name, nutrition_id, ingredient_id)
+            VALUES (1, 'egg', 1, 1);
+    """
+
+
+@pytest.fixture
+def pools(pool, make_pool):
+    return pool, make_pool(migrated=False)
+
+
+@pytest.fixture
+def catalog(pools):
+    catalog = RecipeCatalog(pools[0])
+    catalog._watcher.interval = 0  # Check on every read
+    return catalog
+
+
+def test_insert_is_loaded_incrementally(pools, catalog):
+    _, other = pools
+    etag = catalog.current_etag()
+    assert len(catalog.recipes()) == 2
+    with other.writer() as conn:
+        conn.execute("INSERT INTO Recipe (recipe_id, name, cuisine_type)"
+                     " VALUES (3, 'Udon', 'Japanese')")
+    assert [recipe.recipe_id for recipe in catalog.recipes_after(2)] == [3]
+    assert {"cuisine_type": "Japanese", "count": 2} in catalog.cuisines()
+    assert catalog.current_etag() != etag
+
+
+def test_update_and_delete_are_seen(pools, catalog):
+    _, other = pools
+    assert catalog.recipe(1).name == "Pancakes"
+    with other.writer() as conn:
+        conn.execute("UPDATE Recipe SET name = 'Waffles' WHERE recipe_id = 1")
+    assert catalog.recipe(1).name == "Waffles"
+    with other.writer() as conn:
+        conn.execute("DELETE FROM Recipe WHERE recipe_id = 2")
+    assert catalog.recipe(2) is None
+    assert len(catalog.recipes()) == 1
+
+
+def test_ingredient_lists_follow_links_and_nutrition(pools, catalog):
+    _, other = pools
+    assert [i.calories for i in catalog.ingredients(1)] == [70]
+    with other.writer() as conn:
+        conn.execute("UPDATE NutritionFact SET calories = 80 WHERE nutrition_id = 1")
+    assert [i.calories for i in catalog.ingredients(1)] == [80]
+    with other.writer() as conn:
+        conn.execute("INSERT INTO Ingredient (ingredient_id, name, quantity,"
+                     " measurement_unit, recipe_id) VALUES (2, 'flour', 1, 'cup', 1)")
+        conn.execute("INSERT INTO GroceryItem (item_id, name, nutrition_id,"
+                     " ingredient_id) VALUES (2, 'flour', 2, 2)")
+    assert sorted(i.name for i in catalog.ingredients(1)) == ["egg", "flour"]
+
+
+def test_list_read_across_an_invalidation_is_not_cached(catalog, monkeypatch):
+    catalog.current_etag()
+    catalog._watcher.interval = 3600  # Only the list query uses the pool
+    query = catalog.pool.connection
+
+    def connection():
+        # The recipe's ingredients change while its list is being read
+        catalog.invalidate_ingredients(1)
+        return query()
+
+    monkeypatch.setattr(catalog.pool, "connection", connection)
+    assert [i.name for i in catalog.ingredients(1)] == ["egg"]
+    assert 1 not in catalog._ingredients
+
+
+def test_added_recipe_replaces_the_copy_readers_hold(catalog):
+    catalog._watcher.interval = 3600
+    before = catalog.recipes_after(None)
+    recipes, ids = catalog._recipes
+    catalog.add_recipe(RecipeEntry(5, "Soba", None, "Japanese", 10, "easy"))
+    # A page being read keeps the copy it started with
+    assert list(recipes) == ids == [1, 2]
+    assert [recipe.recipe_id for recipe in catalog.recipes_after(None)] == [1, 2, 5]
+    assert len(before) == 2
+    catalog.invalidate()
+    assert [recipe.recipe_id for recipe in catalog.recipes_after(1)] == [2]
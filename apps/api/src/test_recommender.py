@@ -0,0 +1,73 @@
+# src/test_recommender.py
+"""
+Recommender rankings follow receipts written by another process (a second
+pool on the same file here) and ingredient changes, without a restart.
+"""
+import pytest
+from pipelines.recommender import Recommender
+
+RECIPES = {
+    1: ["egg", "flour", "milk"],
+    2: ["salmon", "rice", "lemon"],
+    3: ["rice", "soy sauce", "scallion"],
+}
+
+
+@pytest.fixture
+def seed():
+    recipes = ", ".join(f"({recipe_id}, 'recipe {recipe_id}')" for recipe_id in RECIPES)
+    ingredients = ", ".join(
+        f"('{name}', 1, {recipe_id})"
+        for recipe_id, names in RECIPES.items() for name in names
+    )
+    return f"""
+        INSERT INTO Recipe (recipe_id, name) VALUES {recipes};
+        INSERT INTO Ingredient (name, quantity, recipe_id) VALUES {ingredients};
+    """
+
+
+@pytest.fixture
+def pools(pool, make_pool):
+    return pool, make_pool(migrated=False)
+
+
+@pytest.fixture
+def recommender(pools):
+    recommender = Recommender(pools[0])
+    recommender._watcher.interval = 0
+    recommender.names._watcher.interval = 0
+    return recommender
+
+
+def buy(pool, user_id, *lines):
+    with pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO GroceryReceipt (receipt_id, name, price, add_date, user_id)"
+            " VALUES ('r', ?, 1.0, ?, ?)",
+            [(name, day, user_id) for name, day in lines],
+        )
+
+
+def test_ranks_by_purchases(pools, recommender):
+    buy(pools[0], 1, ("Eggs", "2024-01-01"), ("whole milk", "2024-01-02"))
+    assert recommender.recommend(1, limit=1) == [1]
+
+
+def test_receipts_from_another_process_are_folded_in(pools, recommender):
+    pool, other = pools
+    buy(pool, 1, ("Eggs", "2024-01-01"))
+    assert recommender.recommend(1, limit=1) == [1]
+    # Newer purchases weigh more: salmon and lemon now outrank the egg
+    buy(other, 1, ("salmon", "2024-06-01"), ("lemons", "2024-06-01"))
+    assert recommender.recommend(1, limit=1) == [2]
+    # Users without a history get what everyone buys
+    assert recommender.recommend(2, limit=1) == [2]
+
+
+def test_matrix_follows_ingredient_changes(pools, recommender):
+    pool, other = pools
+    buy(pool, 1, ("scallions", "2024-01-01"))
+    assert recommender.recommend(1, limit=1) == [3]
+    with other.writer() as conn:
+        conn.execute("UPDATE Ingredient SET recipe_id = 2 WHERE name = 'scallion'")
+    assert recommender.recommend(1, limit=1) == [2]
@@ -0,0 +1,156 @@
+# src/test_rollups.py
+"""
+The GroceryReceipt rollups, MonthlySpend and ReceiptSummary, agree with
+the lines they summarize: after receipts are added through
+ReceiptPipeline, and after rebuild(). SignupMonthly follows User through
+its triggers as users are added, removed and their reg_date moves, and
+RecipeCost follows product prices and ingredient links.
+"""
+import rollups
+from pipelines.receipt_pipeline import ReceiptDetail, ReceiptItemDetail, ReceiptPipeline
+
+MONTHLY_SPEND = """
+    SELECT user_id, strftime('%Y', add_date), strftime('%m', add_date),
+        ROUND(SUM(price), 2), COUNT(*)
+    FROM GroceryReceipt GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+"""
+MONTHLY_SPEND_ROLLUP = """
+    SELECT user_id, year, month, ROUND(total, 2), item_count
+    FROM MonthlySpend ORDER BY 1, 2, 3
+"""
+RECEIPT_SUMMARY = """
+    SELECT user_id, add_date, receipt_id, COUNT(*), ROUND(SUM(price), 2)
+    FROM GroceryReceipt GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+"""
+RECEIPT_SUMMARY_ROLLUP = """
+    SELECT user_id, add_date, receipt_id, items, ROUND(total, 2)
+    FROM ReceiptSummary ORDER BY 1, 2, 3
+"""
+SIGNUPS = """
+    SELECT strftime('%Y', reg_date) AS year, strftime('%m', reg_date) AS month, COUNT(*)
+    FROM User WHERE year IS NOT NULL GROUP BY 1, 2 ORDER BY 1, 2
+"""
+SIGNUPS_ROLLUP = "SELECT year, month, signups FROM SignupMonthly ORDER BY 1, 2"
+RECIPE_COST = """
+    SELECT i.recipe_id, ROUND(TOTAL(kp.price), 2), COUNT(*)
+    FROM Ingredient i
+    JOIN GroceryItem gi ON gi.ingredient_id = i.ingredient_id
+    JOIN KrogerProduct kp ON kp.product_id = gi.kroger_product
+    GROUP BY 1 ORDER BY 1
+"""
+RECIPE_COST_ROLLUP = """
+    SELECT recipe_id, ROUND(total_cost, 2), items FROM RecipeCost ORDER BY 1
+"""
+
+
+def add(pool, user_id, date, *prices):
+    ReceiptPipeline(pool=pool).add_receipts([ReceiptDetail(
+        [ReceiptItemDetail(f"item {n}", price) for n, price in enumerate(prices)],
+        user_id, date,
+    )])
+
+
+def query(pool, sql):
+    with pool.connection() as conn:
+        return [tuple(row) for row in conn.execute(sql)]
+
+
+def fill(pool):
+    # Receipts in the same month, across a year end, and for two users
+    add(pool, 1, "2023-12-31", 4.25, 1.5)
+    add(pool, 1, "2024-01-02", 3.0)
+    add(pool, 1, "2024-01-20", 2.0, 2.0, 0.99)
+    add(pool, 2, "2024-01-02", 10.0)
+
+
+def test_monthly_spend_matches_its_lines(pool):
+    fill(pool)
+    expected = query(pool, MONTHLY_SPEND)
+    assert len(expected) == 3
+    assert query(pool, MONTHLY_SPEND_ROLLUP) == expected
+
+
+def test_rebuild_catches_up_with_lines_written_directly(pool):
+    fill(pool)
+    with pool.writer() as conn:
+        conn.execute(
+            "INSERT INTO GroceryReceipt (receipt_id, name, price, add_date, user_id)"
+            " VALUES ('loaded', 'milk', 3.5, '2024-02-01', 1)"
+        )
+    assert query(pool, MONTHLY_SPEND_ROLLUP) != query(pool, MONTHLY_SPEND)
+    with pool.writer() as conn:
+        assert rollups.rebuild(conn, ["MonthlySpend"]) == {"MonthlySpend": 4}
+    assert query(pool, MONTHLY_SPEND_ROLLUP) == query(pool, MONTHLY_SPEND)
+
+
+def test_receipt_summary_matches_its_lines(pool):
+    fill(pool)
+    expected = query(pool, RECEIPT_SUMMARY)
+    assert len(expected) == 4
+    assert query(pool, RECEIPT_SUMMARY_ROLLUP) == expected
+    with pool.writer() as conn:
+        conn.execute(
+            "INSERT INTO GroceryReceipt (receipt_id, name, price, add_date, user_id)"
+            " VALUES ('loaded', 'milk', 3.5, '2024-02-01', 1)"
+        )
+        assert rollups.rebuild(conn, ["ReceiptSummary"]) == {"ReceiptSummary": 5}
+    assert query(pool, RECEIPT_SUMMARY_ROLLUP) == query(pool, RECEIPT_SUMMARY)
+
+
+def test_signup_monthly_follows_users(pool):
+    with pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO User (name, email, password, reg_date, admin)"
+            " VALUES (?, ?, 'x', ?, 0)",
+            [(f"user {n}", f"{n}@example.com", date) for n, date in enumerate(
+                ["2024-01-05", "2024-01-20", "2024-02-01", "2024-03-01", None]
+            )],
+        )
+    assert query(pool, SIGNUPS_ROLLUP) == query(pool, SIGNUPS)
+    with pool.writer() as conn:
+        # Empties March, moves a January signup to February and one into April
+        conn.execute("DELETE FROM User WHERE reg_date = '2024-03-01'")
+        conn.execute(
+            "UPDATE User SET reg_date = '2024-02-14' WHERE reg_date = '2024-01-20'"
+        )
+        conn.execute("UPDATE User SET reg_date = '2024-04-01' WHERE reg_date IS NULL")
+        conn.execute("UPDATE User SET name = 'renamed' WHERE reg_date = '2024-01-05'")
+    expected = query(pool, SIGNUPS)
+    assert expected == [("2024", "01", 1), ("2024", "02", 2), ("2024", "04", 1)]
+    assert query(pool, SIGNUPS_ROLLUP) == expected
+
+
+def test_recipe_cost_follows_prices_and_links(pool):
+    with pool.writer() as conn:
+        conn.executemany("INSERT INTO Recipe (recipe_id, name) VALUES (?, ?)",
+                         [(1, "pancakes"), (2, "omelette")])
+        conn.executemany(
+            "INSERT INTO Ingredient (ingredient_id, name, quantity, recipe_id)"
+            " VALUES (?, ?, 1, ?)",
+            [(1, "flour", 1), (2, "egg", 1), (3, "egg", 2), (4, "cheese", 2)],
+        )
+        conn.executemany(
+            "INSERT INTO KrogerProduct (product_id, name, price) VALUES (?, ?, ?)",
+            [(1, "flour", 2.0), (2, "eggs", 3.5), (3, "cheddar", 4.0)],
+        )
+        conn.executemany(
+            "INSERT INTO GroceryItem (item_id, name, ingredient_id, kroger_product)"
+            " VALUES (?, ?, ?, ?)",
+            [(1, "flour", 1, 1), (2, "eggs", 2, 2), (3, "eggs", 3, 2)],
+        )
+    assert query(pool, RECIPE_COST_ROLLUP) == [(1, 5.5, 2), (2, 3.5, 1)]
+    with pool.writer() as conn:
+        # Eggs get dearer for both recipes, the omelette gains its cheese and
+        # the pancakes lose their flour
+        conn.execute("UPDATE KrogerProduct SET price = 4.25 WHERE product_id = 2")
+        conn.execute(
+            "INSERT INTO GroceryItem (item_id, name, ingredient_id, kroger_product)"
+            " VALUES (4, 'cheddar', 4, 3)"
+        )
+        conn.execute("DELETE FROM GroceryItem WHERE item_id = 1")
+    expected = query(pool, RECIPE_COST)
+    assert expected == [(1, 4.25, 1), (2, 8.25, 2)]
+    assert query(pool, RECIPE_COST_ROLLUP) == expected
+    with pool.writer() as conn:
+        conn.execute("DELETE FROM GroceryItem WHERE item_id = 2")
+    assert query(pool, RECIPE_COST_ROLLUP) == query(pool, RECIPE_COST) == [(2, 8.25, 2)]
@@ -0,0 +1,75 @@
+# src/test_shopping_list.py
+"""
+Unit normalization and the consolidated shopping list: amounts in
+different spellings of a unit are summed in one dimension and rounded up
+to whole packages, and a cached list is rebuilt when a price, a package
+size, a quantity or the list itself changes.
+"""
+import pytest
+from pipelines.shopping_list import ShoppingListConsolidator
+from pipelines.units import packages_needed, parse_size, to_base, unit_key
+
+
+def test_unit_keys_tell_tablespoons_from_teaspoons():
+    assert unit_key("T") == unit_key("Tbsp.") == "tbsp"
+    assert unit_key("t") == unit_key("tsp") == "tsp"
+    assert unit_key("  Fl.   Oz ") == "fl oz"
+    assert unit_key(None) == ""
+
+
+def test_to_base_converts_known_units_only():
+    assert to_base(2, "cups") == ("ml", pytest.approx(473.176))
+    assert to_base(1, "T") == ("ml", pytest.approx(14.7868))
+    assert to_base(3, "cloves") == ("cloves", 3)
+
+
+def test_package_sizes():
+    assert parse_size("1/2 gal") == ("ml", pytest.approx(1892.705))
+    assert parse_size("24 fl oz bottle") == ("ml", pytest.approx(709.764))
+    assert parse_size("family size") is None
+    assert packages_needed({"g": 1000}, "16 oz") == 3
+    assert packages_needed({"cloves": 4}, "16 oz") == 1
+
+
+@pytest.fixture
+def seed():
+    # The same product in three recipes, each spelling its unit its own way
+    return """
+        INSERT INTO KrogerProduct (product_id, name, price, size)
+            VALUES (1, 'milk', 3.0, '1/2 gal');
+        INSERT INTO Ingredient (ingredient_id, name, quantity, measurement_unit,
+            recipe_id) VALUES
+            (1, 'milk', 6, 'cups', 1), (2, 'milk', 2, 'Cup', 2), (3, 'milk', 8, 'T', 3);
+        INSERT INTO GroceryItem (item_id, name, ingredient_id, kroger_product)
+            VALUES (1, 'milk', 1, 1), (2, 'milk', 2, 1), (3, 'milk', 3, 1);
+        INSERT INTO ShoppingList (list_id, user_id, grocery_id)
+            VALUES ('l', 1, 1), ('l', 1, 2), ('l', 1, 3);
+    """
+
+
+def test_spellings_of_a_unit_are_summed(pool):
+    consolidated = ShoppingListConsolidator(pool).consolidate(1)
+    (item,) = consolidated.items
+    # 8 cups and 8 tablespoons, just over half a gallon
+    assert item.quantities == {"ml": pytest.approx(8 * 236.588 + 8 * 14.7868, abs=0.01)}
+    assert item.packages == 2
+    assert consolidated.total_cost == 6.0
+
+
+def test_cached_list_follows_what_it_was_built_from(pool):
+    consolidator = ShoppingListConsolidator(pool)
+    first = consolidator.consolidate(1)
+    assert consolidator.consolidate(1) is first
+
+    def after(sql):
+        with pool.writer() as conn:
+            conn.execute(sql)
+        return consolidator.consolidate(1)
+
+    assert after("UPDATE KrogerProduct SET price = 4.0").total_cost == 8.0
+    assert after("UPDATE KrogerProduct SET size = '1 gal'").total_cost == 4.0
+    # 40 cups and 8 tablespoons need 3 gallons
+    assert after("UPDATE Ingredient SET quantity = 40 WHERE ingredient_id = 1"
+                 ).total_cost == 12.0
+    assert after("DELETE FROM ShoppingList WHERE grocery_id = 1").total_cost == 4.0
+    assert after("DELETE FROM ShoppingList").items == []